@@ -0,0 +1,510 @@
+"""
+Binary AST archive. Layout, all integers are unsigned LEB128 varints unless noted:
+
+    header     MAGIC, version (u8), flags (u8), strings offset, nodes offset, positions offset (u32 each)
+    strings    count, then per string its utf-8 length and bytes
+    nodes      the tree in pre-order: an opcode, its operands, then its child nodes
+    positions  only with FLAG_POSITIONS: filename string, line count, line start deltas, then
+               (start, end - start) for every token and positioned node, in the order they are decoded
+
+Identifiers, string literals and token types all go through the deduplicated string table, so a
+name costs one small varint per use. Loading maps the file and decodes straight from the mapping.
+"""
+
+import gc
+import mmap
+import struct
+import threading
+
+from basicToken import CONSTANT, Token
+from error import Position, Source
+from nodes import (
+    NumberNode, StringNode, BinOpNode, UnaryOpNode, VarAccessNode, VarAssignNode, IfNode, WhileNode,
+    ForNode, FunDefNode, CallNode, ListNode, ReturnNode, ContinueNode, BreakNode
+)
+
+
+MAGIC = b"CBAR"
+VERSION = 1
+FLAG_POSITIONS = 1
+HEADER = struct.Struct("<4sBBIII")
+FLOAT = struct.Struct("<d")
+
+OP_NONE = 0
+OP_INT = 1
+OP_FLOAT = 2
+OP_STRING = 3
+OP_BINOP = 4
+OP_UNARYOP = 5
+OP_VAR_ACCESS = 6
+OP_VAR_ASSIGN = 7
+OP_IF = 8
+OP_WHILE = 9
+OP_FOR = 10
+OP_FUNDEF = 11
+OP_CALL = 12
+OP_LIST = 13
+OP_RETURN = 14
+OP_CONTINUE = 15
+OP_BREAK = 16
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def save_archive(node, filepath, positions=True):
+    data = encode_archive(node, positions)
+    with open(filepath, "wb") as f:
+        f.write(data)
+    return data
+
+def load_archive(filepath):
+    with open(filepath, "rb") as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise ArchiveError(f"{filepath} is empty")
+    with buffer:
+        return decode_archive(buffer)
+
+def encode_archive(node, positions=True):
+    writer = ArchiveWriter(positions and node.source is not None)
+    writer.write_tree(node)
+    return writer.getvalue(node.source)
+
+def decode_archive(buffer):
+    if len(buffer) < GC_PAUSE_BYTES:
+        return ArchiveReader(buffer).read_tree()
+    # decoding only allocates objects that stay alive, so collections triggered by it find nothing;
+    # they cost a large tree more than half of its decoding time
+    with PausedGC():
+        return ArchiveReader(buffer).read_tree()
+
+# archives of at least this size are decoded with the garbage collector off
+GC_PAUSE_BYTES = 64 * 1024
+
+class PausedGC:
+    """Turns the garbage collector off until the last of the overlapping pauses ends, if it was on"""
+    lock = threading.Lock()
+    depth = 0
+    was_enabled = False
+
+    def __enter__(self):
+        with PausedGC.lock:
+            if PausedGC.depth == 0:
+                PausedGC.was_enabled = gc.isenabled()
+                gc.disable()
+            PausedGC.depth += 1
+
+    def __exit__(self, *exc_info):
+        with PausedGC.lock:
+            PausedGC.depth -= 1
+            if PausedGC.depth == 0 and PausedGC.was_enabled:
+                gc.enable()
+
+
+def zigzag(value):
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+def unzigzag(value):
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+def write_varint(out, value):
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+class ArchiveWriter:
+    def __init__(self, positions):
+        self.positions = positions
+        self.strings = {}
+        self.nodes = bytearray()
+        self.spans = bytearray()
+        self.span_start = 0
+
+    def string_idx(self, string):
+        idx = self.strings.get(string)
+        if idx is None:
+            idx = self.strings[string] = len(self.strings)
+        return idx
+
+    def string(self, string):
+        write_varint(self.nodes, self.string_idx(string))
+
+    def span(self, span):
+        # starts are stored as the signed difference to the previous start
+        if self.positions:
+            write_varint(self.spans, zigzag(span.start - self.span_start))
+            write_varint(self.spans, span.end - span.start)
+            self.span_start = span.start
+
+    def token(self, tok):
+        # the token type shares a varint with a flag telling whether a value follows
+        if tok.value is None:
+            self.varint(self.string_idx(tok.type) << 1)
+        else:
+            self.varint(self.string_idx(tok.type) << 1 | 1)
+            self.string(tok.value)
+        self.span(tok)
+
+    def varint(self, value):
+        write_varint(self.nodes, value)
+
+    def opcode(self, opcode, *operands):
+        write_varint(self.nodes, opcode)
+        for operand in operands:
+            write_varint(self.nodes, operand)
+
+    def write_tree(self, root):
+        pending = [root]
+        while pending:
+            node = pending.pop()
+            children = self.write_node(node)
+            if children:
+                pending.extend(reversed(children))
+
+    def write_node(self, node):
+        """Write the opcode and operands of node; returns its children, which follow in order"""
+        if node is None:
+            self.opcode(OP_NONE)
+        elif isinstance(node, NumberNode):
+            value = node.tok.value
+            if isinstance(value, float):
+                self.opcode(OP_FLOAT)
+                self.nodes += FLOAT.pack(value)
+            else:
+                self.opcode(OP_INT, zigzag(value))
+            self.span(node.tok)
+        elif isinstance(node, StringNode):
+            self.opcode(OP_STRING)
+            self.string(node.tok.value)
+            self.span(node.tok)
+        elif isinstance(node, BinOpNode):
+            self.opcode(OP_BINOP)
+            self.token(node.op_tok)
+            return [node.left_node, node.right_node]
+        elif isinstance(node, UnaryOpNode):
+            self.opcode(OP_UNARYOP)
+            self.token(node.op_tok)
+            return [node.node]
+        elif isinstance(node, VarAccessNode):
+            self.opcode(OP_VAR_ACCESS)
+            self.token(node.var_name_tok)
+        elif isinstance(node, VarAssignNode):
+            self.opcode(OP_VAR_ASSIGN)
+            self.token(node.var_name_tok)
+            return [node.value_node]
+        elif isinstance(node, IfNode):
+            self.opcode(OP_IF, len(node.cases))
+            children = []
+            for condition, expr, should_return_null in node.cases:
+                self.varint(int(should_return_null))
+                children += [condition, expr]
+            if node.else_case is None:
+                self.varint(0)
+            else:
+                expr, should_return_null = node.else_case
+                self.varint(2 + int(should_return_null))
+                children.append(expr)
+            return children
+        elif isinstance(node, WhileNode):
+            self.opcode(OP_WHILE, int(node.should_return_null))
+            return [node.condition, node.body_node]
+        elif isinstance(node, ForNode):
+            self.opcode(OP_FOR, int(node.should_return_null))
+            self.token(node.var_name_tok)
+            return [node.start_node, node.end_node, node.step_node, node.body_node]
+        elif isinstance(node, FunDefNode):
+            self.opcode(OP_FUNDEF, int(node.should_auto_return), int(node.var_name_tok is not None))
+            if node.var_name_tok is not None:
+                self.token(node.var_name_tok)
+            self.varint(len(node.arg_name_toks))
+            for arg in node.arg_name_toks:
+                self.token(arg)
+            return [node.body_node]
+        elif isinstance(node, CallNode):
+            self.opcode(OP_CALL, len(node.arg_nodes))
+            return [node.node_to_call] + node.arg_nodes
+        elif isinstance(node, ListNode):
+            self.opcode(OP_LIST, len(node.element_nodes))
+            self.span(node)
+            return node.element_nodes
+        elif isinstance(node, ReturnNode):
+            self.opcode(OP_RETURN)
+            self.span(node)
+            return [node.node_to_return]
+        elif isinstance(node, ContinueNode):
+            self.opcode(OP_CONTINUE)
+            self.span(node)
+        elif isinstance(node, BreakNode):
+            self.opcode(OP_BREAK)
+            self.span(node)
+        else:
+            raise ArchiveError(f"Can not archive {type(node).__name__}")
+        return None
+
+    def getvalue(self, source):
+        nodes = self.nodes
+        spans = bytearray()
+        if self.positions:
+            write_varint(spans, self.string_idx(source.filename))
+            line_starts = source.line_starts
+            write_varint(spans, len(line_starts))
+            previous = 0
+            for line_start in line_starts:
+                write_varint(spans, line_start - previous)
+                previous = line_start
+            spans += self.spans
+
+        strings = bytearray()
+        write_varint(strings, len(self.strings))
+        for string in self.strings:
+            # surrogatepass: a string literal may hold a lone surrogate, which plain utf-8 rejects
+            data = string.encode("utf-8", "surrogatepass")
+            write_varint(strings, len(data))
+            strings += data
+
+        strings_offset = HEADER.size
+        nodes_offset = strings_offset + len(strings)
+        spans_offset = nodes_offset + len(nodes)
+        flags = FLAG_POSITIONS if self.positions else 0
+        header = HEADER.pack(MAGIC, VERSION, flags, strings_offset, nodes_offset, spans_offset)
+        return header + strings + nodes + spans
+
+
+def read_varint(buffer, idx):
+    """Returns the varint at idx and the index after it"""
+    byte = buffer[idx]
+    if byte < 0x80: return byte, idx + 1
+    value = byte & 0x7f
+    shift = 7
+    while byte & 0x80:
+        idx += 1
+        byte = buffer[idx]
+        value |= (byte & 0x7f) << shift
+        shift += 7
+    return value, idx + 1
+
+class ArchiveReader:
+    def __init__(self, buffer):
+        if len(buffer) < HEADER.size:
+            raise ArchiveError("Not an archive: too short")
+        magic, version, flags, strings_offset, nodes_offset, spans_offset = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ArchiveError("Not an archive: bad magic")
+        if version != VERSION:
+            raise ArchiveError(f"Unsupported archive version {version}")
+
+        self.buffer = buffer
+        self.idx = strings_offset
+        self.strings = []
+        for i in range(self.varint()):
+            length = self.varint()
+            self.strings.append(str(buffer[self.idx:self.idx + length], "utf-8", "surrogatepass"))
+            self.idx += length
+
+        self.source = None
+        self.span_idx = None
+        self.tokens = {}
+        if flags & FLAG_POSITIONS:
+            self.idx = spans_offset
+            filename = self.string()
+            line_starts = []
+            line_start = 0
+            for i in range(self.varint()):
+                line_start += self.varint()
+                line_starts.append(line_start)
+            self.source = Source(filename, None, line_starts)
+            self.span_idx = self.idx
+            self.span_start = 0
+        self.idx = nodes_offset
+
+    def varint(self):
+        byte = self.buffer[self.idx]
+        if byte < 0x80:
+            self.idx += 1
+            return byte
+        value, self.idx = read_varint(self.buffer, self.idx)
+        return value
+
+    def string(self):
+        return self.strings[self.varint()]
+
+    def span(self, span):
+        """Fill in start/end/source of a freshly built token or node from the position table"""
+        if self.span_idx is not None:
+            buffer = self.buffer
+            delta, idx = read_varint(buffer, self.span_idx)
+            length, self.span_idx = read_varint(buffer, idx)
+            self.span_start += unzigzag(delta)
+            span.start = self.span_start
+            span.end = self.span_start + length
+            span.source = self.source
+        return span
+
+    def token(self):
+        type_and_flag = self.varint()
+        value_idx = self.varint() if type_and_flag & 1 else None
+        if self.span_idx is not None:
+            value = None if value_idx is None else self.strings[value_idx]
+            return self.span(Token(self.strings[type_and_flag >> 1], value))
+
+        # without positions equal tokens can not be told apart, so they are shared
+        key = (type_and_flag, value_idx)
+        tok = self.tokens.get(key)
+        if tok is None:
+            value = None if value_idx is None else self.strings[value_idx]
+            tok = self.tokens[key] = Token(self.strings[type_and_flag >> 1], value)
+        return tok
+
+    def read_tree(self):
+        """
+        Decode the node tree without recursion: a node with children is kept on a stack as
+        (build, operands, children, count) until its last child has been decoded.
+        """
+        pending = []
+        while True:
+            opcode = self.varint()
+            read = OPERAND_READERS.get(opcode)
+            if read is None:
+                raise ArchiveError(f"Unknown opcode {opcode}")
+            build, value, count = read(self)
+            if count:
+                pending.append((build, value, [], count))
+                continue
+
+            # hand the value to its parent; parents that are complete become values themselves
+            while pending:
+                parent_build, operands, children, count = pending[-1]
+                children.append(value)
+                if len(children) < count: break
+                pending.pop()
+                value = parent_build(self, operands, children)
+            else:
+                return value
+
+# each reader consumes the operands of its opcode and returns (build, operands, child count);
+# build(reader, operands, children) makes the node once all its children are decoded.
+# Leaves have no children and return (None, node, 0) straight away.
+
+def read_none(reader):
+    return None, None, 0
+
+def read_int(reader):
+    value = unzigzag(reader.varint())
+    return None, NumberNode(reader.span(Token(CONSTANT.INT, value))), 0
+
+def read_float(reader):
+    value = FLOAT.unpack_from(reader.buffer, reader.idx)[0]
+    reader.idx += FLOAT.size
+    return None, NumberNode(reader.span(Token(CONSTANT.FLOAT, value))), 0
+
+def read_string(reader):
+    value = reader.string()
+    return None, StringNode(reader.span(Token(CONSTANT.STRING, value))), 0
+
+def read_binop(reader):
+    return build_binop, reader.token(), 2
+
+def build_binop(reader, op_tok, children):
+    return BinOpNode(children[0], op_tok, children[1])
+
+def read_unaryop(reader):
+    return build_unaryop, reader.token(), 1
+
+def build_unaryop(reader, op_tok, children):
+    return UnaryOpNode(op_tok, children[0])
+
+def read_var_access(reader):
+    return None, VarAccessNode(reader.token()), 0
+
+def read_var_assign(reader):
+    return build_var_assign, reader.token(), 1
+
+def build_var_assign(reader, name_tok, children):
+    return VarAssignNode(name_tok, children[0])
+
+def read_if(reader):
+    flags = [bool(reader.varint()) for i in range(reader.varint())]
+    else_flag = reader.varint()
+    return build_if, (flags, else_flag), 2 * len(flags) + (else_flag >= 2)
+
+def build_if(reader, operands, children):
+    flags, else_flag = operands
+    cases = [(children[2 * i], children[2 * i + 1], flag) for i, flag in enumerate(flags)]
+    else_case = (children[-1], else_flag == 3) if else_flag >= 2 else None
+    return IfNode(cases, else_case)
+
+def read_while(reader):
+    return build_while, bool(reader.varint()), 2
+
+def build_while(reader, should_return_null, children):
+    return WhileNode(children[0], children[1], should_return_null)
+
+def read_for(reader):
+    should_return_null = bool(reader.varint())
+    return build_for, (should_return_null, reader.token()), 4
+
+def build_for(reader, operands, children):
+    should_return_null, name_tok = operands
+    return ForNode(name_tok, children[0], children[1], children[2], children[3], should_return_null)
+
+def read_fundef(reader):
+    should_auto_return = bool(reader.varint())
+    name_tok = reader.token() if reader.varint() else None
+    arg_toks = [reader.token() for i in range(reader.varint())]
+    return build_fundef, (name_tok, arg_toks, should_auto_return), 1
+
+def build_fundef(reader, operands, children):
+    name_tok, arg_toks, should_auto_return = operands
+    return FunDefNode(name_tok, arg_toks, children[0], should_auto_return)
+
+def read_call(reader):
+    return build_call, None, 1 + reader.varint()
+
+def build_call(reader, operands, children):
+    return CallNode(children[0], list(children[1:]))
+
+def read_list(reader):
+    count = reader.varint()
+    node = reader.span(ListNode([], Position(0), Position(0)))
+    return build_list, node, count
+
+def build_list(reader, node, children):
+    node.element_nodes = list(children)
+    return node
+
+def read_return(reader):
+    return build_return, reader.span(ReturnNode(None, Position(0), Position(0))), 1
+
+def build_return(reader, node, children):
+    node.node_to_return = children[0]
+    return node
+
+def read_continue(reader):
+    return None, reader.span(ContinueNode(Position(0), Position(0))), 0
+
+def read_break(reader):
+    return None, reader.span(BreakNode(Position(0), Position(0))), 0
+
+OPERAND_READERS = {
+    OP_NONE: read_none,
+    OP_INT: read_int,
+    OP_FLOAT: read_float,
+    OP_STRING: read_string,
+    OP_BINOP: read_binop,
+    OP_UNARYOP: read_unaryop,
+    OP_VAR_ACCESS: read_var_access,
+    OP_VAR_ASSIGN: read_var_assign,
+    OP_IF: read_if,
+    OP_WHILE: read_while,
+    OP_FOR: read_for,
+    OP_FUNDEF: read_fundef,
+    OP_CALL: read_call,
+    OP_LIST: read_list,
+    OP_RETURN: read_return,
+    OP_CONTINUE: read_continue,
+    OP_BREAK: read_break,
+}
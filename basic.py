@@ -1,7 +1,11 @@
+import cache  # installs the compile cache used by run_script
+import closures  # registers the "closure" engine
+import transpiler  # registers the "python" and "unboxed" engines
+import vm  # registers the "vm" engine
 from basicParser import Parser
 from interpreter import Interpreter
 from lexer import Lexer
-from util import global_symbol_table, run_script, Context
+from util import global_symbol_table, global_engines, run_script, Context
 from values import BuiltInFunction, Number
 
 global_symbol_table.set("null", Number.null)
@@ -25,7 +29,7 @@ global_symbol_table.set("len", BuiltInFunction.len)
 global_symbol_table.set("run", BuiltInFunction.run)
 
 
-def run(text, filename):
+def run(text, filename, engine="visitor", profiler=None, metrics=None):
     lexer = Lexer(text, filename)
     tokens, error = lexer.make_tokens()
     if error: return None, error
@@ -35,13 +39,25 @@ def run(text, filename):
     ast, error = parser.parse()
     if error: return ast, error
 
-    # interpreter
-    interpreter = Interpreter()
+    # interpreter; a profiler (see profiler.py) runs the program on its own tree walker, metrics
+    # (see metrics.py) on a counting variant of the engine
+    if profiler is not None:
+        if metrics is not None:
+            raise ValueError("A run can be profiled or metered, not both")
+        interpreter = profiler.interpreter(engine)
+    elif metrics is not None:
+        interpreter = metrics.interpreter(engine)
+    else:
+        interpreter = global_engines[engine]()
     context = Context("<pragram>")
     context.symbol_table = global_symbol_table
-    result = interpreter.visit(ast, context)
+    try:
+        result = interpreter.visit(ast, context)
+    finally:
+        # a run the engine raised out of is still recorded, and ends
+        if metrics is not None: metrics.finish()
 
-    return result.value, result.error
+    return result, interpreter.error
 
 if __name__ == "__main__":
     while True:
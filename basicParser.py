@@ -2,11 +2,53 @@ from error import InvalidSyntaxError
 from nodes import *
 from util import global_classes
 
+# binary operators: precedence, right associative. The levels follow grammar.txt:
+# expr (and/or) < comp-expr < arith-expr < term < power
+BINARY_OPERATORS = {
+    (CONSTANT.KEYWORD, "and"): (1, False),
+    (CONSTANT.KEYWORD, "or"): (1, False),
+    CONSTANT.EE: (2, False),
+    CONSTANT.NE: (2, False),
+    CONSTANT.LT: (2, False),
+    CONSTANT.LTE: (2, False),
+    CONSTANT.GT: (2, False),
+    CONSTANT.GTE: (2, False),
+    CONSTANT.PLUS: (3, False),
+    CONSTANT.MINUS: (3, False),
+    CONSTANT.MUL: (4, False),
+    CONSTANT.DIV: (4, False),
+    CONSTANT.POW: (5, True),
+}
+
+# prefix operators: precedence of their operand. A prefix operator is only accepted where an operand
+# of at least that level may start, so 'not' cannot follow a comparison or arithmetic operator
+PREFIX_OPERATORS = {
+    (CONSTANT.KEYWORD, "not"): 2,
+    CONSTANT.PLUS: 5,
+    CONSTANT.MINUS: 5,
+}
+
+# tokens an expression / a statement can start with
+EXPR_START_TYPES = {
+    CONSTANT.INT, CONSTANT.FLOAT, CONSTANT.STRING, CONSTANT.IDENTIFIER,
+    CONSTANT.LPAREN, CONSTANT.LSQUARE, CONSTANT.PLUS, CONSTANT.MINUS,
+}
+EXPR_START_KEYWORDS = {"var", "not", "if", "for", "while", "fun"}
+STATEMENT_START_KEYWORDS = EXPR_START_KEYWORDS | {"return", "continue", "break"}
+
+def starts_expr(tok):
+    return tok.type in EXPR_START_TYPES or (tok.type == CONSTANT.KEYWORD and tok.value in EXPR_START_KEYWORDS)
+
+def starts_statement(tok):
+    return tok.type in EXPR_START_TYPES or (tok.type == CONSTANT.KEYWORD and tok.value in STATEMENT_START_KEYWORDS)
+
+def operator_key(tok):
+    return (tok.type, tok.value) if tok.type == CONSTANT.KEYWORD else tok.type
+
 class Parser:
     def __init__(self, tokens):
         self.tokens = tokens
         self.tok_idx = -1
-        self.pre_idx = -1
         self.current_tok = None
         self.advance()
         self.error = None
@@ -16,15 +58,6 @@ class Parser:
         self._update_current_tok()
         return self.current_tok
 
-    def advance_step(self, value=None):
-        self.pre_idx = self.tok_idx
-        return value
-
-    def reverse(self):
-        self.tok_idx = self.pre_idx
-        self._update_current_tok()
-        return self.current_tok
-
     def _update_current_tok(self):
         if 0 <= self.tok_idx < len(self.tokens):
             self.current_tok = self.tokens[self.tok_idx]
@@ -74,7 +107,7 @@ class Parser:
 
         elif tok.type == CONSTANT.LPAREN:
             self.advance()
-            expr = self.advance_step(self.expr())
+            expr = self.expr()
             if self.error: return None
             if self.current_tok.type == CONSTANT.RPAREN:
                 self.advance()
@@ -87,27 +120,27 @@ class Parser:
                 return None
 
         elif tok.type == CONSTANT.LSQUARE:
-            list_expr = self.advance_step(self.list_expr())
+            list_expr = self.list_expr()
             if self.error: return None
             return list_expr
 
         elif tok.matches(CONSTANT.KEYWORD, "if"):
-            if_expr = self.advance_step(self.if_expr())
+            if_expr = self.if_expr()
             if self.error: return None
             return if_expr
 
         elif tok.matches(CONSTANT.KEYWORD, "for"):
-            for_expr = self.advance_step(self.for_expr())
+            for_expr = self.for_expr()
             if self.error: return None
             return for_expr
 
         elif tok.matches(CONSTANT.KEYWORD, "while"):
-            while_expr = self.advance_step(self.while_expr())
+            while_expr = self.while_expr()
             if self.error: return None
             return while_expr
 
         elif tok.matches(CONSTANT.KEYWORD, "fun"):
-            while_expr = self.advance_step(self.fun_def())
+            while_expr = self.fun_def()
             if self.error: return None
             return while_expr
 
@@ -117,11 +150,8 @@ class Parser:
         )
         return None
 
-    def power(self):
-        return self.bin_op(self.call, (CONSTANT.POW), self.factor)
-
     def call(self):
-        atom = self.advance_step(self.atom())
+        atom = self.atom()
         if self.error: return None
 
         if self.current_tok.type == CONSTANT.LPAREN:
@@ -131,13 +161,13 @@ class Parser:
             if self.current_tok.type == CONSTANT.RPAREN:
                 self.advance()
             else:
-                arg_nodes.append(self.advance_step(self.expr()))
+                arg_nodes.append(self.expr())
                 if self.error: return None
 
                 while self.current_tok.type == CONSTANT.COMMA:
                     self.advance()
 
-                    arg_nodes.append(self.advance_step(self.expr()))
+                    arg_nodes.append(self.expr())
                     if self.error: return None
 
                 self.check_type(CONSTANT.RPAREN, "Expected ',' or ')'")
@@ -147,93 +177,53 @@ class Parser:
 
         return atom
 
-    def factor(self):
-        tok = self.current_tok
-
-        if tok.type in (CONSTANT.PLUS, CONSTANT.MINUS):
-            self.advance()
-            factor_res = self.advance_step(self.factor())
-            if self.error: return None
-            return UnaryOpNode(tok, factor_res)
-        return self.power()
-
-    def term(self):  # * and /
-        return self.bin_op(self.factor, (CONSTANT.MUL, CONSTANT.DIV))
-
-    def comp_expr(self):
-        if self.current_tok.matches(CONSTANT.KEYWORD, "not"):
-            op_tok = self.current_tok
-            self.advance()
-
-            node = self.advance_step(self.comp_expr())
-            if self.error: return None
-            return UnaryOpNode(op_tok, node)
-
-        node = self.advance_step(self.bin_op(self.arith_expr,
-            (CONSTANT.EE, CONSTANT.NE, CONSTANT.LT, CONSTANT.LTE, CONSTANT.GT, CONSTANT.GTE)
-        ))
-        if self.error: return None
-        return node
-
-    def arith_expr(self):
-        return self.bin_op(self.term, (CONSTANT.PLUS, CONSTANT.MINUS))
-
     def statements(self):
         statements = []
-        pos_start = self.current_tok.pos_start.copy()
+        pos_start = self.current_tok.pos_start
 
         while self.current_tok.type == CONSTANT.NEWLINE:
             self.advance()
-        statement = self.advance_step(self.statement())
+        statement = self.statement()
         if self.error: return None
         statements.append(statement)
 
-        more_statements = True
-        while True:
-            newline_count = 0
+        # one token of lookahead decides whether another statement follows the newlines;
+        # anything else (end, elif, else, EOF, ...) is left to the caller
+        while self.current_tok.type == CONSTANT.NEWLINE:
             while self.current_tok.type == CONSTANT.NEWLINE:
                 self.advance()
-                newline_count += 1
-            if newline_count == 0:
-                more_statements = False
+            if not starts_statement(self.current_tok): break
 
-            if not more_statements: break
             statement = self.statement()
-            if statement is None:
-                self.reverse()
-                more_statements = False
-                self.error = None  # reset the error. it's only try_match
-                continue
-            self.advance_step()
+            if self.error: return None
             statements.append(statement)
 
         return ListNode(
             statements,
-            pos_start, self.current_tok.pos_end.copy()
+            pos_start, self.current_tok.pos_end
         )
 
     def statement(self):
-        pos_start = self.current_tok.pos_start.copy()
+        pos_start = self.current_tok.pos_start
 
         if self.current_tok.matches(CONSTANT.KEYWORD, "return"):
             self.advance()
 
-            expr = self.expr()
-            if not expr:
-                self.reverse()
-                self.error = None
-            self.advance_step()
-            return ReturnNode(expr, pos_start, self.current_tok.pos_start.copy())
+            expr = None
+            if starts_expr(self.current_tok):
+                expr = self.expr()
+                if self.error: return None
+            return ReturnNode(expr, pos_start, self.current_tok.pos_start)
 
         if self.current_tok.matches(CONSTANT.KEYWORD, "continue"):
             self.advance()
-            return ContinueNode(pos_start, self.current_tok.pos_end.copy())
+            return ContinueNode(pos_start, self.current_tok.pos_end)
 
         if self.current_tok.matches(CONSTANT.KEYWORD, "break"):
             self.advance()
-            return BreakNode(pos_start, self.current_tok.pos_end.copy())
+            return BreakNode(pos_start, self.current_tok.pos_end)
 
-        expr = self.advance_step(self.expr())
+        expr = self.expr()
         if self.error: return None
         return expr
 
@@ -248,31 +238,62 @@ class Parser:
             self.check_type(CONSTANT.EQ, "expected ‘=’")
             if self.error: return None
 
-            expr = self.advance_step(self.expr())
+            expr = self.expr()
             if self.error: return None
             return VarAssignNode(var_name, expr)
 
-        node = self.advance_step(self.bin_op(self.comp_expr, ((CONSTANT.KEYWORD,"and"), (CONSTANT.KEYWORD,"or"))) )
+        node = self.operator_expr()
         if self.error: return None
         return node
 
-    def bin_op(self, func_a, ops, func_b=None):
-        if func_b is None:
-            func_b = func_a
-        left = self.advance_step(func_a())
-        if self.error: return None
+    def operator_expr(self):
+        """
+        Precedence climbing over BINARY_OPERATORS / PREFIX_OPERATORS with explicit operand and
+        operator stacks, so operator chains of any length never recurse.
+        """
+        operands = []
+        operators = []  # (precedence, op_tok, is_prefix)
+        level = 1  # lowest precedence an operator may have at this point
 
-        while self.current_tok.type in ops or \
-                (type(ops[0]) == tuple and (self.current_tok.type, self.current_tok.value) in ops):
-            op_tok = self.current_tok
-            self.advance()
-            right = self.advance_step(func_b())
+        while True:
+            tok = self.current_tok
+            prefix = PREFIX_OPERATORS.get(operator_key(tok))
+            while prefix is not None and level <= prefix:
+                operators.append((prefix, tok, True))
+                level = prefix
+                self.advance()
+                tok = self.current_tok
+                prefix = PREFIX_OPERATORS.get(operator_key(tok))
+
+            operands.append(self.call())
             if self.error: return None
-            left = BinOpNode(left, op_tok, right)
-        return left
+
+            tok = self.current_tok
+            binary = BINARY_OPERATORS.get(operator_key(tok))
+            if binary is None: break
+            precedence, right_assoc = binary
+
+            while operators and (operators[-1][0] > precedence or
+                                 (operators[-1][0] == precedence and not right_assoc and not operators[-1][2])):
+                self.reduce_operator(operands, operators.pop())
+            operators.append((precedence, tok, False))
+            level = precedence if right_assoc else precedence + 1
+            self.advance()
+
+        while operators:
+            self.reduce_operator(operands, operators.pop())
+        return operands[0]
+
+    def reduce_operator(self, operands, operator):
+        _, op_tok, is_prefix = operator
+        right = operands.pop()
+        if is_prefix:
+            operands.append(UnaryOpNode(op_tok, right))
+        else:
+            operands.append(BinOpNode(operands.pop(), op_tok, right))
 
     def if_expr(self):
-        all_cases = self.advance_step(self.if_expr_cases('if'))
+        all_cases = self.if_expr_cases('if')
         if self.error: return None
 
         cases, else_case = all_cases
@@ -285,7 +306,7 @@ class Parser:
         self.check_keyword(case_keyword)
         if self.error: return None
 
-        condition = self.advance_step(self.expr())
+        condition = self.expr()
         if self.error: return None
         self.check_keyword("then")
         if self.error: return None
@@ -293,24 +314,24 @@ class Parser:
         if self.current_tok.type == CONSTANT.NEWLINE:
             self.advance()
 
-            statements = self.advance_step(self.statements())
+            statements = self.statements()
             if self.error: return None
             cases.append((condition, statements, True))
 
             if self.current_tok.matches(CONSTANT.KEYWORD, "end"):
                 self.advance()
             else:
-                all_cases = self.advance_step(self.if_expr_elif_or_else())
+                all_cases = self.if_expr_elif_or_else()
                 if self.error: return None
                 new_cases, else_case = all_cases
                 cases.extend(new_cases)
 
         else:
-            statement = self.advance_step(self.statement())
+            statement = self.statement()
             if self.error: return None
             cases.append((condition, statement, False))
 
-            all_calse = self.advance_step(self.if_expr_elif_or_else())
+            all_calse = self.if_expr_elif_or_else()
             if self.error: return None
             new_cases, else_case = all_calse
             cases.extend(new_cases)
@@ -328,14 +349,14 @@ class Parser:
             if self.current_tok.type == CONSTANT.NEWLINE:
                 self.advance()
 
-                statements = self.advance_step(self.statements())
+                statements = self.statements()
                 if self.error: return None
                 else_case = (statements, True)
 
                 self.check_keyword("end")
                 if self.error: return None
             else:
-                statement = self.advance_step(self.statement())
+                statement = self.statement()
                 if self.error: return None
                 else_case = (statement, False)
 
@@ -345,11 +366,11 @@ class Parser:
         cases, else_case = [], None
 
         if self.current_tok.matches(CONSTANT.KEYWORD, "elif"):
-            all_cases = self.advance_step(self.if_expr_elif())
+            all_cases = self.if_expr_elif()
             if self.error: return None
             cases, else_case = all_cases
         else:
-            else_case = self.advance_step(self.if_expr_else())
+            else_case = self.if_expr_else()
             if self.error: return None
 
         return (cases, else_case)
@@ -358,7 +379,7 @@ class Parser:
         self.check_keyword("while")
         if self.error: return None
 
-        condition = self.advance_step(self.expr())
+        condition = self.expr()
         if self.error: return None
 
         self.check_keyword("then")
@@ -367,7 +388,7 @@ class Parser:
         if self.current_tok.type == CONSTANT.NEWLINE:
             self.advance()
 
-            body_node = self.advance_step(self.statements())
+            body_node = self.statements()
             if self.error: return None
 
             self.check_keyword("end")
@@ -375,7 +396,7 @@ class Parser:
 
             return WhileNode(condition, body_node, True)
 
-        body_node = self.advance_step(self.statement())
+        body_node = self.statement()
         if self.error: return None
 
         if condition is None or body_node is None:
@@ -397,7 +418,7 @@ class Parser:
         self.check_type(CONSTANT.EQ, "Expected '='")
         if self.error: return None
 
-        start_node = self.advance_step(self.expr())
+        start_node = self.expr()
         if self.error: return None
 
         if self.current_tok.type != CONSTANT.KEYWORD or self.current_tok.value != 'to':
@@ -407,13 +428,13 @@ class Parser:
             )
             return None
         self.advance()
-        end_node = self.advance_step(self.expr())
+        end_node = self.expr()
         if self.error: return None
 
         step_node = None
         if self.current_tok.type == CONSTANT.KEYWORD and self.current_tok.value == 'step':
             self.advance()
-            step_node = self.advance_step(self.expr())
+            step_node = self.expr()
             if self.error: return None
 
         self.check_keyword("then")
@@ -422,7 +443,7 @@ class Parser:
         if self.current_tok.type == CONSTANT.NEWLINE:
             self.advance()
 
-            body_node = self.advance_step(self.statements())
+            body_node = self.statements()
             if self.error: return None
 
             self.check_keyword("end")
@@ -430,7 +451,7 @@ class Parser:
 
             return ForNode(var_name_tok, start_node, end_node, step_node, body_node, True)
 
-        body_node = self.advance_step(self.statement())
+        body_node = self.statement()
         if self.error: return None
         return ForNode(var_name_tok, start_node, end_node, step_node, body_node, False)
 
@@ -472,14 +493,14 @@ class Parser:
         if self.current_tok.type == CONSTANT.ARROW:
             self.advance()
 
-            body_node = self.advance_step(self.expr())
+            body_node = self.expr()
             if self.error: return None
             return FunDefNode(var_name_tok, arg_name_toks, body_node, True)
 
         self.check_type(CONSTANT.NEWLINE, "Expected newline or '->'")
         if self.error: return None
 
-        body_node = self.advance_step(self.statements())
+        body_node = self.statements()
         if self.error: return None
 
         self.check_keyword("end")
@@ -488,7 +509,7 @@ class Parser:
 
     def list_expr(self):
         element_nodes = []
-        pos_start = self.current_tok.pos_start.copy()
+        pos_start = self.current_tok.pos_start
 
         self.check_type(CONSTANT.LSQUARE, "Expected '['")
         if self.error: return None
@@ -496,13 +517,13 @@ class Parser:
         if self.current_tok.type == CONSTANT.RSQUARE:
             self.advance()
         else:
-            element_nodes.append(self.advance_step(self.expr()))
+            element_nodes.append(self.expr())
             if self.error: return None
 
             while self.current_tok.type == CONSTANT.COMMA:
                 self.advance()
 
-                element_nodes.append(self.advance_step(self.expr()))
+                element_nodes.append(self.expr())
                 if self.error: return None
 
             self.check_type(CONSTANT.RSQUARE, "Expected ',' or ']'")
@@ -511,4 +532,34 @@ class Parser:
         return ListNode( element_nodes, pos_start, self.current_tok.pos_end )
 
 
-global_classes["Parser"] = Parser
\ No newline at end of file
+class StreamParser(Parser):
+    """
+    Parser that pulls tokens from Lexer.iter_tokens while it parses. The parser never goes back,
+    so only the current token is held and the full token list never exists.
+    """
+    def __init__(self, lexer):
+        self.lexer = lexer
+        self.token_iter = lexer.iter_tokens()
+        super().__init__(None)
+
+    def _update_current_tok(self):
+        if self.current_tok is not None and self.current_tok.type == CONSTANT.EOF: return
+        tok = next(self.token_iter, None)
+        if tok is None:
+            # the lexer stopped on an error: end the stream so the parser can unwind, parse() reports it
+            end = self.current_tok.end if self.current_tok is not None else 0
+            tok = Token(CONSTANT.EOF, None, end, None, self.lexer.source)
+        self.current_tok = tok
+
+    def parse(self):
+        ast, error = super().parse()
+        if error:
+            # lexing errors win over syntax errors, as they do when the tokens are made up front
+            for _ in self.token_iter: pass
+        if self.lexer.error:
+            return None, self.lexer.error
+        return ast, error
+
+
+global_classes["Parser"] = Parser
+global_classes["StreamParser"] = StreamParser
\ No newline at end of file
@@ -1,6 +1,6 @@
 import string
 
-from error import Position
+from error import Span
 
 TT_DIGITS = "0123456789"
 TT_LETTERS = string.ascii_letters
@@ -54,18 +54,15 @@ class CONSTANT:
     EOF = "EOF"
 
 
-class Token:
-    def __init__(self, type_, value=None, pos_start=None, pos_end=None):
+class Token(Span):
+    __slots__ = ("type", "value", "start", "end", "source")
+
+    def __init__(self, type_, value=None, start=0, end=None, source=None):
         self.type = type_
         self.value = value
-        self.pos_start = None
-        self.pos_end = None
-        if pos_start:
-            self.pos_start = pos_start.copy()
-            self.pos_end = pos_start.copy()
-            self.pos_end.advance()
-        if pos_end:
-            self.pos_end = pos_end.copy()
+        self.start = start
+        self.end = start + 1 if end is None else end
+        self.source = source
 
     def matches(self, type_, value):
         return self.type == type_ and self.value == value
@@ -83,10 +80,11 @@ class Token:
             return f"{self.type}"
 
     @classmethod
-    def restore(cls, tokens, type_=CONSTANT.IDENTIFIER):
-        if type_ == CONSTANT.IDENTIFIER:
-            value = tokens[0][1:]
-        else:
-            value = None
-        tokens = tokens[1:]
-        return cls(type_, value, Position(0,0,0)), tokens
\ No newline at end of file
+    def restore(cls, reader):
+        # see save(): identifiers are prefixed with '$', keywords keep their value, other tokens their type
+        item = reader.next()
+        if item[0] == '$':
+            return cls(CONSTANT.IDENTIFIER, item[1:])
+        elif item in KEYWORDS:
+            return cls(CONSTANT.KEYWORD, item)
+        return cls(item)
@@ -0,0 +1,62 @@
+"""
+Count the values (and contexts and symbol tables) each engine creates per loop iteration.
+
+    python -m benchmarks.bench_allocations [engine|program ...]
+"""
+import sys
+
+import util
+import values
+from benchmarks.share import check, new_context, parse, select
+from util import global_engines
+
+ITERATIONS = 10000
+
+# every program runs its loop body ITERATIONS times
+PROGRAMS = {
+    "for_sum": f"var s = 0\nfor i = 0 to {ITERATIONS} then var s = s + i\ns",
+    "while_sum": f"var s = 0\nvar i = 0\nwhile i < {ITERATIONS} then\n var s = s + i\n var i = i + 1\nend\ns",
+    "calls": f"fun inc(x) -> x + 1\nvar s = 0\nfor i = 0 to {ITERATIONS} then var s = inc(s)\ns",
+    "list_index": f"var l = [1, 2, 3]\nvar s = 0\nfor i = 0 to {ITERATIONS} then var s = s + l / 1\ns",
+}
+
+class Counter:
+    """Counts the instances of a class created while it is installed"""
+    def __init__(self, cls):
+        self.cls = cls
+        self.count = 0
+
+    def __enter__(self):
+        original = self.original = self.cls.__init__
+        def counting_init(instance, *args, **kwargs):
+            self.count += 1
+            original(instance, *args, **kwargs)
+        self.cls.__init__ = counting_init
+        return self
+
+    def __exit__(self, *exc_info):
+        self.cls.__init__ = self.original
+
+def count_allocations(ast, engine):
+    context = new_context()
+    interpreter = global_engines[engine]()
+    with Counter(values.Value) as value_count, Counter(util.Context) as context_count, \
+            Counter(util.SymbolTable) as table_count:
+        interpreter.visit(ast, context)
+    check(interpreter)
+    return value_count.count, context_count.count + table_count.count
+
+def main(argv):
+    engines, names = select(argv[1:], PROGRAMS)
+    print(f"values / contexts+tables created per iteration ({ITERATIONS} iterations)")
+    print(f"{'':>12}" + "".join(f"{engine:>14}" for engine in engines))
+    for name in names:
+        ast = parse(PROGRAMS[name])
+        cells = []
+        for engine in engines:
+            value_count, scope_count = count_allocations(ast, engine)
+            cells.append(f"{value_count / ITERATIONS:8.1f} / {scope_count / ITERATIONS:3.1f}")
+        print(f"{name:>12}" + "".join(f"{cell:>14}" for cell in cells))
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,58 @@
+"""
+Compare the text archive of nodes.archieve_nodes with the binary archive of archive.py:
+file size and the time to load a program back.
+
+    python -m benchmarks.bench_archive [statements]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from archive import save_archive, load_archive
+from basicParser import Parser
+from benchmarks.bench_restore import generate_script
+from lexer import Lexer
+from nodes import archieve_nodes, restore_nodes
+
+def best_of(fn, repeat=5):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        del result  # freeing the tree is not part of loading it
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main(argv):
+    statements = int(argv[1]) if len(argv) > 1 else 10000
+    tokens, error = Lexer(generate_script(statements), "<bench>").make_tokens()
+    ast, error = Parser(tokens).parse()
+    if error: raise Exception(repr(error))
+
+    tmpdir = tempfile.mkdtemp()
+    text_path = os.path.join(tmpdir, "ast.txt")
+    binary_path = os.path.join(tmpdir, "ast.cba")
+    bare_path = os.path.join(tmpdir, "ast_bare.cba")
+    try:
+        archieve_nodes(ast, text_path)
+        save_archive(ast, binary_path)
+        save_archive(ast, bare_path, positions=False)
+
+        print(f"{statements} statements")
+        text = generate_script(statements)
+        elapsed = best_of(lambda: Parser(Lexer(text, "<bench>").make_tokens()[0]).parse())
+        print(f"{'lex and parse':>22}: {len(text) / 1024:8.1f} KiB {elapsed * 1000:9.2f}ms")
+        for name, path, load in (("text", text_path, restore_nodes),
+                                 ("binary", binary_path, load_archive),
+                                 ("binary, no positions", bare_path, load_archive)):
+            elapsed = best_of(lambda: load(path))
+            print(f"{name:>22}: {os.path.getsize(path) / 1024:8.1f} KiB {elapsed * 1000:9.2f}ms to load")
+    finally:
+        for path in (text_path, binary_path, bare_path):
+            if os.path.exists(path): os.remove(path)
+        os.rmdir(tmpdir)
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,55 @@
+"""
+Time util.run_script on the same library file with and without the compile cache.
+
+    python -m benchmarks.bench_cache [functions] [runs]
+"""
+import shutil
+import sys
+import tempfile
+import time
+
+import basic  # sets up the global symbols and the classes run_script uses
+from cache import CompileCache
+from util import run_script
+
+# a library only defines functions, so running it is mostly lexing and parsing it
+FUNCTION = """fun helper_{n}(a, b)
+    var total = 0
+    for i = a to b then
+        if i / 2 >= {n} and i != 7 then var total = total + i * 3.5 elif i <= 3 then continue else break
+    end
+    return [total, "helper {n}"]
+end
+"""
+
+def generate_library(functions):
+    return "".join(FUNCTION.format(n=n) for n in range(functions))
+
+def bench(text, runs):
+    start = time.perf_counter()
+    for i in range(runs):
+        value, error = run_script(text, "lib.basic")
+        if error: raise Exception(repr(error))
+    return (time.perf_counter() - start) / runs
+
+def main(argv):
+    functions = int(argv[1]) if len(argv) > 1 else 500
+    runs = int(argv[2]) if len(argv) > 2 else 20
+    text = generate_library(functions)
+    root = tempfile.mkdtemp()
+    try:
+        previous = CompileCache.set_default(CompileCache(root, enabled=False))
+        uncached = bench(text, runs)
+        cache = CompileCache(root)
+        CompileCache.set_default(cache)
+        cached = bench(text, runs)
+        CompileCache.set_default(previous)
+    finally:
+        shutil.rmtree(root)
+
+    print(f"{functions} functions, {len(text) / 1024:.1f} KiB, {runs} runs")
+    print(f"  no cache: {uncached * 1000:9.2f}ms per run")
+    print(f"     cache: {cached * 1000:9.2f}ms per run {cache.stats()}")
+
+if __name__ == '__main__':
+    main(sys.argv)
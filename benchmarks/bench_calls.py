@@ -0,0 +1,18 @@
+"""
+Time the engines on call-bound recursive programs.
+
+    python -m benchmarks.bench_calls [repeat] [engine|program ...]
+"""
+import sys
+
+from benchmarks.bench_interpreter import main
+
+PROGRAMS = {
+    "fib25": "fun fib(n) -> if n < 2 then n else fib(n - 1) + fib(n - 2)\nfib(25)",
+    # ack(2, n) recurses about 2n deep, kept well below Python's recursion limit
+    "ackermann": "fun ack(m, n)\n if m == 0 then return n + 1\n if n == 0 then return ack(m - 1, 1)\n"
+                 " return ack(m - 1, ack(m, n - 1))\nend\nfor i = 0 to 20 then ack(2, 30)",
+}
+
+if __name__ == '__main__':
+    main(sys.argv, PROGRAMS)
@@ -0,0 +1,55 @@
+"""
+Time the execution engines on small loop-, call- and list-heavy programs.
+
+    python -m benchmarks.bench_interpreter [repeat] [engine|program ...]
+"""
+import sys
+import time
+
+from benchmarks.share import check, new_context, parse, select
+from util import global_engines
+
+PROGRAMS = {
+    "for_sum": "var s = 0\nfor i = 0 to 200000 then var s = s + i\ns",
+    "while_sum": "var s = 0\nvar i = 0\nwhile i < 100000 then\n var s = s + i\n var i = i + 1\nend\ns",
+    "nested_for": "var s = 0\nfor i = 0 to 300 then\n for j = 0 to 300 then var s = s + i * j\nend\ns",
+    "compare": "var c = 0\nfor i = 0 to 250 then\n for j = 0 to 250 then\n  if i < j and j <= 2 * i or i == j + 3 then var c = c + 1\n end\nend\nc",
+    "fib": "fun fib(n) -> if n < 2 then n else fib(n - 1) + fib(n - 2)\nfib(18)",
+    "locals": "fun inner(n)\n var s = 0\n for i = 0 to n then var s = s + i * 2\n return s\nend\n"
+              "fun outer(k)\n var t = 0\n for j = 0 to k then var t = t + inner(30)\n return t\nend\nouter(4000)",
+    "mandelbrot": "var count = 0\nfor py = 0 to 24 then\n for px = 0 to 40 then\n"
+                  "  var x0 = px / 20 - 2\n  var y0 = py / 12 - 1\n  var x = 0\n  var y = 0\n  var it = 0\n"
+                  "  while it < 50 and x * x + y * y < 4 then\n   var t = x * x - y * y + x0\n"
+                  "   var y = 2 * x * y + y0\n   var x = t\n   var it = it + 1\n  end\n"
+                  "  if it == 50 then var count = count + 1\n end\nend\ncount",
+    "lists": "var l = []\nfor i = 0 to 30000 then var l = l + i * 2\n"
+             "var s = 0\nfor i = 0 to len(l) then var s = s + l / i\ns",
+}
+
+def run_program(ast, engine="visitor"):
+    context = new_context()
+    interpreter = global_engines[engine]()
+    start = time.perf_counter()
+    value = interpreter.visit(ast, context)
+    elapsed = time.perf_counter() - start
+    check(interpreter)
+    return value, elapsed
+
+def main(argv, programs=PROGRAMS):
+    repeat = int(argv[1]) if len(argv) > 1 else 3
+    engines, names = select(argv[2:], programs)
+    print(f"{'':>12}" + "".join(f"{engine:>15}" for engine in engines))
+    for name in names:
+        ast = parse(programs[name])
+        timings = []
+        for engine in engines:
+            best = None
+            for _ in range(repeat):
+                value, elapsed = run_program(ast, engine)
+                best = elapsed if best is None else min(best, elapsed)
+            timings.append(best)
+        # speedups are relative to the first engine
+        print(f"{name:>12}" + "".join(f"{t * 1000:8.1f}ms {timings[0] / t:3.1f}x" for t in timings))
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,55 @@
+"""
+Compare the throughput of the lexer engines on a generated script.
+
+    python -m benchmarks.bench_lexer [lines] [repeat]
+"""
+import sys
+import time
+
+from lexer import LEXER_ENGINES
+
+SNIPPET = '''# generated block {n}
+var total_{n} = 0
+for i = 0 to 100 step 2 then
+    var total_{n} = total_{n} + i * 3.5 - (i / 2) ^ 2
+    if total_{n} >= 1000 and i != 7 then print("big: " + "value") elif i <= 3 then continue else break
+end
+fun helper_{n}(a, b) -> [a, b, a == b]
+'''
+
+def generate_script(lines):
+    blocks = []
+    line_count = 0
+    n = 0
+    while line_count < lines:
+        block = SNIPPET.format(n=n)
+        blocks.append(block)
+        line_count += block.count('\n')
+        n += 1
+    return ''.join(blocks)
+
+def bench_engine(engine, text, repeat):
+    best = None
+    token_count = 0
+    for _ in range(repeat):
+        lexer = LEXER_ENGINES[engine](text, "<bench>")
+        start = time.perf_counter()
+        tokens, error = lexer.make_tokens()
+        elapsed = time.perf_counter() - start
+        if error: raise Exception(repr(error))
+        token_count = len(tokens)
+        best = elapsed if best is None else min(best, elapsed)
+    return token_count, best
+
+def main(argv):
+    lines = int(argv[1]) if len(argv) > 1 else 20000
+    repeat = int(argv[2]) if len(argv) > 2 else 3
+    text = generate_script(lines)
+
+    print(f"{lines} lines, {len(text)} chars, best of {repeat}")
+    for engine in LEXER_ENGINES:
+        token_count, elapsed = bench_engine(engine, text, repeat)
+        print(f"{engine:>6}: {token_count} tokens in {elapsed:.3f}s, {token_count / elapsed:,.0f} tokens/s")
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,45 @@
+"""
+Measure the peak memory of loops whose value is thrown away, with tracemalloc, at two sizes.
+
+    python -m benchmarks.bench_loop_memory [engine|program ...]
+"""
+import sys
+import tracemalloc
+
+from benchmarks.share import check, new_context, parse, select
+from util import global_engines
+
+SIZES = (10000, 100000)
+
+# none of the programs uses the values of its loop bodies
+PROGRAMS = {
+    "for_in_fun": "fun f(n)\n for i = 0 to n then i * 3\n return 0\nend\nf({n})",
+    "while_in_fun": "fun g(n)\n var i = 0\n while i < n then var i = i + 1\n return i\nend\ng({n})",
+    "nested_block": "for j = 0 to 1 then\n for i = 0 to {n} then [i]\nend",
+}
+
+def measure(ast, engine):
+    context = new_context()
+    interpreter = global_engines[engine]()
+    tracemalloc.start()
+    interpreter.visit(ast, context)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    check(interpreter)
+    return peak
+
+def main(argv):
+    engines, names = select(argv[1:], PROGRAMS)
+    print(f"peak KiB at {' and '.join(str(size) for size in SIZES)} iterations")
+    print(f"{'':>14}" + "".join(f"{engine:>16}" for engine in engines))
+    for name in names:
+        row = []
+        for engine in engines:
+            peaks = []
+            for size in SIZES:
+                peaks.append(measure(parse(PROGRAMS[name].format(n=size)), engine) // 1024)
+            row.append(" / ".join(str(peak) for peak in peaks))
+        print(f"{name:>14}" + "".join(f"{cell:>16}" for cell in row))
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,54 @@
+"""
+Parse time of deeply nested if/for/while/fun blocks. With a predictive statement parser the time
+per token stays flat as the nesting grows.
+
+    python -m benchmarks.bench_nested_blocks [max_depth]
+"""
+import sys
+import time
+
+from basicParser import Parser
+from lexer import Lexer
+
+OPENERS = [
+    "if x > {d} then",
+    "for i{d} = 0 to 10 then",
+    "while x < {d} then",
+    "fun f{d}(a, b)",
+]
+
+def generate_script(depth):
+    lines = []
+    for d in range(depth):
+        indent = "  " * d
+        lines.append(indent + OPENERS[d % len(OPENERS)].format(d=d))
+        lines.append(indent + f"  var x = x + {d}")
+    for d in reversed(range(depth)):
+        indent = "  " * d
+        lines.append(indent + "  return x" if d % len(OPENERS) == 3 else indent + "  x")
+        lines.append(indent + "end")
+    return "\n".join(lines)
+
+def time_parse(tokens, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ast, error = Parser(tokens).parse()
+        elapsed = time.perf_counter() - start
+        if error: raise Exception(repr(error))
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main(argv):
+    max_depth = int(argv[1]) if len(argv) > 1 else 800
+    sys.setrecursionlimit(max(1000, max_depth * 40))
+    depth = 50
+    while depth <= max_depth:
+        tokens, error = Lexer(generate_script(depth), "<bench>").make_tokens()
+        if error: raise Exception(repr(error))
+        elapsed = time_parse(tokens)
+        print(f"depth {depth:>5}: {len(tokens):>7} tokens {elapsed * 1000:8.2f}ms {elapsed / len(tokens) * 1e6:6.2f}us/token")
+        depth *= 2
+
+if __name__ == '__main__':
+    main(sys.argv)
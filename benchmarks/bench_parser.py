@@ -0,0 +1,51 @@
+"""
+Parse throughput on arithmetic-heavy code.
+
+    python -m benchmarks.bench_parser [lines] [repeat]
+"""
+import random
+import sys
+import time
+
+from basicParser import Parser
+from lexer import Lexer
+
+OPERATORS = ["+", "-", "*", "/", "^", "==", "<", ">=", "and", "or"]
+
+def generate_expression(rng, size):
+    parts = [str(rng.randint(0, 99))]
+    for _ in range(size):
+        parts.append(rng.choice(OPERATORS))
+        operand = rng.choice(["x", "y", str(rng.randint(0, 99)), "-z", "(a + b)", "f(1, 2)"])
+        parts.append(operand)
+    return " ".join(parts)
+
+def generate_script(lines, seed=0):
+    rng = random.Random(seed)
+    return "\n".join(f"var v{i} = {generate_expression(rng, 12)}" for i in range(lines))
+
+def main(argv):
+    lines = int(argv[1]) if len(argv) > 1 else 5000
+    repeat = int(argv[2]) if len(argv) > 2 else 3
+    tokens, error = Lexer(generate_script(lines), "<bench>").make_tokens()
+    if error: raise Exception(repr(error))
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ast, error = Parser(tokens).parse()
+        elapsed = time.perf_counter() - start
+        if error: raise Exception(repr(error))
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{lines} lines, {len(tokens)} tokens: {best:.3f}s, {len(tokens) / best:,.0f} tokens/s")
+
+    chain = " + ".join(["1"] * 5000) + "\n" + "- " * 5000 + "1\n" + " ^ ".join(["2"] * 5000)
+    tokens, error = Lexer(chain, "<bench>").make_tokens()
+    try:
+        ast, error = Parser(tokens).parse()
+        print("long operator chains:", "error " + repr(error) if error else "ok")
+    except RecursionError:
+        print("long operator chains: RecursionError")
+
+if __name__ == '__main__':
+    main(sys.argv)
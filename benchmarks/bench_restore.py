@@ -0,0 +1,46 @@
+"""
+Time restoring an archive written by nodes.archieve_nodes for growing program sizes.
+
+    python -m benchmarks.bench_restore [max_nodes]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from basicParser import Parser
+from lexer import Lexer
+from nodes import archieve_nodes, restore_nodes, Node_Name_Map
+
+STATEMENT = "var a{n} = [{n}, a{n} + 2 * b, f(a{n}, \"s\")]\nif a{n} >= {n} then var c = c - 1 else var c = c + 1\n"
+
+def generate_script(statements):
+    return "".join(STATEMENT.format(n=n) for n in range(statements))
+
+def bench(statements, filepath):
+    tokens, error = Lexer(generate_script(statements), "<bench>").make_tokens()
+    ast, error = Parser(tokens).parse()
+    if error: raise Exception(repr(error))
+    text, _ = archieve_nodes(ast, filepath)
+    node_count = sum(text.count(name + ",") for name in Node_Name_Map) + text.count("#") + text.count("@")
+
+    start = time.perf_counter()
+    restore_nodes(filepath)
+    return node_count, time.perf_counter() - start
+
+def main(argv):
+    max_nodes = int(argv[1]) if len(argv) > 1 else 100000
+    fd, filepath = tempfile.mkstemp(suffix=".txt")
+    os.close(fd)
+    try:
+        statements = 100
+        while True:
+            node_count, elapsed = bench(statements, filepath)
+            print(f"{node_count:>8} nodes: {elapsed * 1000:9.2f}ms {elapsed / node_count * 1e6:7.2f}us/node")
+            if node_count >= max_nodes: break
+            statements *= 2
+    finally:
+        os.remove(filepath)
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,40 @@
+"""
+Peak memory of lexing + parsing a generated script with the token list built up front
+(Lexer.make_tokens + Parser) and with tokens streamed into StreamParser.
+
+    python -m benchmarks.bench_stream_memory [lines]
+"""
+import sys
+import tracemalloc
+
+from basicParser import Parser, StreamParser
+from benchmarks.bench_lexer import generate_script
+from lexer import Lexer
+
+def parse_batch(text):
+    tokens, error = Lexer(text, "<bench>").make_tokens()
+    if error: return None, error
+    return Parser(tokens).parse()
+
+def parse_stream(text):
+    return StreamParser(Lexer(text, "<bench>")).parse()
+
+def peak_memory(parse, text):
+    tracemalloc.start()
+    ast, error = parse(text)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if error: raise Exception(repr(error))
+    return current, peak
+
+def main(argv):
+    lines = int(argv[1]) if len(argv) > 1 else 5000
+    text = generate_script(lines)
+
+    print(f"{lines} lines, {len(text)} chars")
+    for name, parse in (("batch", parse_batch), ("stream", parse_stream)):
+        retained, peak = peak_memory(parse, text)
+        print(f"{name:>6}: peak {peak / 1024:,.0f} KiB, AST {retained / 1024:,.0f} KiB")
+
+if __name__ == '__main__':
+    main(sys.argv)
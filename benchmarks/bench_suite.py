@@ -0,0 +1,172 @@
+"""
+The standard benchmark suite: representative BASIC programs, timed phase by phase.
+
+    python -m benchmarks.bench_suite [-n RUNS] [--engine ENGINE] [--output FILE]
+                                     [--baseline FILE] [--threshold FRACTION] [program ...]
+
+Every run lexes, parses and executes a program from scratch, timing the three phases apart; the
+archive program also saves its tree to a binary archive and loads it back before running it.
+After a warm-up run, the mean and standard deviation in ms of every phase over the runs are
+printed as JSON, or written to --output.
+
+Given a --baseline, the output of an earlier run, a phase is reported as a regression when its
+mean is more than the threshold (a fraction, 0.1 by default) above the baseline mean and the
+difference is more than twice the larger standard deviation and more than MIN_DIFFERENCE ms,
+as the lexing and parsing of the smaller programs take well under a millisecond; the exit status
+is then 1. The baseline must be of the same engine.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from archive import save_archive, load_archive
+from benchmarks.share import check, lex, new_context, parse_tokens
+from cache import CompileCache
+from util import global_engines
+
+SORT_DATA = random.Random(25).sample(range(10000), 400)
+
+# the archive program is made of many small statements, so that its tree is large
+ARCHIVE_STATEMENT = ("var a{n} = [{n}, {n} * 2 + 1, \"s{n}\"]\n"
+                     "if a{n} / 1 >= 500 then var c = c - 1 else var c = c + 1\n")
+
+PROGRAMS = {
+    "fib": "fun fib(n) -> if n < 2 then n else fib(n - 1) + fib(n - 2)\nfib(20)",
+    "nested_loops": "var s = 0\nfor i = 0 to 200 then\n for j = 0 to 200 then\n"
+                    "  if i < j then var s = s + i * j else var s = s - 1\n end\nend\ns",
+    "append": "var l = []\nfor i = 0 to 20000 then append(l, i * 2)\n"
+              "var m = []\nfor i = 0 to len(l) step 2 then append(m, l / i)\nlen(m)",
+    "strings": "var s = \"\"\nfor i = 0 to 2000 then var s = s + \"ab\" * 5\nvar t = \"-\" * 20000\nt",
+    "sort": "var data = [" + ", ".join(map(str, SORT_DATA)) + "]\n"
+            "fun qsort(l)\n if len(l) < 2 then return l\n var pivot = l / 0\n var less = []\n var more = []\n"
+            " for i = 1 to len(l) then\n  var x = l / i\n  if x < pivot then append(less, x) else append(more, x)\n end\n"
+            " return qsort(less) * [pivot] * qsort(more)\nend\nvar sorted = qsort(data)\nsorted / 0",
+    # {directory} is where the files of FILES are written
+    "run": "run(\"{directory}/lib.basic\")\nvar total = 0\nfor i = 0 to 40 then\n"
+           " run(\"{directory}/step.basic\")\n var total = total + lib_sum(lib_squares(i))\nend\ntotal",
+    "archive": "var c = 0\n" + "".join(ARCHIVE_STATEMENT.format(n=n) for n in range(1000)) + "c",
+}
+
+# the scripts loaded by the run program
+FILES = {
+    "lib.basic": "fun lib_squares(n)\n var l = []\n for i = 0 to n then append(l, i * i)\n return l\nend\n"
+                 "fun lib_sum(l)\n var s = 0\n for i = 0 to len(l) then var s = s + l / i\n return s\nend\n",
+    "step.basic": "var step_list = lib_squares(10)\nlib_sum(step_list)",
+}
+
+ARCHIVED = {"archive"}
+
+MIN_DIFFERENCE = 0.1  # ms, a smaller change in a phase is never a regression
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def run_once(name, text, engine, directory):
+    """Runs a program from scratch; returns the seconds taken by each phase"""
+    timings = {}
+    tokens, timings["lex"] = timed(lex, text, name)
+    ast, timings["parse"] = timed(parse_tokens, tokens)
+    if name in ARCHIVED:
+        path = os.path.join(directory, name + ".cba")
+        _, timings["save"] = timed(save_archive, ast, path)
+        ast, timings["load"] = timed(load_archive, path)
+
+    context = new_context()
+    interpreter = global_engines[engine]()
+    _, timings["execute"] = timed(interpreter.visit, ast, context)
+    check(interpreter)
+    return timings
+
+def bench(names, engine="visitor", runs=5):
+    """Returns {program: {phase: {"mean": ms, "stdev": ms}}}"""
+    directory = tempfile.mkdtemp()
+    # the scripts run by the run program are cached like any other, but not in the user's cache
+    previous_cache = CompileCache.set_default(CompileCache(os.path.join(directory, "cache")))
+    try:
+        for filename, text in FILES.items():
+            with open(os.path.join(directory, filename), "w") as f:
+                f.write(text)
+
+        results = {}
+        for name in names:
+            text = PROGRAMS[name].replace("{directory}", directory.replace("\\", "/"))
+            run_once(name, text, engine, directory)  # warm up
+            samples = [run_once(name, text, engine, directory) for _ in range(runs)]
+            results[name] = {
+                phase: {
+                    "mean": statistics.mean(sample[phase] for sample in samples) * 1000,
+                    "stdev": statistics.stdev(sample[phase] for sample in samples) * 1000 if runs > 1 else 0.0,
+                }
+                for phase in samples[0]
+            }
+        return results
+    finally:
+        CompileCache.set_default(previous_cache)
+        shutil.rmtree(directory, ignore_errors=True)
+
+def compare(report, baseline, threshold=0.1):
+    """The phases of report that are slower than in baseline; a list of (program, phase, mean, baseline mean)"""
+    regressions = []
+    for name, phases in report["programs"].items():
+        for phase, stats in phases.items():
+            base = baseline["programs"].get(name, {}).get(phase)
+            if base is None:
+                continue
+            slower = stats["mean"] - base["mean"]
+            if slower > max(base["mean"] * threshold, 2 * max(stats["stdev"], base["stdev"]), MIN_DIFFERENCE):
+                regressions.append((name, phase, stats["mean"], base["mean"]))
+    return regressions
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_suite")
+    parser.add_argument("programs", nargs="*", metavar="program", help=", ".join(PROGRAMS))
+    parser.add_argument("-n", "--runs", type=int, default=5)
+    parser.add_argument("--engine", default="visitor", choices=list(global_engines))
+    parser.add_argument("--output")
+    parser.add_argument("--baseline")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args(argv[1:])
+    unknown = [name for name in args.programs if name not in PROGRAMS]
+    if unknown:
+        parser.error(f"unknown program {', '.join(unknown)}")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["engine"] != args.engine:
+            parser.error(f"the baseline is of the {baseline['engine']} engine, not {args.engine}")
+
+    report = {
+        "engine": args.engine,
+        "runs": args.runs,
+        "python": platform.python_version(),
+        "programs": bench(args.programs or list(PROGRAMS), args.engine, args.runs),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.threshold)
+        for name, phase, mean, base in regressions:
+            print(f"regression: {name} {phase} {mean:.2f}ms, was {base:.2f}ms ({mean / base - 1:+.0%})", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,36 @@
+"""
+Measure the memory held by the token stream and the AST of a generated script.
+
+    python -m benchmarks.bench_token_memory [lines]
+"""
+import sys
+import tracemalloc
+
+from basicParser import Parser
+from benchmarks.bench_lexer import generate_script
+from lexer import Lexer
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+def main(argv):
+    lines = int(argv[1]) if len(argv) > 1 else 5000
+    text = generate_script(lines)
+
+    (tokens, error), token_bytes = measure(lambda: Lexer(text, "<bench>").make_tokens())
+    if error: raise Exception(repr(error))
+    tokens_copy = list(tokens)
+    (ast, error), total_bytes = measure(lambda: Parser(tokens_copy).parse())
+    if error: raise Exception(repr(error))
+
+    print(f"{lines} lines, {len(tokens)} tokens")
+    print(f"tokens: {token_bytes / 1024:,.0f} KiB ({token_bytes / len(tokens):.0f} bytes/token)")
+    print(f"ast:    {total_bytes / 1024:,.0f} KiB on top of the tokens")
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,44 @@
+"""
+Measure the memory of the list a program returns, per element, with tracemalloc.
+
+    python -m benchmarks.bench_value_memory [engine|program ...]
+"""
+import sys
+import tracemalloc
+
+from benchmarks.share import check, new_context, parse, select
+from util import global_engines
+
+ELEMENTS = 50000
+
+# every program evaluates to ELEMENTS values in lists
+PROGRAMS = {
+    "numbers": f"for i = 0 to {ELEMENTS} then i * 3",
+    "small_ints": f"for j = 0 to {ELEMENTS // 100} then for i = 0 to 100 then i",
+    "literals": f"for i = 0 to {ELEMENTS} then 7",
+    "strings": f'for i = 0 to {ELEMENTS} then "ab" * 2',
+    "lists": f"for i = 0 to {ELEMENTS} then [i]",
+}
+
+def measure(ast, engine):
+    context = new_context()
+    interpreter = global_engines[engine]()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    value = interpreter.visit(ast, context)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    check(interpreter)
+    # the value is still alive, so the difference is what the program left behind
+    return after - before
+
+def main(argv):
+    engines, names = select(argv[1:], PROGRAMS)
+    print(f"bytes per element of the resulting list ({ELEMENTS} elements)")
+    print(f"{'':>12}" + "".join(f"{engine:>10}" for engine in engines))
+    for name in names:
+        ast = parse(PROGRAMS[name])
+        print(f"{name:>12}" + "".join(f"{measure(ast, engine) / ELEMENTS:10.0f}" for engine in engines))
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,34 @@
+"""What the benchmarks share: picking engines and programs, parsing and a context to run in"""
+import basic  # sets up the global symbols and registers the engines
+from basicParser import Parser
+from lexer import Lexer
+from util import Context, SymbolTable, global_engines, global_symbol_table
+
+
+def select(args, programs):
+    """The engines (the visitor first) and the programs named in args; all of them when none are"""
+    engines = [arg for arg in args if arg in global_engines] or sorted(global_engines, key=lambda e: e != "visitor")
+    names = [arg for arg in args if arg in programs] or list(programs)
+    return engines, names
+
+def lex(text, filename="<bench>"):
+    tokens, error = Lexer(text, filename).make_tokens()
+    if error: raise Exception(repr(error))
+    return tokens
+
+def parse_tokens(tokens):
+    ast, error = Parser(tokens).parse()
+    if error: raise Exception(repr(error))
+    return ast
+
+def parse(text, filename="<bench>"):
+    return parse_tokens(lex(text, filename))
+
+def new_context():
+    """A program context whose variables do not outlive the run"""
+    context = Context("<bench>")
+    context.symbol_table = SymbolTable(global_symbol_table)
+    return context
+
+def check(interpreter):
+    if interpreter.error: raise Exception(repr(interpreter.error))
@@ -0,0 +1,612 @@
+"""
+Bytecode for the stack VM in vm.py. A tree is compiled into CodeObjects, one per program and one per
+function body. An instruction is (opcode, argument, span); the argument indexes the constant pool,
+the name table or the instruction list (jump targets), and the span is the source range the
+instruction came from, which is what runtime errors point at. The span of an operator also has the
+span of the operand its errors can blame, see OperationError.
+
+Code objects are serialized with save_code/load_code, a versioned binary format built on the
+varints of archive.py:
+
+    header       CODE_MAGIC, version (u8), flags (u8)
+    source       only with FLAG_POSITIONS: filename, line count, line start deltas
+    code object  name, arguments, auto-return flag, constants (a code object nests here for every
+                 function), names, locals (0 for the program, else 1 + the number of slots and
+                 the name of each), span table (start, length, 1 + the index of the operand span
+                 of an operator or 0), instructions (opcode, arg, span index)
+
+A function body reads and assigns its locals through the slots resolver.py numbered, in the Frame
+of the call, like the visitor does.
+"""
+
+import mmap
+import struct
+
+from archive import ArchiveError, FLOAT, read_varint, write_varint, zigzag, unzigzag
+from error import Source, Span
+from resolver import Scope, resolve, mark_discarded
+from util import DispatchTable
+
+CODE_MAGIC = b"CBBC"
+CODE_VERSION = 4
+FLAG_POSITIONS = 1
+CODE_HEADER = struct.Struct("<4sBB")
+
+LOAD_NUMBER = 1         # push the Number of consts[arg]
+LOAD_STRING = 2         # push the String of consts[arg]
+LOAD_NULL = 3           # push Number.null
+LOAD_NAME = 4           # push the value of the variable names[arg]
+STORE_NAME = 5          # set names[arg] to the top of the stack, which stays
+BINARY_OP = 6           # pop right and left, push the result of the Value method names[arg]
+UNARY_OP = 7            # replace the top with the result of the Value method names[arg]
+SET_POS = 8             # does nothing; unary plus compiled to it when values were pointed at spans
+POP = 9
+POP_N = 10              # pop arg values, used by break and continue to leave a loop body
+JUMP = 11               # continue at instruction arg
+POP_JUMP_IF_FALSE = 12
+BUILD_LIST = 13         # replace the top arg values with a List of them
+NEW_ELEMENTS = 14       # push a Python list that collects the values of a loop body
+LIST_APPEND = 15        # pop a value and append it to the list arg places down the stack
+END_ELEMENTS = 16       # turn the collected Python list into a List
+FOR_PREP = 17           # pop step, end and start, push the state of a for loop over names[arg]
+FOR_ITER = 18           # assign the next value of the for loop and jump to arg, go on when it is done
+MAKE_FUNCTION = 19      # push a function for the code object consts[arg]
+CALL = 20               # pop arg arguments and the function, push what the call returns
+RETURN_VALUE = 21       # leave the code object with the top of the stack
+ESCAPE = 22             # break or continue outside of any loop
+END = 23                # leave the code object with the top of the stack as its value
+COUNT = 24              # count an evaluation of the node type names[arg] in code.counts, see metrics.py
+TAIL_CALL = 25          # CALL in tail position: a VM function runs in place of the running code object
+CHECK_BOUND = 26        # fail unless the value arg places down the stack is a Number, a bound of a for loop
+LOAD_LOCAL = 27         # push the value of slot arg, or of the caller's variable of its name while it is unset
+STORE_LOCAL = 28        # set slot arg to the top of the stack, which stays
+FOR_PREP_LOCAL = 29     # FOR_PREP for a loop over slot arg
+FOR_ITER_LOCAL = 30     # FOR_ITER for a loop over a slot
+POP_JUMP_IF_TRUE = 31
+STORE_NAME_POP = 32     # STORE_NAME that pops the value, for an assignment whose value is not used
+STORE_LOCAL_POP = 33    # STORE_LOCAL that pops the value
+
+OPNAMES = {globals()[name]: name for name in (
+    "LOAD_NUMBER", "LOAD_STRING", "LOAD_NULL", "LOAD_NAME", "STORE_NAME", "BINARY_OP", "UNARY_OP", "SET_POS",
+    "POP", "POP_N", "JUMP", "POP_JUMP_IF_FALSE", "BUILD_LIST", "NEW_ELEMENTS", "LIST_APPEND", "END_ELEMENTS",
+    "FOR_PREP", "FOR_ITER", "MAKE_FUNCTION", "CALL", "RETURN_VALUE", "ESCAPE", "END", "COUNT", "TAIL_CALL",
+    "CHECK_BOUND", "LOAD_LOCAL", "STORE_LOCAL", "FOR_PREP_LOCAL", "FOR_ITER_LOCAL", "POP_JUMP_IF_TRUE",
+    "STORE_NAME_POP", "STORE_LOCAL_POP",
+)}
+
+STACK_EFFECTS = {
+    LOAD_NUMBER: 1, LOAD_STRING: 1, LOAD_NULL: 1, LOAD_NAME: 1, STORE_NAME: 0, BINARY_OP: -1,
+    UNARY_OP: 0, SET_POS: 0, POP: -1, JUMP: 0, POP_JUMP_IF_FALSE: -1, NEW_ELEMENTS: 1, LIST_APPEND: -1,
+    END_ELEMENTS: 0, FOR_PREP: -2, FOR_ITER: 0, MAKE_FUNCTION: 1, RETURN_VALUE: -1, ESCAPE: 0, END: -1,
+    COUNT: 0, CHECK_BOUND: 0, LOAD_LOCAL: 1, STORE_LOCAL: 0, FOR_PREP_LOCAL: -2, FOR_ITER_LOCAL: 0,
+    POP_JUMP_IF_TRUE: -1, STORE_NAME_POP: -1, STORE_LOCAL_POP: -1,
+}
+
+# the instructions that only push a value, which a POP right after them takes back
+PUSHES = (LOAD_NUMBER, LOAD_STRING, LOAD_NULL)
+# a POP right after these is folded into them
+POPPING = {STORE_NAME: STORE_NAME_POP, STORE_LOCAL: STORE_LOCAL_POP}
+
+
+class CodeSpan(Span):
+    """The source range of an instruction"""
+    __slots__ = ("start", "end", "source")
+
+    def __init__(self, start, end, source):
+        self.start = start
+        self.end = end
+        self.source = source
+
+class OperatorSpan(CodeSpan):
+    """The source range of a BINARY_OP or UNARY_OP, and of the operand that its errors can blame"""
+    __slots__ = ("operand",)
+
+    def __init__(self, start, end, source, operand):
+        super().__init__(start, end, source)
+        self.operand = operand
+
+class CodeObject:
+    def __init__(self, name, arg_names, should_auto_return, instructions, consts, names, source=None, scope=None):
+        self.name = name
+        self.arg_names = arg_names
+        self.should_auto_return = should_auto_return
+        self.instructions = instructions
+        self.consts = consts
+        self.names = names
+        self.source = source
+        # the Scope of a function body, None for a program; local_names are its names by slot
+        self.scope = scope
+        self.local_names = list(scope.slots) if scope is not None else []
+        self.counts = None  # where COUNT instructions count
+        self.prepared = None  # the instructions as the VM runs them, see vm.prepare
+
+    def line_of(self, pc):
+        span = self.instructions[pc][2]
+        return span.pos_start.ln + 1
+
+    def disassemble(self):
+        lines = []
+        for pc, (op, arg, span) in enumerate(self.instructions):
+            if op in (LOAD_NAME, STORE_NAME, STORE_NAME_POP, BINARY_OP, UNARY_OP, FOR_PREP, COUNT):
+                detail = f"({self.names[arg]})"
+            elif op in (LOAD_NUMBER, LOAD_STRING, MAKE_FUNCTION):
+                detail = f"({self.consts[arg]!r})"
+            elif op in (LOAD_LOCAL, STORE_LOCAL, STORE_LOCAL_POP, FOR_PREP_LOCAL):
+                detail = f"({self.local_names[arg]})"
+            else:
+                detail = ""
+            lines.append(f"{pc:>4} {OPNAMES[op]:<18} {arg} {detail}".rstrip())
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return f"<code {self.name}>"
+
+
+class BytecodeCompiler:
+    """
+    Compiles one code object. The depth of the value stack is tracked while emitting, so break and
+    continue know how many values of an unfinished loop body to pop before they jump.
+    """
+    def __init__(self, name=None, arg_names=(), should_auto_return=False, source=None, scope=None):
+        self.name = name
+        self.arg_names = list(arg_names)
+        self.scope = scope
+        self.should_auto_return = should_auto_return
+        self.source = source
+        self.instructions = []
+        self.consts = []
+        self.const_idx = {}
+        self.names = []
+        self.name_idx = {}
+        self.spans = {}
+        self.depth = 0
+        # per enclosing loop: (depth of its body, continue jumps to patch, break jumps to patch)
+        self.loops = []
+        # the instructions jumps go to, which nothing can be folded across
+        self.labels = set()
+
+    @classmethod
+    def compile_program(cls, node):
+        compiler = cls("<program>", source=node.source)
+        mark_discarded(node)
+        compiler.compile(node)
+        compiler.emit(END, 0, node)
+        return compiler.code()
+
+    @classmethod
+    def register_node(cls, node_class, compile_method=None):
+        """Hook for new node types: compile_method(compiler, node) emits code leaving one value"""
+        return cls.compilers.register(node_class, compile_method)
+
+    def code(self):
+        return CodeObject(self.name, self.arg_names, self.should_auto_return, self.instructions,
+                          self.consts, self.names, self.source, self.scope)
+
+    def compile(self, node):
+        self.compilers[type(node)](self, node)
+
+    def span(self, node):
+        key = (node.start, node.end)
+        span = self.spans.get(key)
+        if span is None:
+            span = self.spans[key] = CodeSpan(node.start, node.end, node.source)
+        return span
+
+    def operator_span(self, node, operand):
+        key = (node.start, node.end, operand.start, operand.end)
+        span = self.spans.get(key)
+        if span is None:
+            span = self.spans[key] = OperatorSpan(node.start, node.end, node.source, self.span(operand))
+        return span
+
+    def add_const(self, value):
+        # 1 and 1.0 (and True) are equal keys, so the type is part of the key
+        key = (type(value), value)
+        idx = self.const_idx.get(key)
+        if idx is None:
+            idx = self.const_idx[key] = len(self.consts)
+            self.consts.append(value)
+        return idx
+
+    def add_name(self, name):
+        idx = self.name_idx.get(name)
+        if idx is None:
+            idx = self.name_idx[name] = len(self.names)
+            self.names.append(name)
+        return idx
+
+    def emit(self, op, arg, node, span=None):
+        """Append an instruction and return its index, for patching jumps"""
+        if op in (POP_N, BUILD_LIST):
+            self.depth -= arg - (op == BUILD_LIST)
+        elif op == CALL or op == TAIL_CALL:
+            self.depth -= arg
+        else:
+            self.depth += STACK_EFFECTS[op]
+        self.instructions.append((op, arg, span or self.span(node)))
+        return len(self.instructions) - 1
+
+    def patch(self, idx, target=None):
+        target = len(self.instructions) if target is None else target
+        op, arg, span = self.instructions[idx]
+        self.instructions[idx] = (op, target, span)
+        self.labels.add(target)
+
+    def emit_pop(self, node):
+        """Emit a POP of the value just computed, folded into the instruction before when that can be"""
+        instructions = self.instructions
+        # nothing can jump in between the two
+        if instructions and len(instructions) not in self.labels:
+            op, arg, span = instructions[-1]
+            if op in PUSHES:
+                instructions.pop()
+                self.depth -= 1
+                return
+            if op in POPPING:
+                instructions[-1] = (POPPING[op], arg, span)
+                self.depth -= 1
+                return
+        self.emit(POP, 0, node)
+
+    def compile_NumberNode(self, node):
+        self.emit(LOAD_NUMBER, self.add_const(node.tok.value), node)
+
+    def compile_StringNode(self, node):
+        self.emit(LOAD_STRING, self.add_const(node.tok.value), node)
+
+    def compile_BinOpNode(self, node):
+        self.compile(node.left_node)
+        self.compile(node.right_node)
+        self.emit(BINARY_OP, self.add_name(node.operation), node, self.operator_span(node, node.right_node))
+
+    def compile_UnaryOpNode(self, node):
+        self.compile(node.node)
+        if node.operation is not None:
+            self.emit(UNARY_OP, self.add_name(node.operation), node, self.operator_span(node, node.node))
+
+    def compile_VarAccessNode(self, node):
+        if node.slot is not None:
+            self.emit(LOAD_LOCAL, node.slot, node)
+        else:
+            self.emit(LOAD_NAME, self.add_name(node.var_name_tok.value), node)
+
+    def compile_VarAssignNode(self, node):
+        self.compile(node.value_node)
+        if node.slot is not None:
+            self.emit(STORE_LOCAL, node.slot, node)
+        else:
+            self.emit(STORE_NAME, self.add_name(node.var_name_tok.value), node)
+
+    def compile_IfNode(self, node):
+        base = self.depth
+        end_jumps = []
+        for condition, expr, should_return_null in node.cases:
+            self.compile(condition)
+            next_case = self.emit(POP_JUMP_IF_FALSE, 0, condition)
+            self.compile_branch(expr, should_return_null)
+            end_jumps.append(self.emit(JUMP, 0, expr))
+            self.patch(next_case)
+            self.depth = base
+
+        if node.else_case is not None:
+            expr, should_return_null = node.else_case
+            self.compile_branch(expr, should_return_null)
+        else:
+            self.emit(LOAD_NULL, 0, node)
+        for jump in end_jumps:
+            self.patch(jump)
+
+    def compile_branch(self, expr, should_return_null):
+        self.compile(expr)
+        if should_return_null:
+            self.emit_pop(expr)
+            self.emit(LOAD_NULL, 0, expr)
+
+    # the test of a loop comes after its body, which the loop jumps over once to get to it, so
+    # every iteration runs one jump less
+
+    def compile_WhileNode(self, node):
+        # a loop whose value is not used keeps none of the values of its body
+        if not node.discarded:
+            self.emit(NEW_ELEMENTS, 0, node)
+        entry = self.emit(JUMP, 0, node)
+        top = len(self.instructions)
+        self.labels.add(top)
+        continue_jumps, exit_jumps = self.compile_loop_body(node, 1)
+        self.patch(entry)
+        for jump in continue_jumps:
+            self.patch(jump)
+        self.compile(node.condition)
+        self.emit(POP_JUMP_IF_TRUE, top, node.condition)
+        for jump in exit_jumps:
+            self.patch(jump)
+        self.compile_loop_value(node)
+
+    def compile_ForNode(self, node):
+        if not node.discarded:
+            self.emit(NEW_ELEMENTS, 0, node)
+        bound_nodes = [node.start_node, node.end_node] + ([node.step_node] if node.step_node is not None else [])
+        for bound_node in bound_nodes:
+            self.compile(bound_node)
+        # checked once all of them are evaluated, like the other engines do
+        for offset, bound_node in enumerate(bound_nodes):
+            self.emit(CHECK_BOUND, len(bound_nodes) - offset, bound_node)
+        if node.step_node is None:
+            self.emit(LOAD_NUMBER, self.add_const(1), node)
+        if node.slot is not None:
+            self.emit(FOR_PREP_LOCAL, node.slot, node)
+        else:
+            self.emit(FOR_PREP, self.add_name(node.var_name_tok.value), node)
+        entry = self.emit(JUMP, 0, node)
+        top = len(self.instructions)
+        self.labels.add(top)
+        continue_jumps, exit_jumps = self.compile_loop_body(node, 2)
+        self.patch(entry)
+        for jump in continue_jumps:
+            self.patch(jump)
+        self.emit(FOR_ITER_LOCAL if node.slot is not None else FOR_ITER, top, node)
+        for jump in exit_jumps:
+            self.patch(jump)
+        self.emit(POP, 0, node)  # the loop state
+        self.compile_loop_value(node)
+
+    def compile_loop_body(self, node, elements_offset):
+        """Emit the body of a loop; returns the continue and break jumps in it, to patch"""
+        continue_jumps, exit_jumps = [], []
+        self.loops.append((self.depth, continue_jumps, exit_jumps))
+        self.compile(node.body_node)
+        if node.discarded:
+            self.emit_pop(node.body_node)
+        else:
+            self.emit(LIST_APPEND, elements_offset, node.body_node)
+        self.loops.pop()
+        return continue_jumps, exit_jumps
+
+    def compile_loop_value(self, node):
+        if node.discarded:
+            self.emit(LOAD_NULL, 0, node)
+        else:
+            self.emit(END_ELEMENTS, 0, node)
+
+    def compile_FunDefNode(self, node):
+        func_name = node.var_name_tok.value if node.var_name_tok else None
+        # numbers the locals and marks the calls in tail position and the discarded loops
+        scope = node.scope if node.scope is not None else resolve(node)
+        compiler = type(self)(func_name, scope.arg_names, node.should_auto_return, self.source, scope)
+        compiler.compile(node.body_node)
+        compiler.emit(END, 0, node.body_node)
+        self.emit(MAKE_FUNCTION, self.add_const(compiler.code()), node)
+        if node.slot is not None:
+            self.emit(STORE_LOCAL, node.slot, node)
+        elif func_name is not None:
+            self.emit(STORE_NAME, self.add_name(func_name), node)
+
+    def compile_CallNode(self, node):
+        self.compile(node.node_to_call)
+        for arg_node in node.arg_nodes:
+            self.compile(arg_node)
+        self.emit(TAIL_CALL if node.tail else CALL, len(node.arg_nodes), node)
+
+    def compile_ListNode(self, node):
+        if node.discarded:
+            for element in node.element_nodes:
+                self.compile(element)
+                self.emit_pop(element)
+            self.emit(LOAD_NULL, 0, node)
+            return
+        for element in node.element_nodes:
+            self.compile(element)
+        self.emit(BUILD_LIST, len(node.element_nodes), node)
+
+    def compile_ReturnNode(self, node):
+        if node.node_to_return:
+            self.compile(node.node_to_return)
+        else:
+            self.emit(LOAD_NULL, 0, node)
+        self.emit(RETURN_VALUE, 0, node)
+        self.depth += 1  # nothing after a return runs, but the statement still counts as a value
+
+    def compile_ContinueNode(self, node):
+        self.compile_jump_out(node, True)
+
+    def compile_BreakNode(self, node):
+        self.compile_jump_out(node, False)
+
+    def compile_jump_out(self, node, is_continue):
+        depth = self.depth
+        if not self.loops:
+            self.emit(ESCAPE, 0, node)
+        else:
+            body_depth, continue_jumps, exit_jumps = self.loops[-1]
+            if depth > body_depth:
+                self.emit(POP_N, depth - body_depth, node)
+            (continue_jumps if is_continue else exit_jumps).append(self.emit(JUMP, 0, node))
+        self.depth = depth + 1  # like return, the statement still counts as a value
+
+BytecodeCompiler.compilers = DispatchTable(BytecodeCompiler, "compile_")
+
+
+CONST_INT = 0
+CONST_FLOAT = 1
+CONST_STRING = 2
+CONST_CODE = 3
+
+def save_code(code, filepath, positions=True):
+    data = dump_code(code, positions)
+    with open(filepath, "wb") as f:
+        f.write(data)
+    return data
+
+def load_code(filepath):
+    with open(filepath, "rb") as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise ArchiveError(f"{filepath} is empty")
+    with buffer:
+        return CodeReader(buffer).read()
+
+def dump_code(code, positions=True):
+    source = code.source
+    positions = positions and source is not None
+    out = bytearray(CODE_HEADER.pack(CODE_MAGIC, CODE_VERSION, FLAG_POSITIONS if positions else 0))
+    if positions:
+        write_string(out, source.filename)
+        write_varint(out, len(source.line_starts))
+        previous = 0
+        for line_start in source.line_starts:
+            write_varint(out, line_start - previous)
+            previous = line_start
+    write_code(out, code, positions)
+    return bytes(out)
+
+def loads_code(buffer):
+    return CodeReader(buffer).read()
+
+def write_string(out, string):
+    # surrogatepass: a string literal may hold a lone surrogate, which plain utf-8 rejects
+    data = string.encode("utf-8", "surrogatepass")
+    write_varint(out, len(data))
+    out += data
+
+def write_code(out, code, positions):
+    if code.name is None:
+        write_varint(out, 0)
+    else:
+        write_varint(out, 1)
+        write_string(out, code.name)
+    write_varint(out, len(code.arg_names))
+    for arg_name in code.arg_names:
+        write_string(out, arg_name)
+    write_varint(out, int(code.should_auto_return))
+
+    write_varint(out, len(code.consts))
+    for const in code.consts:
+        if isinstance(const, CodeObject):
+            write_varint(out, CONST_CODE)
+            write_code(out, const, positions)
+        elif isinstance(const, str):
+            write_varint(out, CONST_STRING)
+            write_string(out, const)
+        elif isinstance(const, float):
+            write_varint(out, CONST_FLOAT)
+            out += FLOAT.pack(const)
+        else:
+            write_varint(out, CONST_INT)
+            write_varint(out, zigzag(const))
+
+    write_varint(out, len(code.names))
+    for name in code.names:
+        write_string(out, name)
+    if code.scope is None:
+        write_varint(out, 0)
+    else:
+        write_varint(out, 1 + len(code.local_names))
+        for name in code.local_names:
+            write_string(out, name)
+
+    span_idx = {}
+    for op, arg, span in code.instructions:
+        if span not in span_idx:
+            # the operand span of an operator is written before it
+            if type(span) is OperatorSpan and span.operand not in span_idx:
+                span_idx[span.operand] = len(span_idx)
+            span_idx[span] = len(span_idx)
+    write_varint(out, len(span_idx) if positions else 0)
+    if positions:
+        for span in span_idx:
+            write_varint(out, span.start)
+            write_varint(out, span.end - span.start)
+            write_varint(out, span_idx[span.operand] + 1 if type(span) is OperatorSpan else 0)
+
+    write_varint(out, len(code.instructions))
+    for op, arg, span in code.instructions:
+        write_varint(out, op)
+        write_varint(out, arg)
+        write_varint(out, span_idx[span] if positions else 0)
+
+class CodeReader:
+    def __init__(self, buffer):
+        if len(buffer) < CODE_HEADER.size:
+            raise ArchiveError("Not a code file: too short")
+        magic, version, flags = CODE_HEADER.unpack_from(buffer, 0)
+        if magic != CODE_MAGIC:
+            raise ArchiveError("Not a code file: bad magic")
+        if version != CODE_VERSION:
+            raise ArchiveError(f"Unsupported code version {version}")
+        self.buffer = buffer
+        self.idx = CODE_HEADER.size
+        self.source = None
+        if flags & FLAG_POSITIONS:
+            filename = self.string()
+            line_starts = []
+            line_start = 0
+            for i in range(self.varint()):
+                line_start += self.varint()
+                line_starts.append(line_start)
+            self.source = Source(filename, None, line_starts)
+        # without positions every instruction points at the start of the program
+        self.no_span = CodeSpan(0, 0, None)
+        self.no_operator_span = OperatorSpan(0, 0, None, self.no_span)
+
+    def varint(self):
+        value, self.idx = read_varint(self.buffer, self.idx)
+        return value
+
+    def string(self):
+        length = self.varint()
+        string = str(self.buffer[self.idx:self.idx + length], "utf-8", "surrogatepass")
+        self.idx += length
+        return string
+
+    def read(self):
+        name = self.string() if self.varint() else None
+        arg_names = [self.string() for i in range(self.varint())]
+        should_auto_return = bool(self.varint())
+
+        consts = []
+        for i in range(self.varint()):
+            tag = self.varint()
+            if tag == CONST_CODE:
+                consts.append(self.read())
+            elif tag == CONST_STRING:
+                consts.append(self.string())
+            elif tag == CONST_FLOAT:
+                consts.append(FLOAT.unpack_from(self.buffer, self.idx)[0])
+                self.idx += FLOAT.size
+            elif tag == CONST_INT:
+                consts.append(unzigzag(self.varint()))
+            else:
+                raise ArchiveError(f"Unknown constant tag {tag}")
+        names = [self.string() for i in range(self.varint())]
+        scope = None
+        local_count = self.varint()
+        if local_count:
+            # the arguments take the first slots again, the names of the others follow in order
+            scope = Scope(arg_names)
+            for i in range(local_count - 1):
+                if scope.add(self.string()) != i:
+                    raise ArchiveError("Locals do not match the arguments")
+
+        spans = []
+        for i in range(self.varint()):
+            start = self.varint()
+            end = start + self.varint()
+            operand = self.varint()
+            if operand:
+                spans.append(OperatorSpan(start, end, self.source, spans[operand - 1]))
+            else:
+                spans.append(CodeSpan(start, end, self.source))
+        instructions = []
+        for i in range(self.varint()):
+            op = self.varint()
+            if op not in OPNAMES:
+                raise ArchiveError(f"Unknown opcode {op}")
+            arg = self.varint()
+            span_idx = self.varint()
+            if spans:
+                span = spans[span_idx]
+            else:
+                span = self.no_operator_span if op in (BINARY_OP, UNARY_OP) else self.no_span
+            instructions.append((op, arg, span))
+        return CodeObject(name, arg_names, should_auto_return, instructions, consts, names, self.source, scope)
@@ -0,0 +1,163 @@
+import hashlib
+import os
+import struct
+import tempfile
+
+from archive import ArchiveError, VERSION, encode_archive, load_archive
+from util import global_classes
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "canobasic")
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+SUFFIX = ".cba"
+
+
+class CompileCache:
+    """
+    On-disk cache of parsed scripts, like __pycache__ for BASIC. An entry is the binary archive
+    (see archive.py) of one script, named after the hash of its filename and text, so an edited
+    file simply misses. Entries are written to a temporary file and renamed into place, so several
+    processes can share one directory; a hit touches the entry and the least recently used entries
+    are dropped once the directory grows past max_bytes.
+
+    The directory and the cap can be set with CANOBASIC_CACHE_DIR and CANOBASIC_CACHE_SIZE,
+    CANOBASIC_NO_CACHE turns the default cache off.
+    """
+    _default = None
+
+    def __init__(self, root=None, max_bytes=None, enabled=True):
+        self.root = root or os.environ.get("CANOBASIC_CACHE_DIR") or DEFAULT_CACHE_DIR
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("CANOBASIC_CACHE_SIZE", DEFAULT_MAX_BYTES))
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.errors = 0
+
+    @classmethod
+    def default(cls):
+        if cls._default is None:
+            cls._default = cls(enabled=not os.environ.get("CANOBASIC_NO_CACHE"))
+        return cls._default
+
+    @classmethod
+    def set_default(cls, cache):
+        """Install the cache used by run_script; returns the one it replaces"""
+        previous = cls._default
+        cls._default = cache
+        return previous
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "errors": self.errors,
+        }
+
+    def path_for(self, text, filename):
+        key = hashlib.sha256(f"{VERSION}\0{filename}\0{text}".encode("utf-8", "surrogatepass")).hexdigest()
+        return os.path.join(self.root, key + SUFFIX)
+
+    def compile(self, text, filename):
+        """Returns (ast, error) for the script, parsing it only when it is not cached yet"""
+        if not self.enabled:
+            return parse(text, filename)
+
+        path = self.path_for(text, filename)
+        ast = self.load(path)
+        if ast is not None:
+            self.hits += 1
+            return ast, None
+
+        self.misses += 1
+        ast, error = parse(text, filename)
+        if error is None:
+            self.store(path, ast)
+        return ast, error
+
+    def load(self, path):
+        try:
+            ast = load_archive(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ArchiveError, IndexError, ValueError, struct.error):
+            # a damaged entry is dropped and written again
+            self.errors += 1
+            self.remove(path)
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return ast
+
+    def store(self, path, ast):
+        try:
+            data = encode_archive(ast)
+            os.makedirs(self.root, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                self.remove(tmp_path)
+                raise
+        except (OSError, ArchiveError, UnicodeError):
+            # the cache is only an optimisation, a read-only or full disk must not stop the script
+            self.errors += 1
+            return
+        self.stores += 1
+        self.evict()
+
+    def evict(self):
+        entries = []
+        total = 0
+        try:
+            with os.scandir(self.root) as it:
+                for entry in it:
+                    if not entry.name.endswith(SUFFIX): continue
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue  # removed by another process
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        except OSError:
+            return
+
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_bytes: break
+            if self.remove(path):
+                self.evictions += 1
+            total -= size
+
+    def clear(self):
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if name.endswith(SUFFIX):
+                self.remove(os.path.join(self.root, name))
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+def parse(text, filename):
+    lexer = global_classes["Lexer"](text, filename)
+    parser = global_classes["StreamParser"](lexer)
+    return parser.parse()
+
+
+global_classes["CompileCache"] = CompileCache
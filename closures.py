@@ -0,0 +1,305 @@
+from error import Error, RTError, OperationError, Failure, ReturnSignal, BreakSignal, ContinueSignal
+from nodes import NumberNode, StringNode
+from resolver import resolve, mark_discarded
+from util import DispatchTable, counter, global_engines
+from values import Number, String, List, EngineFunction, TailCall, loop_bounds
+
+
+class ClosureCompiler:
+    """
+    Turns a tree into nested Python closures, one per node, each taking the context to run in.
+    Everything the visitor works out on every evaluation (which method to call, child nodes,
+    names, flags, the slots resolver.py gave the locals of a function) is looked up once here and
+    captured, and loops whose value is discarded keep none of the values of their body. return, break,
+    continue and runtime errors unwind as exceptions instead of being polled after every child,
+    and a call in tail position returns a TailCall to the call loop of its function (see
+    EngineFunction), which runs it in a Frame like Interpreter.call_function does.
+    The closures build the same values as Interpreter, so both engines can share functions: a value
+    read from a variable is the stored object itself, and errors are located at the nodes.
+    """
+    def compile(self, node):
+        return self.compilers[type(node)](self, node)
+
+    @classmethod
+    def register_node(cls, node_class, compile_method=None):
+        """Hook for new node types: compile_method(compiler, node) returns a closure of the context"""
+        return cls.compilers.register(node_class, compile_method)
+
+    def compile_NumberNode(self, node):
+        constant = Number.cached(node.tok.value)
+        return lambda context: constant
+
+    def compile_StringNode(self, node):
+        constant = String(node.tok.value)
+        return lambda context: constant
+
+    def constant(self, node):
+        """The value of a literal, which a closure can capture instead of calling the literal's closure"""
+        if type(node) is NumberNode:
+            return Number.cached(node.tok.value)
+        if type(node) is StringNode:
+            return String(node.tok.value)
+        return None
+
+    def compile_BinOpNode(self, node):
+        left = self.compile(node.left_node)
+        operation, right_node = node.operation, node.right_node
+        constant = self.constant(right_node)
+        if constant is not None:
+            # like n - 1
+            def bin_op_constant(context):
+                result, error = getattr(left(context), operation)(constant)
+                if error:
+                    raise Failure(error.locate(node, right_node, context) if isinstance(error, OperationError) else error)
+                return result
+            return bin_op_constant
+
+        right = self.compile(right_node)
+        def bin_op(context):
+            result, error = getattr(left(context), operation)(right(context))
+            if error:
+                raise Failure(error.locate(node, right_node, context) if isinstance(error, OperationError) else error)
+            return result
+        return bin_op
+
+    def compile_UnaryOpNode(self, node):
+        operand = self.compile(node.node)
+        operation = node.operation
+        if operation is None:
+            return operand
+        def unary_op(context):
+            result, error = getattr(operand(context), operation)()
+            if error:
+                raise Failure(error.locate(node.node, node.node, context) if isinstance(error, OperationError) else error)
+            return result
+        return unary_op
+
+    def compile_VarAccessNode(self, node):
+        var_name, slot = node.var_name_tok.value, node.slot
+        if slot is not None:
+            # a local of the function being run; until it is bound, the caller's variable is read
+            def local_access(context):
+                value = context.symbol_table.slots[slot]
+                if value is None:
+                    value = context.symbol_table.get(var_name)
+                    if value is None:
+                        raise Failure(RTError(node.pos_start, node.pos_end, f"'{var_name}' is not defined", context))
+                return value
+            return local_access
+
+        def var_access(context):
+            value = context.symbol_table.get(var_name)
+            if value is None:
+                raise Failure(RTError(node.pos_start, node.pos_end, f"'{var_name}' is not defined", context))
+            return value
+        return var_access
+
+    def compile_VarAssignNode(self, node):
+        var_name, slot = node.var_name_tok.value, node.slot
+        expr = self.compile(node.value_node)
+        if slot is not None:
+            def local_assign(context):
+                value = expr(context)
+                context.symbol_table.slots[slot] = value
+                return value
+            return local_assign
+
+        def var_assign(context):
+            value = expr(context)
+            context.symbol_table.set(var_name, value)
+            return value
+        return var_assign
+
+    def compile_IfNode(self, node):
+        cases = [(self.compile(condition), self.compile(expr), should_return_null)
+                 for condition, expr, should_return_null in node.cases]
+        else_expr, else_returns_null = None, False
+        if node.else_case is not None:
+            else_expr = self.compile(node.else_case[0])
+            else_returns_null = node.else_case[1]
+
+        def if_(context):
+            for condition, expr, should_return_null in cases:
+                if condition(context).is_true():
+                    value = expr(context)
+                    return Number.null if should_return_null else value
+            if else_expr is not None:
+                value = else_expr(context)
+                return Number.null if else_returns_null else value
+            return Number.null
+        return if_
+
+    def compile_WhileNode(self, node):
+        condition = self.compile(node.condition)
+        body = self.compile(node.body_node)
+        discarded = node.discarded
+        def while_(context):
+            # a loop whose value is not used keeps none of the values of its body
+            elements = None if discarded else []
+            while condition(context).is_true():
+                try:
+                    value = body(context)
+                except ContinueSignal:
+                    continue
+                except BreakSignal:
+                    break
+                if elements is not None:
+                    elements.append(value)
+            return Number.null if elements is None else List(elements)
+        return while_
+
+    def compile_ForNode(self, node):
+        var_name, slot = node.var_name_tok.value, node.slot
+        start_expr = self.compile(node.start_node)
+        end_expr = self.compile(node.end_node)
+        step_expr = self.compile(node.step_node) if node.step_node is not None else None
+        body = self.compile(node.body_node)
+        discarded = node.discarded
+        def for_(context):
+            elements = None if discarded else []
+            start = start_expr(context)
+            end = end_expr(context)
+            step = step_expr(context) if step_expr is not None else None
+            bounds, error = loop_bounds(node, context, start, end, step)
+            if error: raise Failure(error)
+            # the counter is a Python number (a range for ints), only the loop variable is a Number
+            symbol_table = context.symbol_table
+            slots = symbol_table.slots if slot is not None else None
+            for i in counter(*bounds):
+                if slots is not None:
+                    slots[slot] = Number.cached(i)
+                else:
+                    symbol_table.set(var_name, Number.cached(i))
+                try:
+                    value = body(context)
+                except ContinueSignal:
+                    continue
+                except BreakSignal:
+                    break
+                if elements is not None:
+                    elements.append(value)
+            return Number.null if elements is None else List(elements)
+        return for_
+
+    def compile_FunDefNode(self, node):
+        func_name = node.var_name_tok.value if node.var_name_tok else None
+        body_node, slot = node.body_node, node.slot
+        should_auto_return = node.should_auto_return
+        # numbers the locals and marks the calls in tail position and the discarded loops
+        scope = node.scope if node.scope is not None else resolve(node)
+        # the body is compiled once here and shared by every Function value made from this node
+        body = self.compile(body_node)
+        def fun_def(context):
+            func_value = CompiledFunction(func_name, scope.arg_names, body_node, should_auto_return, scope, body)\
+                .set_context(context).set_pos(node)
+            if slot is not None:
+                context.symbol_table.slots[slot] = func_value
+            elif func_name is not None:
+                context.symbol_table.set(func_name, func_value)
+            return func_value
+        return fun_def
+
+    def compile_CallNode(self, node):
+        callee = self.compile(node.node_to_call)
+        arg_exprs = [self.compile(arg_node) for arg_node in node.arg_nodes]
+        tail = node.tail
+        def call(context):
+            value_to_call = callee(context)
+            args = [arg_expr(context) for arg_expr in arg_exprs]
+            if type(value_to_call) is CompiledFunction:
+                # the number of arguments of a call site is fixed, so it is only checked for a
+                # function it has not called, like in Interpreter.visit_CallNode
+                arg_names = value_to_call.arg_names
+                if node.checked_args is not arg_names:
+                    succ, error = value_to_call.check_args(arg_names, args, context, node)
+                    if succ is False: raise Failure(error)
+                    node.checked_args = arg_names
+                if tail:
+                    # runs in the call loop of the function this call returns from
+                    return TailCall(value_to_call, args, node, context)
+                return_value = value_to_call.call(args, context, node)
+            else:
+                # execute hands back the error instead of a value when the call fails
+                return_value = value_to_call.execute(args, context, node)
+            if isinstance(return_value, Error): raise Failure(return_value)
+            return return_value
+        return call
+
+    def compile_ListNode(self, node):
+        element_exprs = [self.compile(element) for element in node.element_nodes]
+        if node.discarded:
+            def list_discarded(context):
+                for element_expr in element_exprs:
+                    element_expr(context)
+                return Number.null
+            return list_discarded
+
+        def list_(context):
+            return List([element_expr(context) for element_expr in element_exprs])
+        return list_
+
+    def compile_ReturnNode(self, node):
+        expr = self.compile(node.node_to_return) if node.node_to_return else None
+        def return_(context):
+            raise ReturnSignal(expr(context) if expr is not None else Number.null)
+        return return_
+
+    def compile_ContinueNode(self, node):
+        def continue_(context):
+            raise ContinueSignal()
+        return continue_
+
+    def compile_BreakNode(self, node):
+        def break_(context):
+            raise BreakSignal()
+        return break_
+
+ClosureCompiler.compilers = DispatchTable(ClosureCompiler, "compile_")
+
+
+class CompiledFunction(EngineFunction):
+    """A Function whose body was compiled by ClosureCompiler"""
+    __slots__ = ("body",)
+
+    def __init__(self, name, arg_names, body_node, should_auto_return, scope, body):
+        super().__init__(name, arg_names, body_node, should_auto_return, scope)
+        self.body = body
+
+    def run_body(self, exec_ctx, context, span):
+        try:
+            value = self.body(exec_ctx)
+        except ReturnSignal as signal:
+            return signal.value
+        except Failure as failure:
+            return failure.error
+        except (BreakSignal, ContinueSignal):
+            return self.escaped(context, span)
+        return value if self.should_auto_return else Number.null
+
+    def copy(self):
+        copy = CompiledFunction(self.name, self.arg_names, self.body_node, self.should_auto_return, self.scope, self.body)
+        copy.set_context(self.context)
+        copy.set_pos(self.span)
+        return copy
+
+
+class ClosureInterpreter:
+    """Runs a tree with ClosureCompiler; has the visit()/error interface of Interpreter"""
+    def __init__(self):
+        self.error = None
+        self.compiler = ClosureCompiler()
+
+    def visit(self, node, context):
+        mark_discarded(node)
+        code = self.compiler.compile(node)
+        try:
+            return code(context)
+        except Failure as failure:
+            self.error = failure.error
+        except (ReturnSignal, BreakSignal, ContinueSignal):
+            # like the visitor, a return or break outside of a function or loop ends the program
+            pass
+        return None
+
+
+global_engines["closure"] = ClosureInterpreter
@@ -1,3 +1,8 @@
+from bisect import bisect_right
+
+from util import global_counters
+
+
 class Error:
     def __init__(self, pos_start, pos_end, error_name, details):
         self.pos_start = pos_start
@@ -26,6 +31,7 @@ class RTError(Error):
     def __init__(self, pos_start, pos_end, details, context):
         super().__init__(pos_start, pos_end, "Runtime Error", details)
         self.context = context
+        global_counters.errors += 1
 
     def __repr__(self):
         result = self.generate_traceback()
@@ -44,22 +50,100 @@ class RTError(Error):
             ctx = ctx.parent
         return 'Traceback: \n' + result
 
-class Position:
-    def __init__(self, idx, ln, col, filename=None, text=None):
-        self.idx = idx
-        self.ln = ln
-        self.col = col
+class OperationError(RTError):
+    """
+    A runtime error of an operator (or of calling a value that is not a function), made by the Value
+    that refused it. It blames the whole operation or, for a bad right operand such as a zero
+    divisor, only that operand. Values that are shared instead of copied on every read do not know
+    where they were evaluated, so an engine doing that points the error at its nodes with locate().
+    """
+    def __init__(self, pos_start, pos_end, details, context, blames_right=False):
+        super().__init__(pos_start, pos_end, details, context)
+        self.blames_right = blames_right
+
+    def locate(self, node, right_node, context):
+        span = right_node if self.blames_right else node
+        self.pos_start = span.pos_start
+        self.pos_end = span.pos_end
+        self.context = context
+        return self
+
+class Failure(Exception):
+    """Carries a runtime error out of the engines that unwind instead of returning it"""
+    def __init__(self, error):
+        self.error = error
+
+# return, break and continue unwind to the function or loop they leave. They are raised new every
+# time: a raised instance keeps its traceback, so raising the same one again would grow it
+
+class ReturnSignal(Exception):
+    def __init__(self, value):
+        self.value = value
+
+class BreakSignal(Exception):
+    pass
+
+class ContinueSignal(Exception):
+    pass
+
+class Source:
+    """
+    The text of one script, shared by every token and node lexed from it. The line-start
+    index is only built the first time a line or column is asked for (i.e. when an error is shown).
+    """
+    def __init__(self, filename, text=None, line_starts=None):
         self.filename = filename
         self.text = text
+        self._line_starts = line_starts
 
-    def advance(self, current_char=None):
-        self.idx += 1
-        self.col += 1
+    @property
+    def line_starts(self):
+        if self._line_starts is None:
+            line_starts = [0]
+            text = self.text or ""
+            idx = text.find('\n')
+            while idx >= 0:
+                line_starts.append(idx + 1)
+                idx = text.find('\n', idx + 1)
+            self._line_starts = line_starts
+        return self._line_starts
 
-        if current_char == '\n':
-            self.ln += 1
-            self.col = 0
-        return self
+    def line_col(self, idx):
+        line_starts = self.line_starts
+        ln = bisect_right(line_starts, idx) - 1
+        return ln, idx - line_starts[ln]
+
+class Span:
+    """Base for tokens and nodes, which only keep start/end offsets into their Source."""
+    __slots__ = ()
+
+    @property
+    def pos_start(self):
+        return Position(self.start, self.source)
+
+    @property
+    def pos_end(self):
+        return Position(self.end, self.source)
+
+class Position:
+    __slots__ = ("idx", "source")
+
+    def __init__(self, idx, source=None):
+        self.idx = idx
+        self.source = source
+
+    @property
+    def ln(self):
+        return self.source.line_col(self.idx)[0] if self.source is not None else 0
+
+    @property
+    def col(self):
+        return self.source.line_col(self.idx)[1] if self.source is not None else self.idx
+
+    @property
+    def filename(self):
+        return self.source.filename if self.source is not None else None
 
-    def copy(self):
-        return Position(self.idx, self.ln, self.col, self.filename, self.text)
+    @property
+    def text(self):
+        return self.source.text if self.source is not None else None
@@ -1,244 +1,295 @@
-from lexer import CONSTANT
 from values import *
+from error import Failure, ReturnSignal, BreakSignal, ContinueSignal
+from resolver import resolve, mark_discarded
+from util import DispatchTable, TailTable, counter, global_counters, global_engines
 
 class Interpreter:
+    """
+    Walks the tree. return, break, continue and runtime errors unwind as exceptions (see error.py)
+    to the function, loop or visit() call they leave, so evaluating a child needs no checks after it.
+    """
     def __init__(self):
         self.error = None
-        self.func_return_value = None
-        self.loop_should_continue = False
-        self.loop_should_break = False
-
-    def should_return(self):
-        return self.error or \
-               self.func_return_value or \
-               self.loop_should_continue or \
-               self.loop_should_break
+        self.running = False
 
     def visit(self, node, context):
-        method_name = f'visit_{type(node).__name__}'
-        method = getattr(self, method_name, self.no_visit_method)
-        return method(node, context)
+        """Evaluate a tree; on a runtime error it returns None and leaves the error in .error"""
+        if self.running:
+            # a node registered with register_node evaluating its children
+            return self.visitors[type(node)](self, node, context)
+        self.running = True
+        mark_discarded(node)
+        try:
+            return self.visitors[type(node)](self, node, context)
+        except Failure as failure:
+            self.error = failure.error
+        except (ReturnSignal, BreakSignal, ContinueSignal):
+            pass  # like a return, break or continue outside of a function ends the program
+        finally:
+            self.running = False
+        return None
+
+    @classmethod
+    def register_node(cls, node_class, visit_method=None):
+        """
+        Hook for new node types: visit_method(interpreter, node, context) evaluates node_class.
+        It evaluates children with interpreter.visit; return, break, continue and errors unwind
+        through it as exceptions, so there is no should_return() to poll after a child any more.
+        """
+        return cls.visitors.register(node_class, visit_method)
 
-    def no_visit_method(self, node, context):
-        raise Exception(f"No visit_{type(node).__name__} method defined")
+    # children are evaluated with self.visitors[type(child)](self, child, context) directly, a call less per node.
+    # values are not copied or pointed at the node that evaluated them; a value read from a variable
+    # is the stored object itself. Errors of operators are located at the nodes instead, see OperationError
 
     def visit_NumberNode(self, node, context):
-        return Number(node.tok.value).set_pos(node.pos_start, node.pos_end).set_context(context)
+        if node.constant is None:
+            node.constant = Number.cached(node.tok.value)
+        return node.constant
 
     def visit_StringNode(self, node, context):
-        return String(node.tok.value).set_pos(node.pos_start, node.pos_end).set_context(context)
+        if node.constant is None:
+            node.constant = String(node.tok.value)
+        return node.constant
 
     def visit_BinOpNode(self, node, context):
-        left = self.visit(node.left_node, context)
-        if self.should_return(): return None
-        right = self.visit(node.right_node, context)
-        if self.should_return(): return None
-
-        error = None
-        if node.op_tok.type == CONSTANT.PLUS:
-            result, error = left.added_to(right)
-        elif node.op_tok.type == CONSTANT.MINUS:
-            result, error = left.subbed_by(right)
-        elif node.op_tok.type == CONSTANT.MUL:
-            result, error = left.multed_by(right)
-        elif node.op_tok.type == CONSTANT.DIV:
-            result, error = left.dived_by(right)
-        elif node.op_tok.type == CONSTANT.POW:
-            result, error = left.powed_by(right)
-        elif node.op_tok.type == CONSTANT.EE:
-            result, error = left.get_comparison_eq(right)
-        elif node.op_tok.type == CONSTANT.NE:
-            result, error = left.get_comparison_ne(right)
-        elif node.op_tok.type == CONSTANT.LT:
-            result, error = left.get_comparison_lt(right)
-        elif node.op_tok.type == CONSTANT.GT:
-            result, error = left.get_comparison_gt(right)
-        elif node.op_tok.type == CONSTANT.LTE:
-            result, error = left.get_comparison_lte(right)
-        elif node.op_tok.type == CONSTANT.GTE:
-            result, error = left.get_comparison_gte(right)
-        elif node.op_tok.matches(CONSTANT.KEYWORD, 'and'):
-            result, error = left.anded_by(right)
-        elif node.op_tok.matches(CONSTANT.KEYWORD, 'or'):
-            result, error = left.ored_by(right)
-
+        visitors, left_node, right_node = self.visitors, node.left_node, node.right_node
+        left = visitors[type(left_node)](self, left_node, context)
+        right = visitors[type(right_node)](self, right_node, context)
+        result, error = getattr(left, node.operation)(right)
         if error:
-            self.error = error
-            return None
-        else:
-            return result.set_pos(node.pos_start, node.pos_end)
+            raise Failure(error.locate(node, node.right_node, context) if isinstance(error, OperationError) else error)
+        return result
 
     def visit_UnaryOpNode(self, node, context):
-        number = self.visit(node.node, context)
-        if self.should_return(): return None
-
-        error = None
-        if node.op_tok.type == CONSTANT.MINUS:
-            number, error = number.multed_by(Number(-1))
-        elif node.op_tok.matches(CONSTANT.KEYWORD, "not"):
-            number, error = number.notted()
-
+        number = self.visitors[type(node.node)](self, node.node, context)
+        if node.operation is None:
+            return number
+        number, error = getattr(number, node.operation)()
         if error:
-            self.error = error
-            return None
-        else:
-            return number.set_pos(node.pos_start, node.pos_end)
+            raise Failure(error.locate(node.node, node.node, context) if isinstance(error, OperationError) else error)
+        return number
 
     def visit_VarAccessNode(self, node, context):
         var_name = node.var_name_tok.value
-        value = context.symbol_table.get(var_name)
+        if node.slot is not None:
+            # a local of the function being run; until it is bound, the caller's variable is read
+            value = context.symbol_table.slots[node.slot]
+            if value is None:
+                value = context.symbol_table.get(var_name)
+        else:
+            value = context.symbol_table.get(var_name)
 
         if value is None:
-            self.error = RTError(
+            raise Failure(RTError(
                 node.pos_start, node.pos_end,
                 f"'{var_name}' is not defined",
                 context
-            )
-            return None
-
-        value = value.copy().set_pos(node.pos_start, node.pos_end).set_context(context)
+            ))
         return value
 
     def visit_VarAssignNode(self, node, context):
         var_name = node.var_name_tok.value
-        value = self.visit(node.value_node, context)
-        if self.should_return(): return None
-
-        context.symbol_table.set(var_name, value)
+        value = self.visitors[type(node.value_node)](self, node.value_node, context)
+        if node.slot is not None:
+            context.symbol_table.slots[node.slot] = value
+        else:
+            context.symbol_table.set(var_name, value)
         return value
 
     def visit_IfNode(self, node, context):
         for condition, expr, should_return_null in node.cases:
-            condition_value = self.visit(condition, context)
-            if self.should_return(): return None
-
-            if condition_value.is_true():
-                expr_value = self.visit(expr, context)
-                if self.should_return(): return None
+            if self.visitors[type(condition)](self, condition, context).is_true():
+                expr_value = self.visitors[type(expr)](self, expr, context)
                 return Number.null if should_return_null else expr_value
 
         if node.else_case is not None:
             expr, should_return_null = node.else_case
-            else_value = self.visit(expr, context)
-            if self.should_return(): return None
+            else_value = self.visitors[type(expr)](self, expr, context)
             return Number.null if should_return_null else else_value
 
         return Number.null
 
     def visit_WhileNode(self, node, context):
-        elements = []
-        while True:
-            condition_value = self.visit(node.condition, context)
-            if self.should_return(): return None
-            if not condition_value.is_true(): break
-
-            value = self.visit(node.body_node, context)
-            if self.loop_should_continue:
-                self.loop_should_continue = False
+        # a loop whose value is not used keeps none of the values of its body
+        elements = None if node.discarded or node.should_return_null else []
+        visitors, condition, body_node = self.visitors, node.condition, node.body_node
+        while visitors[type(condition)](self, condition, context).is_true():
+            try:
+                value = visitors[type(body_node)](self, body_node, context)
+            except ContinueSignal:
                 continue
-            elif self.loop_should_break:
-                self.loop_should_break = False
+            except BreakSignal:
                 break
-            elif self.should_return():
-                return None
-            else:
+            if elements is not None:
                 elements.append(value)
 
-        return Number.null if node.should_return_null \
-            else List(elements).set_context(context).set_pos(node.pos_start, node.pos_end)
+        return Number.null if elements is None else List(elements)
 
     def visit_ForNode(self, node, context):
-        elements = []
+        elements = None if node.discarded or node.should_return_null else []
 
-        start_value = self.visit(node.start_node, context)
-        if self.should_return(): return None
-        end_value = self.visit(node.end_node, context)
-        if self.should_return(): return None
+        visitors = self.visitors
+        start_value = visitors[type(node.start_node)](self, node.start_node, context)
+        end_value = visitors[type(node.end_node)](self, node.end_node, context)
+        step_value = None
         if node.step_node is not None:
-            step_value = self.visit(node.step_node, context)
-            if self.should_return(): return None
-        else:
-            step_value = Number(1)
-
-        i = start_value.value
-        if step_value.value >= 0:
-            condition = lambda: i < end_value.value
-        else:
-            condition = lambda: i > end_value.value
+            step_value = visitors[type(node.step_node)](self, node.step_node, context)
+        bounds, error = loop_bounds(node, context, start_value, end_value, step_value)
+        if error: raise Failure(error)
 
-        while condition():
-            context.symbol_table.set(node.var_name_tok.value, Number(i))
-            i += step_value.value
+        # the counter is a Python number (a range for ints), only the loop variable is a Number
+        symbol_table, slot, var_name = context.symbol_table, node.slot, node.var_name_tok.value
+        slots = symbol_table.slots if slot is not None else None
+        body_node = node.body_node
+        body = visitors[type(body_node)]
+        for i in counter(*bounds):
+            if slots is not None:
+                slots[slot] = Number.cached(i)
+            else:
+                symbol_table.set(var_name, Number.cached(i))
 
-            value = self.visit(node.body_node, context)
-            if self.loop_should_continue:
-                self.loop_should_continue = False
+            try:
+                value = body(self, body_node, context)
+            except ContinueSignal:
                 continue
-            elif self.loop_should_break:
-                self.loop_should_break = False
+            except BreakSignal:
                 break
-            elif self.should_return():
-                return None
-            else:
+            if elements is not None:
                 elements.append(value)
 
-        return Number.null if node.should_return_null \
-            else List(elements).set_context(context).set_pos(node.pos_start, node.pos_end)
+        return Number.null if elements is None else List(elements)
 
     def visit_FunDefNode(self, node, context):
         func_name = node.var_name_tok.value if node.var_name_tok else None
         body_node = node.body_node
-        arg_names = [arg.value for arg in node.arg_name_toks]
-
-        func_value = Function(func_name, arg_names, body_node, node.should_auto_return)\
-            .set_context(context).set_pos(node.pos_start, node.pos_end)
-        if node.var_name_tok is not None:
+        scope = node.scope if node.scope is not None else resolve(node)
+
+        # every Function made from the node shares the arg_names list, see visit_CallNode
+        func_value = Function(func_name, scope.arg_names, body_node, node.should_auto_return, scope)\
+            .set_context(context).set_pos(node)
+        if node.slot is not None:
+            context.symbol_table.slots[node.slot] = func_value
+        elif node.var_name_tok is not None:
             context.symbol_table.set(func_name, func_value)
 
         return func_value
 
     def visit_CallNode(self, node, context):
-        args = []
-
-        value_to_call = self.visit(node.node_to_call, context)
-        if self.should_return(): return None
-        value_to_call = value_to_call.copy().set_pos(node.pos_start, node.pos_end)
-
-        for arg_node in node.arg_nodes:
-            args.append(self.visit(arg_node, context))
-            if self.should_return(): return None
-
-        return_value = value_to_call.execute(args)
-        if self.should_return(): return None
-        return_value = return_value.copy().set_pos(node.pos_start, node.pos_end).set_context(context)
+        visitors = self.visitors
+        value_to_call = visitors[type(node.node_to_call)](self, node.node_to_call, context)
+        args = [visitors[type(arg_node)](self, arg_node, context) for arg_node in node.arg_nodes]
+
+        if type(value_to_call) is Function:
+            # a function of this engine runs its body in this interpreter. The number of
+            # arguments of a call site is fixed, so it is only checked for a function it has not called
+            arg_names = value_to_call.arg_names
+            if node.checked_args is not arg_names:
+                succ, error = value_to_call.check_args(arg_names, args, context, node)
+                if succ is False: raise Failure(error)
+                node.checked_args = arg_names
+            if node.tail:
+                return TailCall(value_to_call, args, node, context)
+            return self.call_function(value_to_call, args, context, node)
+        # execute hands back the error instead of a value when the call fails
+        return_value = value_to_call.execute(args, context, node)
+        if isinstance(return_value, Error): raise Failure(return_value)
         return return_value
 
-    def visit_ListNode(self, node, context):
-        elements = []
-
-        for element in node.element_nodes:
-            elements.append(self.visit(element, context))
-            if self.should_return(): return None
+    # the contexts of finished calls, with their Frames, for the next calls to enter again
+    free_contexts = []
+
+    def call_function(self, function, args, context, span):
+        """
+        Run a Function the arguments were checked for; the args list becomes the frame's slots.
+        A call in tail position of the body comes back as a TailCall and runs in this loop, so
+        recursion through tail calls does not grow the Python stack.
+
+        Only a function value or a runtime error can keep the context of a call, and through it the
+        frame, after the call returned. When the call made neither, the context goes to
+        free_contexts and the next call runs in it.
+        """
+        entry_context, entry_span = context, span
+        table = context.symbol_table
+        free_contexts = self.free_contexts
+        while True:
+            global_counters.function_calls += 1
+            scope = function.scope
+            reusable = scope is not None and scope.args_fill_slots
+            if reusable:
+                missing = len(scope.slots) - len(args)
+                if missing > 0:
+                    args.extend([None] * missing)
+                # a tail call takes the place of its caller in tracebacks
+                if free_contexts:
+                    exec_ctx = free_contexts.pop()
+                    exec_ctx.display_name, exec_ctx.parent, exec_ctx.entry_span = function.name, entry_context, entry_span
+                    exec_ctx.symbol_table.enter(scope, table, args)
+                else:
+                    exec_ctx = Context(function.name, entry_context, None, entry_span)
+                    exec_ctx.symbol_table = Frame(scope, table, args)
+            else:
+                exec_ctx = Context(function.name, entry_context, None, entry_span)
+                exec_ctx.symbol_table = Frame(scope, table) if scope is not None else SymbolTable(table)
+                function.populate_args(function.arg_names, args, exec_ctx)
+            kept = global_counters.functions + global_counters.errors
+
+            try:
+                body_node = function.body_node
+                value = self.visitors[type(body_node)](self, body_node, exec_ctx)
+            except ReturnSignal as signal:
+                value = signal.value
+            except (BreakSignal, ContinueSignal):
+                raise Failure(RTError(
+                    span.pos_start, span.pos_end,
+                    f"No value returned from function {function.name}",
+                    context
+                ))
+            else:
+                if not function.should_auto_return:
+                    value = Number.null
+
+            if type(value) is not TailCall:
+                frame = exec_ctx.symbol_table
+                if reusable and global_counters.functions + global_counters.errors == kept and not frame.symbols:
+                    # what a free context refers to is not kept alive by it
+                    exec_ctx.parent = frame.parent = frame.outer = frame.slots = None
+                    free_contexts.append(exec_ctx)
+                return value
+            function, args, span, context = value.function, value.args, value.node, value.context
+            table = TailTable.replacing(exec_ctx.symbol_table)
+
+    def execute_function(self, function, args, context, span):
+        """call_function for the other engines, which get a runtime error returned"""
+        succ, error = function.check_args(function.arg_names, args, context, span)
+        if succ is False: return error
+        self.running = True
+        try:
+            return self.call_function(function, list(args), context, span)
+        except Failure as failure:
+            return failure.error
+        finally:
+            self.running = False
 
-        return List(elements).set_context(context).set_pos(node.pos_start, node.pos_end)
+    def visit_ListNode(self, node, context):
+        visitors = self.visitors
+        if node.discarded:
+            for element in node.element_nodes:
+                visitors[type(element)](self, element, context)
+            return Number.null
+        return List([visitors[type(element)](self, element, context) for element in node.element_nodes])
 
     def visit_ReturnNode(self, node, context):
-        if node.node_to_return:
-            value = self.visit(node.node_to_return, context)
-            if self.should_return(): return None
-        else:
-            value = Number.null
-
-        self.func_return_value = value
-        return value
+        value_node = node.node_to_return
+        raise ReturnSignal(self.visitors[type(value_node)](self, value_node, context) if value_node else Number.null)
 
     def visit_ContinueNode(self, node, context):
-        self.loop_should_continue = True
-        return None
+        raise ContinueSignal()
 
     def visit_BreakNode(self, node, context):
-        self.loop_should_break = True
-        return None
+        raise BreakSignal()
 
+Interpreter.visitors = DispatchTable(Interpreter, "visit_")
 
-global_classes["Interpreter"] = Interpreter
\ No newline at end of file
+global_classes["Interpreter"] = Interpreter
+global_engines["visitor"] = Interpreter
\ No newline at end of file
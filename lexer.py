@@ -1,4 +1,6 @@
-from error import IllegalCharError, Position, ExpectedCharError
+import re
+
+from error import IllegalCharError, Position, ExpectedCharError, Source
 from basicToken import Token, CONSTANT, TT_DIGITS, TT_LETTERS, TT_LETTERS_DIGITS, KEYWORDS
 from util import global_classes
 
@@ -7,16 +9,24 @@ class Lexer:
     def __init__(self, text, filename):
         self.filename = filename
         self.text = text
-        self.pos = Position(-1, 0, -1, filename, text)
+        self.source = Source(filename, text)
+        self.error = None
+        self.idx = -1
         self.current_char = None
         self.advance()
 
     def advance(self):
-        self.pos.advance(self.current_char)
-        self.current_char = self.text[self.pos.idx] if self.pos.idx < len(self.text) else None
+        self.idx += 1
+        self.current_char = self.text[self.idx] if self.idx < len(self.text) else None
 
     def make_tokens(self):
-        tokens = []
+        tokens = list(self.iter_tokens())
+        if self.error: return [], self.error
+        return tokens, None
+
+    def iter_tokens(self):
+        """Yield tokens as they are lexed; on failure stop early and leave the error in self.error"""
+        self.error = None
 
         while self.current_char is not None:
             if self.current_char in ' \t':
@@ -24,68 +34,78 @@ class Lexer:
             elif self.current_char == '#':
                 self.skip_comment()
             elif self.current_char in ';\n':
-                tokens.append(Token(CONSTANT.NEWLINE, pos_start=self.pos))
+                yield Token(CONSTANT.NEWLINE, start=self.idx, source=self.source)
                 self.advance()
             elif self.current_char in TT_DIGITS:
-                tokens.append(self.make_numbers())
+                yield self.make_numbers()
             elif self.current_char in TT_LETTERS:
-                tokens.append(self.make_identify())
+                yield self.make_identify()
             elif self.current_char == '"':
-                tokens.append(self.make_strings())
+                yield self.make_strings()
             elif self.current_char == '+':
-                tokens.append(Token(CONSTANT.PLUS, pos_start=self.pos))
+                yield Token(CONSTANT.PLUS, start=self.idx, source=self.source)
                 self.advance()
             elif self.current_char == '-':
-                tokens.append(self.make_minus_or_arrow())
+                yield self.make_minus_or_arrow()
             elif self.current_char == '*':
-                tokens.append(Token(CONSTANT.MUL, pos_start=self.pos))
+                yield Token(CONSTANT.MUL, start=self.idx, source=self.source)
                 self.advance()
             elif self.current_char == '/':
-                tokens.append(Token(CONSTANT.DIV, pos_start=self.pos))
+                yield Token(CONSTANT.DIV, start=self.idx, source=self.source)
                 self.advance()
             elif self.current_char == '^':
-                tokens.append(Token(CONSTANT.POW, pos_start=self.pos))
+                yield Token(CONSTANT.POW, start=self.idx, source=self.source)
                 self.advance()
             elif self.current_char == '(':
-                tokens.append(Token(CONSTANT.LPAREN, pos_start=self.pos))
+                yield Token(CONSTANT.LPAREN, start=self.idx, source=self.source)
                 self.advance()
             elif self.current_char == ')':
-                tokens.append(Token(CONSTANT.RPAREN, pos_start=self.pos))
+                yield Token(CONSTANT.RPAREN, start=self.idx, source=self.source)
                 self.advance()
             elif self.current_char == '[':
-                tokens.append(Token(CONSTANT.LSQUARE, pos_start=self.pos))
+                yield Token(CONSTANT.LSQUARE, start=self.idx, source=self.source)
                 self.advance()
             elif self.current_char == ']':
-                tokens.append(Token(CONSTANT.RSQUARE, pos_start=self.pos))
+                yield Token(CONSTANT.RSQUARE, start=self.idx, source=self.source)
                 self.advance()
             elif self.current_char == ',':
-                tokens.append(Token(CONSTANT.COMMA, pos_start=self.pos))
+                yield Token(CONSTANT.COMMA, start=self.idx, source=self.source)
                 self.advance()
             elif self.current_char == '=':
                 tok, error = self.make_equal()
-                if error: return [], error
-                tokens.append(tok)
+                if error:
+                    self.error = error
+                    return
+                yield tok
             elif self.current_char == '!':
                 tok, error = self.make_not_equal()
-                if error: return [], error
-                tokens.append(tok)
+                if error:
+                    self.error = error
+                    return
+                yield tok
             elif self.current_char == '<':
                 tok, error = self.make_less_than()
-                if error: return [], error
-                tokens.append(tok)
+                if error:
+                    self.error = error
+                    return
+                yield tok
             elif self.current_char == '>':
                 tok, error = self.make_great_than()
-                if error: return [], error
-                tokens.append(tok)
+                if error:
+                    self.error = error
+                    return
+                yield tok
             else:
                 # return error
-                pos_start = self.pos.copy()
+                idx_start = self.idx
                 char = self.current_char
                 self.advance()
-                return [], IllegalCharError(pos_start, self.pos, "'" + char + "'")
+                self.error = IllegalCharError(
+                    Position(idx_start, self.source), Position(self.idx, self.source), "'" + char + "'"
+                )
+                return
 
-        tokens.append(Token(CONSTANT.EOF, pos_start=self.pos))
-        return tokens, None
+        yield Token(CONSTANT.EOF, start=self.idx, source=self.source)
 
     def skip_comment(self):
         self.advance()
@@ -96,7 +116,7 @@ class Lexer:
     def make_numbers(self):
         num_str = ''
         dot_count = 0
-        pos_start = self.pos.copy()
+        idx_start = self.idx
 
         DIGITS = TT_DIGITS + '.'
         while self.current_char is not None and self.current_char in DIGITS:
@@ -109,13 +129,13 @@ class Lexer:
             self.advance()
 
         if dot_count == 0:
-            return Token(CONSTANT.INT, int(num_str), pos_start, self.pos)
+            return Token(CONSTANT.INT, int(num_str), idx_start, self.idx, self.source)
         else:
-            return Token(CONSTANT.FLOAT, float(num_str), pos_start, self.pos)
+            return Token(CONSTANT.FLOAT, float(num_str), idx_start, self.idx, self.source)
 
     def make_identify(self):
         id_str = ''
-        pos_start = self.pos.copy()
+        idx_start = self.idx
 
         valid_letters = TT_LETTERS_DIGITS + "_"
         while self.current_char is not None and self.current_char in valid_letters:
@@ -123,11 +143,11 @@ class Lexer:
             self.advance()
 
         tok_type = CONSTANT.KEYWORD if id_str in KEYWORDS else CONSTANT.IDENTIFIER
-        return Token(tok_type, id_str, pos_start, self.pos)
+        return Token(tok_type, id_str, idx_start, self.idx, self.source)
 
     def make_strings(self):
         string = ''
-        pos_start = self.pos.copy()
+        idx_start = self.idx
         escape_character = False
         self.advance()
 
@@ -147,57 +167,165 @@ class Lexer:
             escape_character = False
 
         self.advance()
-        return Token(CONSTANT.STRING, string, pos_start, self.pos)
+        return Token(CONSTANT.STRING, string, idx_start, self.idx, self.source)
 
     def make_minus_or_arrow(self):
         tok_type = CONSTANT.MINUS
-        pos_start = self.pos.copy()
+        idx_start = self.idx
         self.advance()
 
         if self.current_char == ">":
             tok_type = CONSTANT.ARROW
             self.advance()
-        return Token(tok_type, pos_start=pos_start, pos_end=self.pos)
+        return Token(tok_type, start=idx_start, end=self.idx, source=self.source)
 
     def make_not_equal(self):
-        pos_start = self.pos.copy()
+        idx_start = self.idx
         self.advance()
 
         if self.current_char == '=':
             self.advance()
-            return Token(CONSTANT.NE, pos_start=pos_start, pos_end=self.pos), None
+            return Token(CONSTANT.NE, start=idx_start, end=self.idx, source=self.source), None
         self.advance()
-        return None,  ExpectedCharError(pos_start, self.pos, "'=' (after '!')")
+        return None,  ExpectedCharError(
+            Position(idx_start, self.source), Position(self.idx, self.source), "'=' (after '!')"
+        )
 
     def make_equal(self):
         tok_type = CONSTANT.EQ
-        pos_start = self.pos.copy()
+        idx_start = self.idx
         self.advance()
 
         if self.current_char == '=':
             self.advance()
             tok_type = CONSTANT.EE
-        return Token(tok_type, pos_start=pos_start, pos_end=self.pos), None
+        return Token(tok_type, start=idx_start, end=self.idx, source=self.source), None
 
     def make_less_than(self):
         tok_type = CONSTANT.LT
-        pos_start = self.pos.copy()
+        idx_start = self.idx
         self.advance()
 
         if self.current_char == '=':
             self.advance()
             tok_type = CONSTANT.LTE
-        return Token(tok_type, pos_start=pos_start, pos_end=self.pos), None
+        return Token(tok_type, start=idx_start, end=self.idx, source=self.source), None
 
     def make_great_than(self):
         tok_type = CONSTANT.GT
-        pos_start = self.pos.copy()
+        idx_start = self.idx
         self.advance()
 
         if self.current_char == '=':
             self.advance()
             tok_type = CONSTANT.GTE
-        return Token(tok_type, pos_start=pos_start, pos_end=self.pos), None
+        return Token(tok_type, start=idx_start, end=self.idx, source=self.source), None
+
+
+# blanks are folded into the token that follows them; the order of the alternatives matters
+# where prefixes overlap ('->' before '-', '==' before '=')
+MASTER_PATTERN = re.compile(r"""
+    [ \t]*
+    (?:
+        (?P<IDENTIFIER>[A-Za-z][A-Za-z0-9_]*)
+      | (?P<OPERATOR>->|==|<=|>=|!=|[-+*/^()\[\],=<>])
+      | (?P<NUMBER>[0-9]+(?:\.[0-9]*)?)
+      | (?P<NEWLINE>[;\n])
+      | (?P<STRING>"[^"]*"?)
+      | (?P<COMMENT>\#[^\n]*\n?)
+      | (?P<BANG>!)
+    )?
+""", re.VERBOSE)
+
+OPERATOR_TYPES = {
+    '+': CONSTANT.PLUS,
+    '-': CONSTANT.MINUS,
+    '*': CONSTANT.MUL,
+    '/': CONSTANT.DIV,
+    '^': CONSTANT.POW,
+    '(': CONSTANT.LPAREN,
+    ')': CONSTANT.RPAREN,
+    '[': CONSTANT.LSQUARE,
+    ']': CONSTANT.RSQUARE,
+    ',': CONSTANT.COMMA,
+    '=': CONSTANT.EQ,
+    '<': CONSTANT.LT,
+    '>': CONSTANT.GT,
+    '->': CONSTANT.ARROW,
+    '==': CONSTANT.EE,
+    '<=': CONSTANT.LTE,
+    '>=': CONSTANT.GTE,
+    '!=': CONSTANT.NE,
+}
+
+
+class RegexLexer(Lexer):
+    """
+    Lexer engine driven by MASTER_PATTERN: every token is one regex match, dispatched on the
+    name of the group that matched. It produces the same tokens and errors as Lexer.
+    """
+    def __init__(self, text, filename):
+        self.filename = filename
+        self.text = text
+        self.source = Source(filename, text)
+        self.error = None
+
+    def iter_tokens(self):
+        self.error = None
+        text = self.text
+        source = self.source
+        length = len(text)
+        match = MASTER_PATTERN.match
+        end = 0
+
+        while end < length:
+            m = match(text, end)
+            kind = m.lastgroup
+            if kind is None:
+                idx = m.end()
+                if idx == length: break
+                self.error = IllegalCharError(Position(idx, source), Position(idx + 1, source), "'" + text[idx] + "'")
+                return
+
+            idx = m.start(kind)
+            end = m.end()
+            if kind == 'IDENTIFIER':
+                id_str = text[idx:end]
+                tok_type = CONSTANT.KEYWORD if id_str in KEYWORDS else CONSTANT.IDENTIFIER
+                yield Token(tok_type, id_str, idx, end, source)
+            elif kind == 'OPERATOR':
+                yield Token(OPERATOR_TYPES[text[idx:end]], None, idx, end, source)
+            elif kind == 'NUMBER':
+                num_str = text[idx:end]
+                if '.' in num_str:
+                    yield Token(CONSTANT.FLOAT, float(num_str), idx, end, source)
+                else:
+                    yield Token(CONSTANT.INT, int(num_str), idx, end, source)
+            elif kind == 'NEWLINE':
+                yield Token(CONSTANT.NEWLINE, None, idx, end, source)
+            elif kind == 'STRING':
+                if text[end - 1] != '"' or end - idx == 1:
+                    end += 1  # an unterminated string swallows the end of the text, like Lexer.make_strings
+                    string = text[idx + 1:]
+                else:
+                    string = text[idx + 1:end - 1]
+                # Lexer.make_strings drops every backslash and keeps the character after it as is
+                yield Token(CONSTANT.STRING, string.replace('\\', ''), idx, end, source)
+            elif kind == 'BANG':
+                # Lexer.make_not_equal steps over the character after a lone '!' as well
+                self.error = ExpectedCharError(Position(idx, source), Position(idx + 2, source), "'=' (after '!')")
+                return
+
+        yield Token(CONSTANT.EOF, None, max(end, length), None, source)
+
+
+LEXER_ENGINES = {
+    "char": Lexer,
+    "regex": RegexLexer,
+}
+
+def make_lexer(text, filename, engine="char"):
+    return LEXER_ENGINES[engine](text, filename)
 
 
 global_classes["Lexer"] = Lexer
\ No newline at end of file
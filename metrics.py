@@ -0,0 +1,247 @@
+"""
+Execution counters: how often each node type was evaluated, and the function calls, builtin
+calls, Values made and runtime errors made.
+
+The calls, values and errors are always counted, in util.global_counters, by the engines
+themselves where they call a function, dispatch a builtin or make a Value or an RTError. They are
+process-wide: a run in another thread at the same time adds to them too.
+
+Counting every node evaluation costs the tree walker more than all of its other optimizations
+save, so the node counts are opt-in: every engine has a metered variant that counts the same
+things. The tree walker counts its visits, the closures count themselves, the transpilers emit a
+count line per node and the VM compiler a COUNT instruction.
+
+A run given a Metrics (basic.run(..., metrics=m)) is recorded under its engine: what the run
+added to the global counters and, when the Metrics was made with nodes=True, the node counts of
+the metered variant the run is then made on. After every run the counters are written to the sinks of the Metrics:
+DictSink keeps them in memory, JSONSink appends them to a JSON lines file and OpenMetricsSink
+writes them in the OpenMetrics text format, for a scraper to pick up.
+"""
+import json
+from collections import Counter
+
+import closures
+import transpiler
+import vm
+from bytecode import BytecodeCompiler, COUNT
+from interpreter import Interpreter
+from util import DispatchTable, global_counters, global_engines
+
+# the counters besides the node evaluations, with the help text of the OpenMetrics sink
+COUNTERS = {
+    "function_calls": "Calls of functions defined in BASIC",
+    "builtin_calls": "Calls of builtin functions",
+    "values": "Values created",
+    "errors": "Runtime errors created",
+}
+
+
+class EngineCounters:
+    __slots__ = ("nodes", "function_calls", "builtin_calls", "values", "errors")
+
+    def __init__(self):
+        self.nodes = Counter()  # node type name -> evaluations
+        self.function_calls = 0
+        self.builtin_calls = 0
+        self.values = 0
+        self.errors = 0
+
+    def add(self, after, before):
+        """Add what the global counters counted from before to after"""
+        for name in COUNTERS:
+            setattr(self, name, getattr(self, name) + getattr(after, name) - getattr(before, name))
+
+    def as_dict(self):
+        counters = {name: getattr(self, name) for name in COUNTERS}
+        counters["nodes"] = dict(sorted(self.nodes.items()))
+        return counters
+
+
+class Metrics:
+    """The counters of the runs given this object, per engine"""
+    def __init__(self, sinks=(), nodes=False):
+        self.engines = {}  # engine name -> EngineCounters
+        self.sinks = list(sinks)
+        self.nodes = nodes  # whether node evaluations are counted, on the metered engines
+        self.running = []  # (counters, global counters at the start) of the runs in progress
+
+    def interpreter(self, engine):
+        """An engine that counts into this object, for run_script; finish() ends its run"""
+        metered = METERED_ENGINES.get(engine)
+        if metered is None:
+            raise ValueError(f"The {engine} engine has no metered variant")
+        counters = self.engines.get(engine)
+        if counters is None:
+            counters = self.engines[engine] = EngineCounters()
+        self.running.append((counters, global_counters.copy()))
+        return metered(counters) if self.nodes else global_engines[engine]()
+
+    def finish(self):
+        """Record what the global counters counted in the run and write the counters to the sinks"""
+        counters, started = self.running.pop()
+        counters.add(global_counters, started)
+        self.export()
+
+    def snapshot(self):
+        return {engine: counters.as_dict() for engine, counters in self.engines.items()}
+
+    def export(self):
+        snapshot = self.snapshot()
+        for sink in self.sinks:
+            sink.write(snapshot)
+
+    def reset(self):
+        self.engines.clear()
+
+
+class CountingTable(DispatchTable):
+    """The dispatch of MeteredInterpreter: every visit is counted under the name of its node type"""
+    def find(self, key):
+        handler = self.get(key)
+        if handler is None:
+            handler = getattr(self.owner, f"visit_{key.__name__}", None) or Interpreter.visitors.find(key)
+            if handler is None:
+                return None
+            handler = self[key] = self.counted(handler, key.__name__)
+        return handler
+
+    @staticmethod
+    def counted(handler, name):
+        def visit(interpreter, node, context):
+            interpreter.counters.nodes[name] += 1
+            return handler(interpreter, node, context)
+        return visit
+
+
+class MeteredInterpreter(Interpreter):
+    def __init__(self, counters):
+        super().__init__()
+        self.counters = counters
+
+MeteredInterpreter.visitors = CountingTable(MeteredInterpreter, "visit_")
+
+
+class MeteredClosureCompiler(closures.ClosureCompiler):
+    def __init__(self, counters):
+        self.counters = counters
+
+    def compile(self, node):
+        code = super().compile(node)
+        nodes, name = self.counters.nodes, type(node).__name__
+        def counted(context):
+            nodes[name] += 1
+            return code(context)
+        return counted
+
+    def constant(self, node):
+        return None  # a literal is counted every time it is evaluated, like by the visitor
+
+
+class MeteredClosureInterpreter(closures.ClosureInterpreter):
+    def __init__(self, counters):
+        super().__init__()
+        self.compiler = MeteredClosureCompiler(counters)
+        self.counters = counters
+
+
+class MeteredCompile:
+    """Makes a Transpiler emit a count line before the code of every node"""
+    def compile(self, node):
+        self.emit(f"NODES[{type(node).__name__!r}] += 1", node)
+        return super().compile(node)
+
+
+class MeteredTranspiler(MeteredCompile, transpiler.Transpiler):
+    pass
+
+
+class MeteredUnboxedTranspiler(MeteredCompile, transpiler.UnboxedTranspiler):
+    pass
+
+
+class MeteredPythonInterpreter(transpiler.PythonInterpreter):
+    transpiler = MeteredTranspiler
+
+    def __init__(self, counters):
+        super().__init__()
+        self.counters = counters
+        self.runtime = dict(transpiler.RUNTIME, NODES=counters.nodes)
+
+
+class MeteredUnboxedInterpreter(MeteredPythonInterpreter):
+    transpiler = MeteredUnboxedTranspiler
+
+
+class MeteredBytecodeCompiler(BytecodeCompiler):
+    def compile(self, node):
+        self.emit(COUNT, self.add_name(type(node).__name__), node)
+        super().compile(node)
+
+
+class MeteredVMInterpreter(vm.VMInterpreter):
+    def __init__(self, counters):
+        super().__init__()
+        self.counters = counters
+
+    def visit(self, node, context):
+        code = MeteredBytecodeCompiler.compile_program(node)
+        codes = [code]
+        while codes:
+            code_object = codes.pop()
+            code_object.counts = self.counters.nodes
+            codes += [const for const in code_object.consts if type(const) is type(code)]
+        return self.run(code, context)
+
+
+METERED_ENGINES = {
+    "visitor": MeteredInterpreter,
+    "closure": MeteredClosureInterpreter,
+    "python": MeteredPythonInterpreter,
+    "unboxed": MeteredUnboxedInterpreter,
+    "vm": MeteredVMInterpreter,
+}
+
+
+class DictSink:
+    """Keeps every snapshot in .snapshots"""
+    def __init__(self):
+        self.snapshots = []
+
+    def write(self, snapshot):
+        self.snapshots.append(snapshot)
+
+
+class JSONSink:
+    """Appends every snapshot to a file as one line of JSON"""
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, snapshot):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(snapshot, sort_keys=True) + "\n")
+
+
+class OpenMetricsSink:
+    """Writes the last snapshot in the OpenMetrics text format, replacing the file"""
+    def __init__(self, path, prefix="basic"):
+        self.path = path
+        self.prefix = prefix
+
+    def write(self, snapshot):
+        with open(self.path, "w") as f:
+            f.write(self.format(snapshot))
+
+    def format(self, snapshot):
+        prefix = self.prefix
+        lines = [f"# TYPE {prefix}_node_evaluations counter",
+                 f"# HELP {prefix}_node_evaluations Nodes evaluated, by node type"]
+        for engine, counters in snapshot.items():
+            for node, count in counters["nodes"].items():
+                lines.append(f'{prefix}_node_evaluations_total{{engine="{engine}",node="{node}"}} {count}')
+        for name, help_text in COUNTERS.items():
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            for engine, counters in snapshot.items():
+                lines.append(f'{prefix}_{name}_total{{engine="{engine}"}} {counters[name]}')
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
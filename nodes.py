@@ -1,5 +1,7 @@
+from types import GeneratorType
+
 from basicToken import CONSTANT, Token, TT_DIGITS
-from error import Position
+from error import Position, Span
 
 
 def archieve_nodes(node, filepath):
@@ -13,38 +15,76 @@ def archieve_nodes(node, filepath):
     return text, str_list
 
 def restore_nodes(filepath):
-    tokens = read_nodes_str(filepath)
-    print(tokens)
-
-    ast, _ = restore_node(tokens)
-    return ast
-
-def restore_node(tokens):
-    className = StringNode
-    node_name = tokens[0]
-    if node_name == 'None':
-        tokens = tokens[1:]
-        return None, tokens
-    elif node_name == 'False':
-        tokens = tokens[1:]
-        return False, tokens
-    elif node_name == 'True':
-        tokens = tokens[1:]
-        return True, tokens
-    elif node_name[0] == '#':
-        className = NumberNode
-    elif node_name[0] == '@':
-        className = StringNode
-    elif node_name[0] == '$':
-        className = Token
-    else:
-        if node_name not in Node_Name_Map:
-            raise Exception("No such Node name")
+    reader = NodeReader(read_nodes_str(filepath))
+    return restore_node(reader)
+
+class NodeReader:
+    """Cursor over the comma separated items of an archive, shared by every restore call"""
+    def __init__(self, items):
+        self.items = items
+        self.idx = 0
+
+    def peek(self):
+        return self.items[self.idx]
+
+    def next(self):
+        item = self.items[self.idx]
+        self.idx += 1
+        return item
+
+def restore_leaf(reader):
+    """Restore an item that has no children; returns (value, True), or (None, False) for a node name"""
+    item = reader.peek()
+    if item == 'None':
+        reader.next()
+        return None, True
+    elif item == 'False':
+        reader.next()
+        return False, True
+    elif item == 'True':
+        reader.next()
+        return True, True
+    elif item[0] == '#':
+        return NumberNode.restore(reader), True
+    elif item[0] == '@':
+        return StringNode.restore(reader), True
+    elif item[0] == '$':
+        return Token.restore(reader), True
+    elif item not in Node_Name_Map:
+        raise Exception("No such Node name")
+    return None, False
+
+def restore_node(reader):
+    """
+    Restore the node under the reader's cursor. Node.restore methods are generators that yield
+    every time they need a child and get it sent back, so deep trees are rebuilt with an explicit
+    stack of pending parents instead of Python recursion.
+    """
+    pending = []
+    while True:
+        value, is_leaf = restore_leaf(reader)
+        if not is_leaf:
+            restoring = Node_Name_Map[reader.peek()].restore(reader)
+            if not isinstance(restoring, GeneratorType):
+                value = restoring  # a node without children
+            else:
+                try:
+                    next(restoring)
+                    pending.append(restoring)
+                    continue
+                except StopIteration as done:
+                    value = done.value
+
+        # hand the value to its parent; parents that are complete become values themselves
+        while pending:
+            try:
+                pending[-1].send(value)
+                break
+            except StopIteration as done:
+                pending.pop()
+                value = done.value
         else:
-            className = Node_Name_Map[node_name]
-
-    node, tokens = className.restore(tokens)
-    return node, tokens
+            return value
 
 def read_nodes_str(filepath):
     with open(filepath, "r") as f:
@@ -73,11 +113,15 @@ def read_nodes_str(filepath):
 
     return tokens
 
-class NumberNode:
+class NumberNode(Span):
+    __slots__ = ("tok", "constant", "start", "end", "source")
+
     def __init__(self, tok):
         self.tok = tok
-        self.pos_start = self.tok.pos_start
-        self.pos_end = self.tok.pos_end
+        self.constant = None  # the value, made once by the interpreter
+        self.start = tok.start
+        self.end = tok.end
+        self.source = tok.source
 
     def __repr__(self):
         return f'{self.tok}'
@@ -87,21 +131,23 @@ class NumberNode:
         return f"#{num}"
 
     @classmethod
-    def restore(cls, tokens):
-        numstr = tokens[0][1:]
-        tokens = tokens[1:]
+    def restore(cls, reader):
+        numstr = reader.next()[1:]
         if numstr.find('.') >= 0:
-            token = Token(CONSTANT.FLOAT, float(numstr), Position(0,0,0))
+            token = Token(CONSTANT.FLOAT, float(numstr))
         else:
-            token = Token(CONSTANT.INT, int(numstr), Position(0,0,0))
+            token = Token(CONSTANT.INT, int(numstr))
+        return cls(token)
 
-        return cls(token), tokens
+class StringNode(Span):
+    __slots__ = ("tok", "constant", "start", "end", "source")
 
-class StringNode:
     def __init__(self, tok):
         self.tok = tok
-        self.pos_start = self.tok.pos_start
-        self.pos_end = self.tok.pos_end
+        self.constant = None  # the value, made once by the interpreter
+        self.start = tok.start
+        self.end = tok.end
+        self.source = tok.source
 
     def __repr__(self):
         return f'{self.tok}'
@@ -111,20 +157,53 @@ class StringNode:
         return f"@{len(str_list) - 1}"
 
     @classmethod
-    def restore(cls, tokens):
-        string = tokens[0][1:]
-        tokens = tokens[1:]
-        tok = Token(CONSTANT.STRING, string, Position(0,0,0))
-        return cls(tok), tokens
+    def restore(cls, reader):
+        string = reader.next()[1:]
+        tok = Token(CONSTANT.STRING, string)
+        return cls(tok)
+
+# the Value method each operator token evaluates to, keyword operators are keyed by their value
+BINARY_OPERATIONS = {
+    CONSTANT.PLUS: "added_to",
+    CONSTANT.MINUS: "subbed_by",
+    CONSTANT.MUL: "multed_by",
+    CONSTANT.DIV: "dived_by",
+    CONSTANT.POW: "powed_by",
+    CONSTANT.EE: "get_comparison_eq",
+    CONSTANT.NE: "get_comparison_ne",
+    CONSTANT.LT: "get_comparison_lt",
+    CONSTANT.GT: "get_comparison_gt",
+    CONSTANT.LTE: "get_comparison_lte",
+    CONSTANT.GTE: "get_comparison_gte",
+    "and": "anded_by",
+    "or": "ored_by",
+}
+
+UNARY_OPERATIONS = {
+    CONSTANT.PLUS: None,
+    CONSTANT.MINUS: "negated",
+    "not": "notted",
+}
+
+def resolve_operation(op_tok, operations):
+    key = op_tok.value if op_tok.type == CONSTANT.KEYWORD else op_tok.type
+    if key not in operations:
+        raise Exception(f"No operation for operator {op_tok}")
+    return operations[key]
+
+class BinOpNode(Span):
+    __slots__ = ("left_node", "op_tok", "right_node", "operation", "start", "end", "source")
 
-class BinOpNode:
     def __init__(self, left_node, op_tok, right_node):
         self.left_node = left_node
         self.op_tok = op_tok
         self.right_node = right_node
+        # resolved once here, so every way of building the tree (parser, restore, archive) gets it
+        self.operation = resolve_operation(op_tok, BINARY_OPERATIONS)
 
-        self.pos_start = self.left_node.pos_start
-        self.pos_end = self.right_node.pos_end
+        self.start = left_node.start
+        self.end = right_node.end
+        self.source = left_node.source
 
     def __repr__(self):
         return f'({self.left_node},{self.op_tok},{self.right_node})'
@@ -136,20 +215,24 @@ class BinOpNode:
         return f'BO,{left},{op},{right}'
 
     @classmethod
-    def restore(cls, tokens):
-        tokens = tokens[1:]
-        left, tokens = restore_node(tokens)
-        op_tok, tokens = Token.restore(tokens, type_=tokens[0])
-        right, tokens = restore_node(tokens)
-        return cls(left, op_tok, right), tokens
-
-class UnaryOpNode:
+    def restore(cls, reader):
+        reader.next()
+        left = yield
+        op_tok = Token.restore(reader)
+        right = yield
+        return cls(left, op_tok, right)
+
+class UnaryOpNode(Span):
+    __slots__ = ("op_tok", "node", "operation", "start", "end", "source")
+
     def __init__(self, op_tok, node):
         self.op_tok = op_tok
         self.node = node
+        self.operation = resolve_operation(op_tok, UNARY_OPERATIONS)
 
-        self.pos_start = self.op_tok.pos_start
-        self.pos_end = self.node.pos_end
+        self.start = op_tok.start
+        self.end = node.end
+        self.source = op_tok.source
 
     def __repr__(self):
         return f"({self.op_tok}, {self.node})"
@@ -160,17 +243,21 @@ class UnaryOpNode:
         return f"UO,{op},{node}"
 
     @classmethod
-    def restore(cls, tokens):
-        tokens = tokens[1:]
-        op_tok, tokens = Token.restore(tokens, type_=tokens[0])
-        node, tokens = restore_node(tokens)
-        return cls(op_tok, node), tokens
+    def restore(cls, reader):
+        reader.next()
+        op_tok = Token.restore(reader)
+        node = yield
+        return cls(op_tok, node)
+
+class VarAccessNode(Span):
+    __slots__ = ("var_name_tok", "slot", "start", "end", "source")
 
-class VarAccessNode:
     def __init__(self, var_name_tok):
         self.var_name_tok = var_name_tok
-        self.pos_start = self.var_name_tok.pos_start
-        self.pos_end = self.var_name_tok.pos_end
+        self.slot = None  # set by resolver.py for names bound in the enclosing function
+        self.start = var_name_tok.start
+        self.end = var_name_tok.end
+        self.source = var_name_tok.source
 
     def __repr__(self):
         return f"(VC:{self.var_name_tok})"
@@ -180,17 +267,21 @@ class VarAccessNode:
         return f"VC,{name}"
 
     @classmethod
-    def restore(cls, tokens):
-        tokens = tokens[1:]
-        name, tokens = Token.restore(tokens)
-        return cls(name), tokens
+    def restore(cls, reader):
+        reader.next()
+        name = Token.restore(reader)
+        return cls(name)
+
+class VarAssignNode(Span):
+    __slots__ = ("var_name_tok", "value_node", "slot", "start", "end", "source")
 
-class VarAssignNode:
     def __init__(self, var_name_tok, value_node):
         self.var_name_tok = var_name_tok
         self.value_node = value_node
-        self.pos_start = self.var_name_tok.pos_start
-        self.pos_end = self.value_node.pos_end
+        self.slot = None
+        self.start = var_name_tok.start
+        self.end = value_node.end
+        self.source = var_name_tok.source
 
     def __repr__(self):
         return f"(VA:{self.var_name_tok},{self.value_node})"
@@ -201,18 +292,21 @@ class VarAssignNode:
         return f"VA,{name},{value}"
 
     @classmethod
-    def restore(cls, tokens):
-        tokens = tokens[1:]
-        name, tokens = restore_node(tokens)
-        value, tokens = restore_node(tokens)
-        return cls(name, value), tokens
+    def restore(cls, reader):
+        reader.next()
+        name = yield
+        value = yield
+        return cls(name, value)
+
+class IfNode(Span):
+    __slots__ = ("cases", "else_case", "start", "end", "source")
 
-class IfNode:
     def __init__(self, cases, else_case=None):
         self.cases = cases
         self.else_case = else_case
-        self.pos_start = self.cases[0][0].pos_start
-        self.pos_end = (self.else_case or self.cases[len(self.cases) - 1])[0].pos_end
+        self.start = cases[0][0].start
+        self.end = (else_case or cases[len(cases) - 1])[0].end
+        self.source = cases[0][0].source
 
     def __repr__(self):
         text = ""
@@ -241,29 +335,32 @@ class IfNode:
         return f"IF,{len(self.cases)}{','+cases if len(self.cases)>0 else ''},{else_case}"
 
     @classmethod
-    def restore(cls, tokens):
-        tokens = tokens[1:]
-        num = int(tokens[0])
-        tokens = tokens[1:]
+    def restore(cls, reader):
+        reader.next()
+        num = int(reader.next())
 
         cases = []
         for i in range(num):
-            condition, tokens = restore_node(tokens)
-            expr, tokens = restore_node(tokens)
-            should_return_null, tokens = restore_node(tokens)
+            condition = yield
+            expr = yield
+            should_return_null = yield
             cases.append((condition, expr, should_return_null))
-        expr, tokens = restore_node(tokens)
-        should_return_null, tokens = restore_node(tokens)
+        expr = yield
+        should_return_null = yield
         else_case = (expr, should_return_null) if expr is not None and should_return_null is not None else None
-        return cls(cases, else_case), tokens
+        return cls(cases, else_case)
+
+class WhileNode(Span):
+    __slots__ = ("condition", "body_node", "should_return_null", "discarded", "start", "end", "source")
 
-class WhileNode:
     def __init__(self, condition, body_node, should_return_null):
         self.condition = condition
         self.body_node = body_node
         self.should_return_null = should_return_null
-        self.pos_start = self.condition.pos_start
-        self.pos_end = self.body_node.pos_end
+        self.discarded = False
+        self.start = condition.start
+        self.end = body_node.end
+        self.source = condition.source
 
     def __repr__(self):
         return f"(while {self.condition} then {self.body_node})"
@@ -274,14 +371,17 @@ class WhileNode:
         return f"WN,{condition},{body},{self.should_return_null}"
 
     @classmethod
-    def restore(cls, tokens):
-        tokens = tokens[1:]
-        condition, tokens = restore_node(tokens)
-        body, tokens = restore_node(tokens)
-        should_return_null, tokens = restore_node(tokens)
-        return cls(condition, body, should_return_null), tokens
-
-class ForNode:
+    def restore(cls, reader):
+        reader.next()
+        condition = yield
+        body = yield
+        should_return_null = yield
+        return cls(condition, body, should_return_null)
+
+class ForNode(Span):
+    __slots__ = ("var_name_tok", "start_node", "end_node", "step_node", "body_node", "should_return_null",
+                 "slot", "discarded", "start", "end", "source")
+
     def __init__(self, var_name_tok, start_node, end_node, step_node, body_node, should_return_null):
         self.var_name_tok = var_name_tok
         self.start_node = start_node
@@ -289,8 +389,11 @@ class ForNode:
         self.step_node = step_node
         self.body_node = body_node
         self.should_return_null = should_return_null
-        self.pos_start = self.var_name_tok.pos_start
-        self.pos_end = self.body_node.pos_end
+        self.slot = None
+        self.discarded = False
+        self.start = var_name_tok.start
+        self.end = body_node.end
+        self.source = var_name_tok.source
 
     def __repr__(self):
         step_text = "" if self.step_node is None else f"step {self.step_node}"
@@ -306,30 +409,36 @@ class ForNode:
         return f"FN,{name},{start},{end},{step},{body},{should_return_null}"
 
     @classmethod
-    def restore(cls, tokens):
-        tokens = tokens[1:]
-        name, tokens = Token.restore(tokens)
-        start, tokens = restore_node(tokens)
-        end, tokens = restore_node(tokens)
-        step, tokens = restore_node(tokens)
-        body, tokens = restore_node(tokens)
-        should_return_null, tokens = restore_node(tokens)
-        return cls(name, start, end, step, body, should_return_null), tokens
-
-class FunDefNode:
+    def restore(cls, reader):
+        reader.next()
+        name = Token.restore(reader)
+        start = yield
+        end = yield
+        step = yield
+        body = yield
+        should_return_null = yield
+        return cls(name, start, end, step, body, should_return_null)
+
+class FunDefNode(Span):
+    __slots__ = ("var_name_tok", "arg_name_toks", "body_node", "should_auto_return", "slot", "scope",
+                 "start", "end", "source")
+
     def __init__(self, var_name_tok, arg_name_toks, body_node, should_auto_return):
         self.var_name_tok = var_name_tok
         self.arg_name_toks = arg_name_toks
         self.body_node = body_node
         self.should_auto_return = should_auto_return
+        self.slot = None
+        self.scope = None  # the locals of the body, see resolver.py
 
         if self.var_name_tok is not None:
-            self.pos_start = self.var_name_tok.pos_start
+            self.start = var_name_tok.start
         elif len(self.arg_name_toks) > 0:
-            self.pos_start = self.arg_name_toks[0].pos_start
+            self.start = arg_name_toks[0].start
         else:
-            self.pos_start = self.body_node.pos_start
-        self.pos_end = self.body_node.pos_end
+            self.start = body_node.start
+        self.end = body_node.end
+        self.source = body_node.source
 
     def __repr__(self):
         name = self.var_name_tok if self.var_name_tok else "unknown"
@@ -337,36 +446,39 @@ class FunDefNode:
         return f"(fun {name}{args_text}, {self.body_node})"
 
     def save(self, str_list):
-        name = self.var_name_tok.save(str_list)
+        name = self.var_name_tok.save(str_list) if self.var_name_tok else "None"
         args = ','.join([arg.save(str_list) for arg in self.arg_name_toks])
         body = self.body_node.save(str_list)
         return f"FD,{name},{len(self.arg_name_toks)}{','+args if len(self.arg_name_toks)>0 else ''},{body},{self.should_auto_return}"
 
     @classmethod
-    def restore(cls, tokens):
-        tokens = tokens[1:]
-        # name, tokens = Token.restore(tokens, type_=tokens[0])
-        name, tokens = restore_node(tokens)
-        num = int(tokens[0])
-        tokens = tokens[1:]
+    def restore(cls, reader):
+        reader.next()
+        name = yield
+        num = int(reader.next())
 
         args = []
         for i in range(num):
-            arg, tokens = restore_node(tokens)
+            arg = yield
             args.append(arg)
-        body, tokens = restore_node(tokens)
-        should_auto_return, tokens = restore_node(tokens)
-        return cls(name, args, body, should_auto_return), tokens
+        body = yield
+        should_auto_return = yield
+        return cls(name, args, body, should_auto_return)
+
+class CallNode(Span):
+    __slots__ = ("node_to_call", "arg_nodes", "checked_args", "tail", "start", "end", "source")
 
-class CallNode:
     def __init__(self, node_to_call, arg_nodes):
         self.node_to_call = node_to_call
         self.arg_nodes = arg_nodes
-        self.pos_start = self.node_to_call.pos_start
+        self.checked_args = None  # the arg_names the interpreter last found this call to match
+        self.tail = False  # its value is what the function returns, see resolver.py
+        self.start = node_to_call.start
         if len(self.arg_nodes) > 0:
-            self.pos_end = self.arg_nodes[len(self.arg_nodes) - 1].pos_end
+            self.end = arg_nodes[len(arg_nodes) - 1].end
         else:
-            self.pos_end = self.node_to_call.pos_end
+            self.end = node_to_call.end
+        self.source = node_to_call.source
 
     def __repr__(self):
         name = self.node_to_call if self.node_to_call else "unknown"
@@ -379,23 +491,26 @@ class CallNode:
         return f"CN,{node_to_call},{len(self.arg_nodes)}{','+args if len(self.arg_nodes)>0 else ''}"
 
     @classmethod
-    def restore(cls, tokens):
-        tokens = tokens[1:]
-        node_to_call, tokens = restore_node(tokens)
-        num = int(tokens[0])
-        tokens = tokens[1:]
+    def restore(cls, reader):
+        reader.next()
+        node_to_call = yield
+        num = int(reader.next())
 
         args = []
         for i in range(num):
-            arg, tokens = restore_node(tokens)
+            arg = yield
             args.append(arg)
-        return cls(node_to_call, args), tokens
+        return cls(node_to_call, args)
+
+class ListNode(Span):
+    __slots__ = ("element_nodes", "discarded", "start", "end", "source")
 
-class ListNode:
     def __init__(self, element_nodes, pos_start, pos_end):
         self.element_nodes = element_nodes
-        self.pos_start = pos_start
-        self.pos_end = pos_end
+        self.discarded = False  # its value is never used, see resolver.mark_discarded
+        self.start = pos_start.idx
+        self.end = pos_end.idx
+        self.source = pos_start.source
 
     def __repr__(self):
         return f"[{','.join([repr(item) for item in self.element_nodes])}]"
@@ -405,40 +520,45 @@ class ListNode:
         return f"LN,{len(self.element_nodes)}{','+elements if len(self.element_nodes)>0 else ''}"
 
     @classmethod
-    def restore(cls, tokens):
-        tokens = tokens[1:]
-        node_num = int(tokens[0])
-        tokens = tokens[1:]
+    def restore(cls, reader):
+        reader.next()
+        node_num = int(reader.next())
 
         nodes = []
         for i in range(node_num):
-            node, tokens = restore_node(tokens)
+            node = yield
             nodes.append(node)
-        return cls(nodes, Position(0,0,0), Position(0,0,0)), tokens
+        return cls(nodes, Position(0), Position(0))
+
+class ReturnNode(Span):
+    __slots__ = ("node_to_return", "start", "end", "source")
 
-class ReturnNode:
     def __init__(self, node_to_return, pos_start, pos_end):
         self.node_to_return = node_to_return
-        self.pos_start = pos_start
-        self.pos_end = pos_end
+        self.start = pos_start.idx
+        self.end = pos_end.idx
+        self.source = pos_start.source
 
     def __repr__(self):
         return "<return>"
 
     def save(self, str_list):
-        node_to_return = self.node_to_return.save(str_list)
+        node_to_return = self.node_to_return.save(str_list) if self.node_to_return else "None"
         return f"RT,{node_to_return}"
 
     @classmethod
-    def restore(cls, tokens):
-        tokens = tokens[1:]
-        node_to_return, tokens = restore_node(tokens)
-        return cls(node_to_return, Position(0,0,0), Position(0,0,0)), tokens
+    def restore(cls, reader):
+        reader.next()
+        node_to_return = yield
+        return cls(node_to_return, Position(0), Position(0))
+
+class ContinueNode(Span):
+    __slots__ = ("start", "end", "source")
 
-class ContinueNode:
     def __init__(self, pos_start, pos_end):
-        self.pos_start = pos_start
-        self.pos_end = pos_end
+        self.start = pos_start.idx
+        self.end = pos_end.idx
+        self.source = pos_start.source
 
     def __repr__(self):
         return "<continue>"
@@ -447,14 +567,17 @@ class ContinueNode:
         return "CT"
 
     @classmethod
-    def restore(cls, tokens):
-        tokens = tokens[1:]
-        return cls(Position(0,0,0), Position(0,0,0)), tokens
+    def restore(cls, reader):
+        reader.next()
+        return cls(Position(0), Position(0))
+
+class BreakNode(Span):
+    __slots__ = ("start", "end", "source")
 
-class BreakNode:
     def __init__(self, pos_start, pos_end):
-        self.pos_start = pos_start
-        self.pos_end = pos_end
+        self.start = pos_start.idx
+        self.end = pos_end.idx
+        self.source = pos_start.source
 
     def __repr__(self):
         return "<break>"
@@ -463,9 +586,9 @@ class BreakNode:
         return "BK"
 
     @classmethod
-    def restore(cls, tokens):
-        tokens = tokens[1:]
-        return cls(Position(0,0,0), Position(0,0,0)), tokens
+    def restore(cls, reader):
+        reader.next()
+        return cls(Position(0), Position(0))
 
 Node_Name_Map = {
     "BO": BinOpNode,
@@ -0,0 +1,218 @@
+"""
+Deterministic profiler for BASIC programs. It times every call of a Function and every source
+line, with a clock read at each call, line change and return, and keeps for each of them:
+- calls: how often it was entered
+- inclusive: the time from entering to leaving it; a recursive call counts only once
+- exclusive: that time less the time spent in the functions (or lines) it ran
+
+The program runs on ProfilingInterpreter, a subclass of the tree-walking Interpreter, so the
+interpreters used when no profiler is given do not pay for a single check. A script the program
+loads with run() is profiled with it: its top level is timed as a "<program>" call inside the line
+of the run(), and its lines as lines of that script.
+
+    python -m profiler script.basic [collapsed.txt]
+
+prints the report and writes the collapsed stacks (see collapsed()) for flamegraph.pl or speedscope.
+"""
+import sys
+import time
+
+from interpreter import Interpreter
+from nodes import ListNode
+from util import DispatchTable, global_classes
+from values import TailCall
+
+PROGRAM = "<program>"
+
+
+class Stat:
+    __slots__ = ("calls", "inclusive", "exclusive", "active")
+
+    def __init__(self):
+        self.calls = 0
+        self.inclusive = 0
+        self.exclusive = 0
+        self.active = 0  # the calls of it still running, the outermost one adds the inclusive time
+
+
+class Profiler:
+    """Collects the times of the programs run with it (basic.run(..., profiler=p)); clock counts ns"""
+    # the profilers of the programs being run, the innermost last; the builtin run() profiles with it
+    running = []
+
+    def __init__(self, clock=time.perf_counter_ns):
+        self.clock = clock
+        self.functions = {}  # function name -> Stat
+        self.lines = {}  # (filename, line) -> Stat
+        self.stacks = {}  # the function names of a call stack joined by ";" -> exclusive time
+        # [Stat, start, time spent in the entries above it, len(function_stack) at the start] for every
+        # running call, and for every line being run
+        self.function_stack = []
+        self.line_stack = []
+        self.path = []  # the names of function_stack
+        self.node_lines = {}
+
+    @classmethod
+    def current(cls):
+        """The profiler of the program being run, None when it is not profiled"""
+        return cls.running[-1] if cls.running else None
+
+    def interpreter(self, engine="visitor"):
+        """The tree walker that profiles into this object, for run_script; it is the only engine profiled"""
+        if engine != "visitor":
+            raise ValueError(f"The {engine} engine cannot be profiled, only the visitor")
+        return ProfilingInterpreter(self)
+
+    def line_of(self, node):
+        line = self.node_lines.get(node)
+        if line is None:
+            source = node.source
+            if source is None:
+                line = ("<unknown>", 0)
+            else:
+                line = (source.filename, source.line_col(node.start)[0] + 1)
+            self.node_lines[node] = line
+        return line
+
+    def enter(self, stack, table, key, now):
+        stat = table.get(key)
+        if stat is None:
+            stat = table[key] = Stat()
+        stat.calls += 1
+        stat.active += 1
+        stack.append([stat, now, 0, len(self.function_stack)])
+
+    @staticmethod
+    def leave(stack, now):
+        """Close the top entry of stack; returns its exclusive time"""
+        stat, start, inner, depth = stack.pop()
+        elapsed = now - start
+        stat.exclusive += elapsed - inner
+        stat.active -= 1
+        if stat.active == 0:
+            stat.inclusive += elapsed
+        if stack:
+            stack[-1][2] += elapsed
+        return elapsed - inner
+
+    def enter_function(self, name):
+        name = name or "<anonymous>"
+        self.path.append(name)
+        self.enter(self.function_stack, self.functions, name, self.clock())
+
+    def leave_function(self):
+        exclusive = self.leave(self.function_stack, self.clock())
+        path = ";".join(self.path)
+        self.stacks[path] = self.stacks.get(path, 0) + exclusive
+        self.path.pop()
+
+    def switch_function(self, name):
+        """A tail call: the running function is done, name runs in its place"""
+        self.leave_function()
+        self.enter_function(name)
+
+    def visit_line(self, handler, interpreter, node, context):
+        line = self.line_of(node)
+        line_stack = self.line_stack
+        # a node of the line being timed, in the same call, is part of that line's entry
+        if line_stack and line_stack[-1][3] == len(self.function_stack) and line_stack[-1][0] is self.lines.get(line):
+            return handler(interpreter, node, context)
+        self.enter(line_stack, self.lines, line, self.clock())
+        try:
+            return handler(interpreter, node, context)
+        finally:
+            self.leave(line_stack, self.clock())
+
+    def report(self, limit=20):
+        """The functions and lines that took the most time of their own, as a text table"""
+        rows = [f"{'function':<32}{'calls':>10}{'inclusive ms':>14}{'exclusive ms':>14}"]
+        for name, stat in self.sorted(self.functions)[:limit]:
+            rows.append(f"{name:<32}{stat.calls:>10}{stat.inclusive / 1e6:>14.3f}{stat.exclusive / 1e6:>14.3f}")
+        rows.append("")
+        rows.append(f"{'line':<32}{'hits':>10}{'inclusive ms':>14}{'exclusive ms':>14}")
+        for (filename, line), stat in self.sorted(self.lines)[:limit]:
+            rows.append(f"{f'{filename}:{line}':<32}{stat.calls:>10}{stat.inclusive / 1e6:>14.3f}{stat.exclusive / 1e6:>14.3f}")
+        return "\n".join(rows)
+
+    @staticmethod
+    def sorted(table):
+        return sorted(table.items(), key=lambda item: item[1].exclusive, reverse=True)
+
+    def collapsed(self):
+        """One "name;name;name microseconds" line per call stack, the input format of flame graph tools"""
+        return "".join(f"{path} {time // 1000}\n" for path, time in sorted(self.stacks.items()))
+
+
+class LineTable(DispatchTable):
+    """The dispatch of ProfilingInterpreter: every node is run through Profiler.visit_line"""
+    def find(self, key):
+        handler = self.get(key)
+        if handler is None:
+            handler = getattr(self.owner, f"visit_{key.__name__}", None) or Interpreter.visitors.find(key)
+            if handler is None:
+                return None
+            if key is not ListNode:  # statements and list elements count for their own lines
+                handler = self.timed(handler)
+            self[key] = handler
+        return handler
+
+    @staticmethod
+    def timed(handler):
+        def visit(interpreter, node, context):
+            return interpreter.profiler.visit_line(handler, interpreter, node, context)
+        return visit
+
+
+class ProfilingInterpreter(Interpreter):
+    def __init__(self, profiler):
+        super().__init__()
+        self.profiler = profiler
+
+    def visit(self, node, context):
+        if self.running:
+            return super().visit(node, context)
+        Profiler.running.append(self.profiler)
+        self.profiler.enter_function(PROGRAM)
+        try:
+            return super().visit(node, context)
+        finally:
+            self.profiler.leave_function()
+            Profiler.running.pop()
+
+    def call_function(self, function, args, context, span):
+        self.profiler.enter_function(function.name)
+        try:
+            return super().call_function(function, args, context, span)
+        finally:
+            self.profiler.leave_function()
+
+    def visit_CallNode(self, node, context):
+        value = super().visit_CallNode(node, context)
+        if type(value) is TailCall:
+            self.profiler.switch_function(value.function.name)
+        return value
+
+ProfilingInterpreter.visitors = LineTable(ProfilingInterpreter, "visit_")
+
+global_classes["Profiler"] = Profiler
+
+
+def main(argv):
+    import basic
+    if len(argv) < 2:
+        print("usage: python -m profiler script.basic [collapsed.txt]")
+        return 2
+    with open(argv[1]) as f:
+        text = f.read()
+    profiler = Profiler()
+    result, error = basic.run(text, argv[1], profiler=profiler)
+    if error:
+        print(repr(error))
+    print(profiler.report())
+    if len(argv) > 2:
+        with open(argv[2], "w") as f:
+            f.write(profiler.collapsed())
+    return 1 if error else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,177 @@
+"""
+Numbers the local variables of function bodies. Every name a body binds (its arguments, var
+assignments, for loop variables and named functions) gets a slot in the Frame of a call, and the
+nodes that read or bind it are annotated with that slot, so the interpreter indexes a list instead
+of hashing the name into every table of the call chain.
+
+It also marks the calls in tail position, whose value the function returns as it is: the value of
+a return and the body of an arrow function, through the branches of if expressions. Every
+engine runs those in the loop of the call that made them instead of on top of it; the compiling
+engines resolve a function when they compile it, for these marks.
+
+mark_discarded finds the loops and lists whose value is never used, like the statements of a body
+that returns null, so the interpreter does not collect their values.
+
+Functions see the variables of their caller, so a name the body does not bind has no fixed place
+and keeps the dynamic lookup through the parent tables; so does a local that is read before it is
+bound, which still finds the caller's variable of that name, like SymbolTable.get would.
+"""
+
+from nodes import VarAccessNode, VarAssignNode, ForNode, WhileNode, FunDefNode, CallNode, IfNode, ListNode, ReturnNode
+from util import DispatchTable
+
+
+class Scope:
+    """The local names of one function body and their slots; the arguments take the first ones"""
+    __slots__ = ("slots", "arg_names", "args_fill_slots")
+
+    def __init__(self, arg_names=()):
+        self.slots = {}
+        self.arg_names = list(arg_names)
+        for arg_name in self.arg_names:
+            self.add(arg_name)
+        # argument i is slot i, unless a name is repeated
+        self.args_fill_slots = len(self.slots) == len(self.arg_names)
+
+    def add(self, name):
+        return self.slots.setdefault(name, len(self.slots))
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __repr__(self):
+        return f"<scope {', '.join(self.slots)}>"
+
+
+class Resolver:
+    """Walks one function body without recursion; nested functions are resolved when they are defined"""
+    @classmethod
+    def register_node(cls, node_class, children_method=None):
+        """Hook for new node types: children_method(node) returns the child nodes to walk"""
+        return cls.children.register(node_class, children_method)
+
+    @staticmethod
+    def children_leaf(node):
+        return ()
+
+    children_NumberNode = children_StringNode = children_VarAccessNode = children_leaf
+    children_ContinueNode = children_BreakNode = children_FunDefNode = children_leaf
+
+    @staticmethod
+    def children_BinOpNode(node):
+        return node.left_node, node.right_node
+
+    @staticmethod
+    def children_UnaryOpNode(node):
+        return node.node,
+
+    @staticmethod
+    def children_VarAssignNode(node):
+        return node.value_node,
+
+    @staticmethod
+    def children_IfNode(node):
+        children = []
+        for condition, expr, should_return_null in node.cases:
+            children += (condition, expr)
+        if node.else_case is not None:
+            children.append(node.else_case[0])
+        return children
+
+    @staticmethod
+    def children_WhileNode(node):
+        return node.condition, node.body_node
+
+    @staticmethod
+    def children_ForNode(node):
+        if node.step_node is None:
+            return node.start_node, node.end_node, node.body_node
+        return node.start_node, node.end_node, node.step_node, node.body_node
+
+    @staticmethod
+    def children_CallNode(node):
+        return [node.node_to_call] + node.arg_nodes
+
+    @staticmethod
+    def children_ListNode(node):
+        return node.element_nodes
+
+    @staticmethod
+    def children_ReturnNode(node):
+        return (node.node_to_return,) if node.node_to_return else ()
+
+Resolver.children = DispatchTable(Resolver, "children_")
+
+
+def resolve(fun_def):
+    """Give the locals of a FunDefNode's body slots and annotate its nodes; returns (and keeps) its Scope"""
+    scope = Scope(arg.value for arg in fun_def.arg_name_toks)
+    children = Resolver.children
+    names = []
+    # the nodes whose value is returned
+    tails = [fun_def.body_node] if fun_def.should_auto_return else []
+    stack = [fun_def.body_node]
+    while stack:
+        node = stack.pop()
+        node_type = type(node)
+        if node_type is VarAccessNode:
+            names.append(node)
+        elif node_type is VarAssignNode or node_type is ForNode:
+            scope.add(node.var_name_tok.value)
+            names.append(node)
+        elif node_type is FunDefNode:
+            if node.var_name_tok is not None:
+                scope.add(node.var_name_tok.value)
+                names.append(node)
+        elif node_type is ReturnNode:
+            if node.node_to_return is not None:
+                tails.append(node.node_to_return)
+        stack.extend(reversed(children[node_type](node)))
+
+    while tails:
+        node = tails.pop()
+        if type(node) is CallNode:
+            node.tail = True
+        elif type(node) is IfNode:
+            tails += [expr for condition, expr, should_return_null in node.cases if not should_return_null]
+            if node.else_case is not None and not node.else_case[1]:
+                tails.append(node.else_case[0])
+
+    # every binding is known now, a read can come before the assignment it refers to
+    slots = scope.slots
+    for node in names:
+        node.slot = slots.get(node.var_name_tok.value)
+    fun_def.scope = scope
+    mark_discarded(fun_def.body_node, not fun_def.should_auto_return)
+    return scope
+
+
+def mark_discarded(node, discarded=False):
+    """
+    Set .discarded on the loops and lists in a tree (but not in the bodies of its functions) whose
+    value is thrown away: the bodies of loops, if blocks and functions that return null and
+    everything evaluated only as a part of such a value. discarded tells if node's value itself is.
+    """
+    children = Resolver.children
+    stack = [(node, discarded)]
+    while stack:
+        node, discarded = stack.pop()
+        node_type = type(node)
+        if node_type is ListNode:
+            node.discarded = discarded
+            stack += [(element, discarded) for element in node.element_nodes]
+        elif node_type is ForNode or node_type is WhileNode:
+            node.discarded = discarded or node.should_return_null
+            stack += [(child, False) for child in children[node_type](node) if child is not node.body_node]
+            stack.append((node.body_node, node.discarded))
+        elif node_type is IfNode:
+            for condition, expr, should_return_null in node.cases:
+                stack += [(condition, False), (expr, discarded or should_return_null)]
+            if node.else_case is not None:
+                expr, should_return_null = node.else_case
+                stack.append((expr, discarded or should_return_null))
+        else:
+            # a node registered with the interpreter only is not looked into, its values are all kept
+            node_children = children.find(node_type)
+            if node_children is not None:
+                stack += [(child, False) for child in node_children(node)]
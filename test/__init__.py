@@ -0,0 +1,9 @@
+import atexit
+import shutil
+import tempfile
+from cache import CompileCache
+
+# scripts run by the tests are cached in a directory of their own, not in the user's cache
+cache_dir = tempfile.mkdtemp(prefix="canobasic-test-")
+CompileCache.set_default(CompileCache(cache_dir))
+atexit.register(shutil.rmtree, cache_dir, True)
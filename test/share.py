@@ -1,11 +1,12 @@
 from basicParser import Parser
 from interpreter import Interpreter, Context, SymbolTable, Number, BuiltInFunction
-from lexer import Lexer
+from lexer import Lexer, make_lexer
 from nodes import archieve_nodes, restore_nodes
+from util import global_engines
 
 
-def run_tokenize(text, filename="<basic>"):
-    lexer = Lexer(text, filename)
+def run_tokenize(text, filename="<basic>", engine="char"):
+    lexer = make_lexer(text, filename, engine)
     tokens, error = lexer.make_tokens()
 
     if error:
@@ -14,6 +15,11 @@ def run_tokenize(text, filename="<basic>"):
         texts = [repr(item) for item in tokens]
         return '[' + ", ".join(texts) + ']'
 
+def parse(text, filename="<basic>"):
+    tokens, _ = Lexer(text, filename).make_tokens()
+    ast, _ = Parser(tokens).parse()
+    return ast
+
 def run_parser(text, filename="<basic>"):
     lexer = Lexer(text, filename)
     tokens, error = lexer.make_tokens()
@@ -81,7 +87,7 @@ global_symbol_table.set("extend", BuiltInFunction.extend)
 global_symbol_table.set("len", BuiltInFunction.len)
 global_symbol_table.set("run", BuiltInFunction.run)
 
-def run_interpreter(text, filename="<basic>"):
+def run_interpreter(text, filename="<basic>", engine="visitor"):
     lexer = Lexer(text, filename)
     tokens, error = lexer.make_tokens()
     if error: return repr(error)
@@ -90,7 +96,7 @@ def run_interpreter(text, filename="<basic>"):
     ast,error = parser.parse()
     if error: return repr(error)
 
-    interpreter = Interpreter()
+    interpreter = global_engines[engine]()
     context = Context("<Program>")
     context.symbol_table = global_symbol_table
     value = interpreter.visit(ast, context)
@@ -0,0 +1,102 @@
+import gc
+import os
+import tempfile
+import unittest
+from archive import ArchiveError, PausedGC, encode_archive, decode_archive, save_archive, load_archive
+from interpreter import Interpreter, Context
+from test.share import global_symbol_table, parse
+
+
+def interpret(ast):
+    interpreter = Interpreter()
+    context = Context("<Program>")
+    context.symbol_table = global_symbol_table
+    value = interpreter.visit(ast, context)
+    return repr(interpreter.error) if interpreter.error else repr(value)
+
+PROGRAM = """fun add(a, b) -> a + b
+var x = [1, -2.5, "a, b\nc"]
+for i = 0 to 3 step 1 then
+ var x = add(x, i)
+ if i == 1 then continue elif i > 5 then break else var y = 0
+end
+while not 1 and 0 then 3
+fun ()
+ return
+end
+"""
+
+class TestArchive(unittest.TestCase):
+    def test_round_trip(self):
+        ast = parse(PROGRAM)
+        for positions in (True, False):
+            self.assertEqual(repr(decode_archive(encode_archive(ast, positions))), repr(ast))
+
+    def test_strings(self):
+        ast = parse('"a,b\nc" + "ä#%%#"')
+        self.assertEqual(repr(decode_archive(encode_archive(ast))), repr(ast))
+
+    def test_positions(self):
+        ast = parse("var a = 1\nvar b = a + c", "lib.basic")
+        restored = decode_archive(encode_archive(ast))
+        self.assertEqual(
+            interpret(restored),
+            "Traceback: \n File lib.basic, line 2, in <Program>\nRuntime Error: 'c' is not defined, File lib.basic, line 2 column 12"
+        )
+        self.assertEqual(interpret(restored), interpret(ast))
+
+    def test_without_positions(self):
+        ast = parse("var a = 1\nvar b = a + c")
+        restored = decode_archive(encode_archive(ast, positions=False))
+        self.assertEqual(restored.element_nodes[1].start, 0)
+        self.assertIsNone(restored.element_nodes[1].source)
+        self.assertLess(len(encode_archive(ast, positions=False)), len(encode_archive(ast)))
+
+    def test_deep_tree(self):
+        ast = parse("-" * 3000 + "1")
+        restored = decode_archive(encode_archive(ast))
+        node, depth = restored.element_nodes[0], 0
+        while hasattr(node, "op_tok"):
+            node, depth = node.node, depth + 1
+        self.assertEqual(depth, 3000)
+
+    def test_paused_gc(self):
+        # overlapping pauses, as from two threads: the collector is back on once both have ended
+        first, second = PausedGC(), PausedGC()
+        first.__enter__()
+        second.__enter__()
+        first.__exit__(None, None, None)
+        self.assertFalse(gc.isenabled())
+        second.__exit__(None, None, None)
+        self.assertTrue(gc.isenabled())
+
+        gc.disable()
+        try:
+            with PausedGC():
+                pass
+            self.assertFalse(gc.isenabled())  # it was off before
+        finally:
+            gc.enable()
+
+    def test_file(self):
+        fd, filepath = tempfile.mkstemp(suffix=".cba")
+        os.close(fd)
+        try:
+            ast = parse("fun f(n) -> if n <= 1 then 1 else n * f(n - 1)\nf(5)")
+            save_archive(ast, filepath)
+            self.assertEqual(interpret(load_archive(filepath)), "[<function f>,120]")
+        finally:
+            os.remove(filepath)
+
+    def test_bad_archive(self):
+        with self.assertRaises(ArchiveError):
+            decode_archive(b"CBA")
+        with self.assertRaises(ArchiveError):
+            decode_archive(b"#%%#" + encode_archive(parse("1"))[4:])
+        data = bytearray(encode_archive(parse("1")))
+        data[4] = 99
+        with self.assertRaises(ArchiveError):
+            decode_archive(data)
+
+if __name__ == '__main__':
+    unittest.main()
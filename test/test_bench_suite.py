@@ -0,0 +1,40 @@
+import unittest
+from benchmarks.bench_suite import MIN_DIFFERENCE, compare
+
+
+def report(**programs):
+    """A report of the suite; every phase is given as (mean, stdev)"""
+    return {"programs": {name: {phase: {"mean": mean, "stdev": stdev} for phase, (mean, stdev) in phases.items()}
+                         for name, phases in programs.items()}}
+
+class TestCompare(unittest.TestCase):
+    def test_threshold(self):
+        baseline = report(fib={"execute": (10.0, 0.0)})
+        self.assertEqual(compare(report(fib={"execute": (10.9, 0.0)}), baseline), [])
+        self.assertEqual(compare(report(fib={"execute": (11.5, 0.0)}), baseline), [("fib", "execute", 11.5, 10.0)])
+        self.assertEqual(compare(report(fib={"execute": (11.5, 0.0)}), baseline, threshold=0.2), [])
+        # faster is never a regression
+        self.assertEqual(compare(report(fib={"execute": (5.0, 0.0)}), baseline), [])
+
+    def test_noise(self):
+        # the difference has to be more than twice the larger standard deviation
+        baseline = report(fib={"execute": (10.0, 1.0)})
+        self.assertEqual(compare(report(fib={"execute": (11.5, 0.5)}), baseline), [])
+        self.assertEqual(compare(report(fib={"execute": (12.5, 0.5)}), baseline), [("fib", "execute", 12.5, 10.0)])
+        self.assertEqual(compare(report(fib={"execute": (12.5, 1.5)}), baseline), [])
+
+    def test_min_difference(self):
+        # the quick phases of small programs are slower by a large fraction of almost nothing
+        baseline = report(fib={"lex": (0.2, 0.0)})
+        self.assertEqual(compare(report(fib={"lex": (0.2 + MIN_DIFFERENCE * 0.8, 0.0)}), baseline), [])
+        slower = 0.2 + MIN_DIFFERENCE * 1.5
+        self.assertEqual(compare(report(fib={"lex": (slower, 0.0)}), baseline), [("fib", "lex", slower, 0.2)])
+
+    def test_missing_from_baseline(self):
+        # programs and phases the baseline does not have are not compared
+        baseline = report(fib={"execute": (10.0, 0.0)})
+        current = report(fib={"execute": (10.0, 0.0), "load": (50.0, 0.0)}, sort={"execute": (50.0, 0.0)})
+        self.assertEqual(compare(current, baseline), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import os
+import tempfile
+import unittest
+import vm
+from archive import ArchiveError
+from bytecode import BytecodeCompiler, OPNAMES, dump_code, loads_code, save_code, load_code
+from interpreter import Context, SymbolTable
+from test.share import global_symbol_table, parse
+
+
+def compile_text(text, filename="<basic>"):
+    return BytecodeCompiler.compile_program(parse(text, filename))
+
+def execute(code):
+    interpreter = vm.VMInterpreter()
+    context = Context("<Program>")
+    context.symbol_table = SymbolTable(global_symbol_table)
+    value = interpreter.run(code, context)
+    return repr(interpreter.error) if interpreter.error else repr(value)
+
+PROGRAM = """fun fib(n) -> if n < 2 then n else fib(n - 1) + fib(n - 2)
+var x = [fib(10), -2.5, "a, b\nc", 1.0]
+for i = 0 to 5 then
+ if i == 1 then continue elif i == 3 then break
+ i
+end
+"""
+
+class TestBytecode(unittest.TestCase):
+    def test_constants(self):
+        code = compile_text("1 + 1.0 + 1 + \"1\"")
+        self.assertEqual([(type(const), const) for const in code.consts], [(int, 1), (float, 1.0), (str, "1")])
+
+    def test_disassemble(self):
+        self.assertEqual(
+            compile_text("var a = -b").disassemble(),
+            "   0 LOAD_NAME          0 (b)\n"
+            "   1 UNARY_OP           1 (negated)\n"
+            "   2 STORE_NAME         2 (a)\n"
+            "   3 BUILD_LIST         1\n"
+            "   4 END                0"
+        )
+
+    def test_tail_call(self):
+        code = compile_text("fun f(n) -> if n then f(n - 1) else g(n)\nf(2)")
+        self.assertEqual([OPNAMES[op] for op, arg, span in code.consts[0].instructions].count("TAIL_CALL"), 2)
+        self.assertNotIn("TAIL_CALL", [OPNAMES[op] for op, arg, span in code.instructions])
+        self.assertEqual(loads_code(dump_code(code)).consts[0].disassemble(), code.consts[0].disassemble())
+
+    def test_discarded_loop(self):
+        # only the loop whose value is returned collects the values of its body
+        code = compile_text("fun f(n)\n for i = 0 to n then i * 2\n while n then var n = n - 1\n return for i = 0 to n then i\nend")
+        ops = [OPNAMES[op] for op, arg, span in code.consts[0].instructions]
+        self.assertEqual((ops.count("NEW_ELEMENTS"), ops.count("LIST_APPEND")), (1, 1))
+
+    def test_locals(self):
+        # a function reads and assigns its locals through slots; an assignment whose value is not used pops it
+        code = compile_text("fun f(n)\n var t = n * 2\n for i = 0 to n then var t = t + i\n return t\nend\nf(3)")
+        ops = [OPNAMES[op] for op, arg, span in code.consts[0].instructions]
+        self.assertNotIn("LOAD_NAME", ops)
+        self.assertEqual((ops.count("LOAD_LOCAL"), ops.count("STORE_LOCAL_POP"), ops.count("FOR_ITER_LOCAL")), (5, 2, 1))
+        restored = loads_code(dump_code(code))
+        self.assertEqual(restored.consts[0].disassemble(), code.consts[0].disassemble())
+        self.assertEqual(execute(restored), execute(code))
+        self.assertEqual(execute(code), "[<function f>,9]")
+
+    def test_superinstructions(self):
+        # a load and the BINARY_OP after it run as one instruction; jumps can still go to the BINARY_OP
+        self.assertEqual(execute(compile_text("var c = 0\n10 - (if c then 1 else 2) - c")), "[0,8]")
+        self.assertEqual(
+            execute(compile_text("fun f(a) -> a + b\nf(1)", "lib.basic")),
+            "Traceback: \n File lib.basic, line 2, in <Program>\nRuntime Error: 'b' is not defined, File lib.basic, line 1 column 16"
+        )
+
+    def test_round_trip(self):
+        code = compile_text(PROGRAM)
+        for positions in (True, False):
+            restored = loads_code(dump_code(code, positions))
+            self.assertEqual(restored.disassemble(), code.disassemble())
+            self.assertEqual(restored.consts[0].disassemble(), code.consts[0].disassemble())
+            self.assertEqual(execute(restored), execute(code))
+        self.assertEqual(execute(code), '[<function fib>,[55,-2.5,a, b\nc,1.0],0]')
+
+    def test_lone_surrogate(self):
+        code = compile_text('var s = "a\ud800b"\ns')
+        restored = loads_code(dump_code(code))
+        self.assertEqual(restored.consts, ["a\ud800b"])
+        self.assertEqual(ascii(execute(restored)), ascii(execute(code)))
+
+    def test_positions(self):
+        code = compile_text("fun f(a) -> a / 0\nf(1)", "lib.basic")
+        self.assertEqual(code.line_of(len(code.instructions) - 3), 2)
+        restored = loads_code(dump_code(code))
+        self.assertEqual(
+            execute(restored),
+            "Traceback: \n File lib.basic, line 2, in <Program>\nRuntime Error: Division by zero, File lib.basic, line 1 column 16"
+        )
+        self.assertLess(len(dump_code(code, positions=False)), len(dump_code(code)))
+
+        # the divisor is the shared null, the error is pointed at it through the span of the operator
+        code = compile_text("1 / (if 0 then 1)", "lib.basic")
+        for restored in (code, loads_code(dump_code(code))):
+            self.assertEqual(
+                execute(restored),
+                "Traceback: \n File lib.basic, line 1, in <Program>\nRuntime Error: Division by zero, File lib.basic, line 1 column 8"
+            )
+        self.assertIn("Division by zero", execute(loads_code(dump_code(code, positions=False))))
+
+    def test_file(self):
+        fd, filepath = tempfile.mkstemp(suffix=".cbc")
+        os.close(fd)
+        try:
+            save_code(compile_text("fun f(n) -> if n <= 1 then 1 else n * f(n - 1)\nf(5)"), filepath)
+            self.assertEqual(execute(load_code(filepath)), "[<function f>,120]")
+        finally:
+            os.remove(filepath)
+
+    def test_bad_code(self):
+        with self.assertRaises(ArchiveError):
+            loads_code(b"CBB")
+        with self.assertRaises(ArchiveError):
+            loads_code(b"CBAR" + dump_code(compile_text("1"))[4:])
+        data = bytearray(dump_code(compile_text("1")))
+        data[4] = 99
+        with self.assertRaises(ArchiveError):
+            loads_code(data)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from cache import CompileCache
+from test.share import run_interpreter
+
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), "example.test")
+
+def compile_in_process(args):
+    root, text = args
+    ast, error = CompileCache(root).compile(text, "lib.basic")
+    return repr(ast)
+
+class TestCompileCache(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.cache = CompileCache(self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def entries(self):
+        return sorted(name for name in os.listdir(self.root) if name.endswith(".cba"))
+
+    def test_hit_and_miss(self):
+        ast, error = self.cache.compile("var a = 1 + 2", "lib.basic")
+        cached, error = self.cache.compile("var a = 1 + 2", "lib.basic")
+        self.assertIsNone(error)
+        self.assertEqual(repr(cached), repr(ast))
+        self.assertEqual(self.cache.stats(), {"hits": 1, "misses": 1, "stores": 1, "evictions": 0, "errors": 0})
+
+        # an edited file or another path is another entry
+        self.cache.compile("var a = 1 + 3", "lib.basic")
+        self.cache.compile("var a = 1 + 2", "other.basic")
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 3))
+        self.assertEqual(len(self.entries()), 3)
+
+    def test_errors_are_not_cached(self):
+        ast, error = self.cache.compile("var a = ", "lib.basic")
+        self.assertIsNotNone(error)
+        self.cache.compile("var a = ", "lib.basic")
+        self.assertEqual((self.cache.hits, self.cache.misses, self.cache.stores), (0, 2, 0))
+        self.assertEqual(self.entries(), [])
+
+    def test_lone_surrogate(self):
+        # used to raise a UnicodeEncodeError out of compile
+        text = '"a\ud800b"'
+        self.cache.compile(text, "lib.basic")
+        ast, error = self.cache.compile(text, "lib.basic")
+        self.assertEqual(ast.element_nodes[0].tok.value, "a\ud800b")
+        self.assertEqual((self.cache.hits, self.cache.stores, self.cache.errors), (1, 1, 0))
+
+    def test_damaged_entry(self):
+        self.cache.compile("1 + 2", "lib.basic")
+        with open(self.cache.path_for("1 + 2", "lib.basic"), "wb") as f:
+            f.write(b"CBAR\x01")
+        ast, error = self.cache.compile("1 + 2", "lib.basic")
+        self.assertEqual(repr(ast.element_nodes[0]), "(1,PLS,2)")
+        self.assertEqual((self.cache.hits, self.cache.misses, self.cache.errors), (0, 2, 1))
+
+    def test_lru_eviction(self):
+        self.cache.compile("1", "a.basic")
+        size = os.path.getsize(self.cache.path_for("1", "a.basic"))
+        self.cache.max_bytes = 2 * size + size // 2
+        self.cache.compile("2", "b.basic")
+
+        # a.basic is used again, so b.basic is the least recently used entry
+        past = time.time() - 10
+        os.utime(self.cache.path_for("2", "b.basic"), (past, past))
+        self.cache.compile("1", "a.basic")
+        self.cache.compile("3", "c.basic")
+
+        self.assertEqual(self.cache.evictions, 1)
+        self.assertTrue(os.path.exists(self.cache.path_for("1", "a.basic")))
+        self.assertFalse(os.path.exists(self.cache.path_for("2", "b.basic")))
+        self.assertTrue(os.path.exists(self.cache.path_for("3", "c.basic")))
+
+    def test_disabled(self):
+        cache = CompileCache(self.root, enabled=False)
+        cache.compile("1", "a.basic")
+        self.assertEqual(self.entries(), [])
+
+    def test_processes(self):
+        text = "fun f(n) -> n * 2\nf(21)"
+        with multiprocessing.Pool(4) as pool:
+            results = pool.map(compile_in_process, [(self.root, text)] * 8)
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(len(self.entries()), 1)
+        self.assertEqual([name for name in os.listdir(self.root) if name.endswith(".tmp")], [])
+
+    def test_run_builtin(self):
+        previous = CompileCache.set_default(self.cache)
+        try:
+            self.assertEqual(run_interpreter(f'run("{EXAMPLE}")'), "[<function test>,4]")
+            self.assertEqual(run_interpreter(f'run("{EXAMPLE}")'), "[<function test>,4]")
+        finally:
+            CompileCache.set_default(previous)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+from error import Span
+from interpreter import Interpreter, Context, Number, BuiltInFunction
+from nodes import NumberNode
+from basicToken import Token, CONSTANT
+from test.share import run_interpreter, global_symbol_table
+
+
+class DoubleNode(Span):
+    __slots__ = ("node", "start", "end", "source")
+
+    def __init__(self, node):
+        self.node = node
+        self.start = node.start
+        self.end = node.end
+        self.source = node.source
+
+class UnknownNode(DoubleNode):
+    __slots__ = ()
+
+@Interpreter.register_node(DoubleNode)
+def visit_DoubleNode(interpreter, node, context):
+    value = interpreter.visit(node.node, context)
+    return Number(value.value * 2).set_pos(node).set_context(context)
+
+def execute_twice(builtin, exec_ctx):
+    return Number(exec_ctx.symbol_table.get("value").value * 2), None
+execute_twice.arg_names = ["value"]
+
+class TestDispatch(unittest.TestCase):
+    def test_register_node(self):
+        node = DoubleNode(DoubleNode(NumberNode(Token(CONSTANT.INT, 5))))
+        value = Interpreter().visit(node, Context("<test>"))
+        self.assertEqual(repr(value), "20")
+
+    def test_unknown_node(self):
+        node = UnknownNode(NumberNode(Token(CONSTANT.INT, 5)))
+        with self.assertRaisesRegex(Exception, "No visit_UnknownNode method defined"):
+            Interpreter().visit(node, Context("<test>"))
+
+    def test_register_builtin(self):
+        BuiltInFunction.register("twice", execute_twice)
+        global_symbol_table.set("twice", BuiltInFunction("twice"))
+        try:
+            self.assertEqual(run_interpreter("twice(21)"), "42")
+            self.assertEqual(run_interpreter("len([1, 2])"), "2")
+        finally:
+            global_symbol_table.remove("twice")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import unittest
+import closures
+import transpiler
+import vm
+from basicParser import Parser
+from interpreter import Context, SymbolTable
+from lexer import Lexer
+from util import global_engines
+from values import Number, EngineFunction
+from test.share import global_symbol_table, run_interpreter
+
+
+# every engine has to give the same result as the visitor on each of these
+PROGRAMS = [
+    "1 + 2 * 3 - 4 / 2 ^ 2",
+    "-(3) + +2",
+    "not 0 and 1 or 0",
+    '"ab" + "c" * 2',
+    "var a = 5\nvar b = a * 2\nb - a",
+    "[1, 2, 3] + 4",
+    "[1, 2] * [3, 4]",
+    "[10, 20, 30] / 1",
+    "[10, 20, 30] - 0",
+    "if 1 > 2 then 10 elif 2 > 1 then 20 else 30",
+    "if 0 then 1",
+    "if 1 then\n 5\nelse\n 6\nend",
+    "for i = 0 to 5 then i * 2",
+    "for i = 5 to 0 step -2 then i",
+    "var s = 0\nfor i = 0 to 10 then\n if i == 3 then continue\n if i == 7 then break\n var s = s + i\nend\ns",
+    "for i = 0 to 1.5 step 0.5 then i",
+    "for i = 0.5 to 3 then i",
+    "for i = 0 to 4 then var i = i * 10",
+    "var n = 3\nfor i = 0 to n then var n = 10",
+    "fun f(k)\n for i = k to 0 step -1 then if i == 2 then break\n return i\nend\nf(5)",
+    "var x = 1\nx + (var x = 5)",
+    "var i = 0\nwhile i < 5 then var i = i + 1",
+    "var n = 0\nfor i = 0 to 3 then\n var j = 0\n while (if j > 1 then continue else j < 5) then var j = j + 1\n var n = n + 1\nend\n[n, j]",
+    "var i = 0\nwhile i < 10 then\n var i = i + 1\n if i == 2 then continue elif i == 5 then break\n i\nend",
+    "fun add(a, b) -> a + b\nadd(2, 3)",
+    "fun fib(n) -> if n < 2 then n else fib(n - 1) + fib(n - 2)\nfib(12)",
+    "fun f(n)\n for i = 0 to 10 then\n  if i == n then return i * 10\n end\n return -1\nend\n[f(3), f(20)]",
+    "fun f()\n return\nend\nf()",
+    "fun f()\n 5\nend\nf()",
+    "var g = fun (x) -> x * x\ng(7)",
+    "fun outer(x)\n fun inner(y) -> x + y\n return inner(10)\nend\nouter(5)",
+    "fun h() -> z\nfun k()\n var z = 42\n return h()\nend\nk()",
+    "fun f(n)\n if n == 0 then return 0\n return f(n - 1)\nend\nf(1200)",
+    "fun even(n) -> if n == 0 then 1 else odd(n - 1)\nfun odd(n) -> if n == 0 then 0 else even(n - 1)\neven(3001)",
+    "fun h() -> z\nfun k(z) -> h()\nk(42)",
+    "fun f(l) -> len(l)\nf([1, 2])",
+    "var y = 7\nfun f(x)\n var r = y\n var y = x\n return [r, y]\nend\nf(1)",
+    "fun f(a, a) -> a\nf(1, 2)",
+    "fun f(n)\n fun g() -> n * 2\n var l = for i = 0 to n then g() + i\n return [l, i]\nend\nf(3)",
+    "fun f(n) -> if n then g(n - 1, 1) else 0\nfun g(n, m) -> f(n) + m\nf(6)",
+    "fun f(n) -> g(n)\nfun g() -> 1\nf(1)",
+    "fun f() -> g()\nfun g()\n break\nend\nf()",
+    "len([1, 2, 3]) + len([])",
+    "var l = [1, 2]\nappend(l, 3)\nl",
+    'is_number(1) + is_string("a") + is_list([]) + is_function(len)',
+    "return 5\n6",
+    "1\nbreak\n2",
+    "1 / 0",
+    "1 + x",
+    '"a" - 1',
+    "fun f() -> 1 - \"a\"\nf()",
+    "fun f(a) -> a\nf()",
+    "fun f(a) -> a\nf(1, 2)",
+    "fun f()\n break\nend\nf()",
+    "len(1)",
+    "5(1)",
+    "[1] / 5",
+    "var x = 2.5\nvar y = -x\n[x * 2, y, x ^ 2, 7 / 2, x == 2.5, x != 1, 3 >= 3, not x, 0 or x]",
+    "var s = \"ab\"\n[s == s, s * 2, -s, if s then 1 else 2]",
+    "var l = [1, 2]\nl == l",
+    "var x = 0\n5 / x",
+    "not \"a\"",
+    "var x = [1]\nfor i = 1 to x then 1",
+    'for i = "a" to 3 then i',
+    "var s = \"b\"\nfor i = 0 to 3 step s then i",
+    "fun f(a)\n return for i = a to undefined then i\nend\nf(\"b\")",
+    "var n = 3\nfor i = 0 to n step 0.5 then i",
+]
+
+def run(text, engine):
+    tokens, error = Lexer(text, "<basic>").make_tokens()
+    ast, error = Parser(tokens).parse()
+    if error: return repr(error)
+
+    interpreter = global_engines[engine]()
+    context = Context("<Program>")
+    context.symbol_table = SymbolTable(global_symbol_table)
+    value = interpreter.visit(ast, context)
+    return repr(interpreter.error) if interpreter.error else repr(value)
+
+# errors of operators on Number.null, which is shared and has no position of its own
+NULL_OPERAND_ERRORS = [
+    "1 / (if 0 then 1)",
+    '(if 0 then 1) + "a"',
+]
+
+class TestEngines(unittest.TestCase):
+    def check_engine(self, engine, programs=PROGRAMS):
+        for text in programs:
+            with self.subTest(engine=engine, program=text):
+                self.assertEqual(run(text, engine), run(text, "visitor"))
+
+    def test_closure(self):
+        self.check_engine("closure")
+        self.check_engine("closure", NULL_OPERAND_ERRORS)
+
+    def test_vm(self):
+        self.check_engine("vm")
+        self.check_engine("vm", NULL_OPERAND_ERRORS)
+
+    def test_python(self):
+        self.check_engine("python")
+        self.check_engine("python", NULL_OPERAND_ERRORS)
+
+    def test_unboxed(self):
+        self.check_engine("unboxed")
+        self.check_engine("unboxed", NULL_OPERAND_ERRORS)
+
+    def test_shared_values(self):
+        # literals, small ints and null are shared, an engine must not point them at a node
+        shared = [Number.null] + Number.small_ints
+        for engine in ("closure", "vm", "python", "unboxed"):
+            for text in PROGRAMS + NULL_OPERAND_ERRORS + ["+(if 0 then 1)", "[if 0 then 1] / 0"]:
+                run(text, engine)
+            with self.subTest(engine=engine):
+                self.assertEqual([value for value in shared if value.span is not None], [])
+
+    def test_shared_functions(self):
+        # a function defined by one engine can be called from another
+        run_interpreter("fun shared_double(x) -> x * 2", engine="closure")
+        self.assertEqual(run_interpreter("shared_double(21)"), "42")
+        run_interpreter("fun shared_triple(x) -> x * 3")
+        self.assertEqual(run_interpreter("shared_triple(3)", engine="closure"), "9")
+
+    def test_engine_function(self):
+        # every engine has to say how to run the body of its functions
+        with self.assertRaises(TypeError):
+            EngineFunction("f", None, [], False)
+
+    def test_error_in_function(self):
+        self.assertEqual(
+            run("fun f() -> 1 - \"a\"\nf()", "closure"),
+            "Traceback: \n File <basic>, line 2, in <Program>\nRuntime Error: Illegal operation, File <basic>, line 1 column 11"
+        )
+
+if __name__ == '__main__':
+    unittest.main()
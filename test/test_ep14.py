@@ -1,6 +1,10 @@
+import os
 import unittest
 from test.share import run_tokenize, run_interpreter, run_parser
 
+# the path goes in a BASIC string, where a backslash escapes the next character
+example = os.path.join(os.path.dirname(os.path.abspath(__file__)), "example.test").replace("\\", "/")
+
 class TestEP13(unittest.TestCase):
     def test_parse2(self):
         self.assertEqual(
@@ -16,7 +20,7 @@ class TestEP13(unittest.TestCase):
 
     def test_pars4(self):
         self.assertEqual(
-            run_interpreter('run("C:/project/canoBasic/test/example.test")'),
+            run_interpreter(f'run("{example}")'),
             "[<function test>,4]"
         )
 
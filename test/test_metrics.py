@@ -0,0 +1,81 @@
+import json
+import os
+import tempfile
+import unittest
+import basic
+from metrics import Metrics, DictSink, JSONSink, OpenMetricsSink
+from profiler import Profiler
+from util import Counters, global_counters
+
+PROGRAM = ("fun mf(n) -> if n < 2 then n else mf(n - 1) + mf(n - 2)\nvar ml = []\n"
+           "for i = 0 to 4 then append(ml, mf(i))\nfun me(n) -> if n == 0 then 1 else me(n - 1)\nme(3)\n1 / 0")
+
+
+class TestMetrics(unittest.TestCase):
+    def test_engines_agree(self):
+        metrics = Metrics(nodes=True)
+        for engine in ("visitor", "closure", "python", "unboxed", "vm"):
+            result, error = basic.run(PROGRAM, "<metrics>", engine, metrics=metrics)
+            self.assertIn("Division by zero", repr(error))
+        snapshot = metrics.snapshot()
+        visitor = snapshot.pop("visitor")
+        self.assertEqual((visitor["function_calls"], visitor["builtin_calls"], visitor["errors"]), (14, 4, 1))
+        self.assertEqual(visitor["nodes"]["CallNode"], 18)
+        # the values made are what tells the engines apart
+        del visitor["values"]
+        for engine, counters in snapshot.items():
+            with self.subTest(engine=engine):
+                del counters["values"]
+                self.assertEqual(counters, visitor)
+
+    def test_always_counted(self):
+        before = global_counters.copy()
+        basic.run("fun mg() -> len([1 / 0])\nmg()", "<metrics>", "closure")
+        counted = [getattr(global_counters, name) - getattr(before, name) for name in Counters.__slots__]
+        self.assertEqual(counted[:2], [1, 0])  # the builtin is not called, its argument fails
+        self.assertGreater(counted[2], 0)
+        self.assertEqual(counted[3], 1)
+
+    def test_without_nodes(self):
+        # by default the engine is not the metered variant, only the global counters are recorded
+        metrics = Metrics()
+        result, error = basic.run("fun mg() -> len([1])\nmg()", "<metrics>", "vm", metrics=metrics)
+        self.assertEqual(repr(result), "[<function mg>,1]")
+        counters = metrics.snapshot()["vm"]
+        self.assertEqual((counters["function_calls"], counters["builtin_calls"], counters["nodes"]), (1, 1, {}))
+
+    def test_profiled_and_metered(self):
+        with self.assertRaises(ValueError):
+            basic.run("1", "<metrics>", metrics=Metrics(), profiler=Profiler())
+
+    def test_engine_raises(self):
+        # a run the engine raised out of still ends and is exported
+        sink = DictSink()
+        metrics = Metrics([sink])
+        with self.assertRaises(AttributeError):
+            basic.run("while [] then 1", "<metrics>", metrics=metrics)
+        self.assertEqual((metrics.running, len(sink.snapshots)), ([], 1))
+        basic.run("1", "<metrics>", metrics=metrics)
+        self.assertEqual((metrics.running, len(sink.snapshots)), ([], 2))
+
+    def test_sinks(self):
+        with tempfile.TemporaryDirectory() as directory:
+            json_path = os.path.join(directory, "metrics.jsonl")
+            text_path = os.path.join(directory, "metrics.txt")
+            sink = DictSink()
+            metrics = Metrics([sink, JSONSink(json_path), OpenMetricsSink(text_path)], nodes=True)
+            basic.run("len([1, 2])", "<metrics>", "vm", metrics=metrics)
+            basic.run("len([1, 2])", "<metrics>", "vm", metrics=metrics)
+
+            self.assertEqual(len(sink.snapshots), 2)
+            self.assertEqual(sink.snapshots[1]["vm"]["builtin_calls"], 2)
+            with open(json_path) as f:
+                self.assertEqual([json.loads(line) for line in f], sink.snapshots)
+            with open(text_path) as f:
+                text = f.read()
+        self.assertIn('basic_builtin_calls_total{engine="vm"} 2\n', text)
+        self.assertIn('basic_node_evaluations_total{engine="vm",node="CallNode"} 2\n', text)
+        self.assertTrue(text.endswith("# EOF\n"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+from interpreter import Context, Interpreter, SymbolTable
+from values import Number
+from test.share import global_symbol_table, parse, run_interpreter
+
+
+class TestOperations(unittest.TestCase):
+    def test_resolved(self):
+        self.assertEqual(parse("1 <= 2").element_nodes[0].operation, "get_comparison_lte")
+        self.assertEqual(parse("1 or 2").element_nodes[0].operation, "ored_by")
+        self.assertEqual(parse("not 1").element_nodes[0].operation, "notted")
+        self.assertEqual(parse("-1").element_nodes[0].operation, "negated")
+        self.assertIsNone(parse("+1").element_nodes[0].operation)
+
+    def test_evaluate(self):
+        self.assertEqual(run_interpreter("-(2 ^ 3) + +1"), "-7.0")
+        self.assertEqual(run_interpreter("not 0 and 3 > 2"), "1")
+
+    def test_unsupported_operation(self):
+        # used to fail with an AttributeError
+        self.assertEqual(
+            run_interpreter('"a" - 1'),
+            "Traceback: \n File <basic>, line 1, in <Program>\nRuntime Error: Illegal operation, File <basic>, line 1 column 0"
+        )
+        self.assertEqual(
+            run_interpreter('not "a"'),
+            "Traceback: \n File <basic>, line 1, in <Program>\nRuntime Error: Illegal operation, File <basic>, line 1 column 4"
+        )
+
+    def test_errors_located_at_nodes(self):
+        # values read from variables are shared, errors still point at the operation that failed
+        self.assertEqual(
+            run_interpreter('var ea = "a"\nvar eb = 1\nvar ec = eb\nea - ec'),
+            "Traceback: \n File <basic>, line 4, in <Program>\nRuntime Error: Illegal operation, File <basic>, line 4 column 0"
+        )
+        self.assertEqual(
+            run_interpreter("var ez = 0\nfun f(x) -> x / ez\nf(3)"),
+            "Traceback: \n File <basic>, line 3, in <Program>\nRuntime Error: Division by zero, File <basic>, line 2 column 16"
+        )
+        self.assertEqual(
+            run_interpreter("var en = 5\n1 + en(1)"),
+            "Traceback: \n File <basic>, line 2, in <Program>\nRuntime Error: Illegal operation, File <basic>, line 2 column 4"
+        )
+        self.assertEqual(
+            run_interpreter("-[1]"),
+            "Traceback: \n File <basic>, line 1, in <Program>\nRuntime Error: Illegal operation, File <basic>, line 1 column 1"
+        )
+
+    def test_reads_are_not_copied(self):
+        ast = parse("var shared = [1]\nshared")
+        context = Context("<Program>")
+        context.symbol_table = SymbolTable(global_symbol_table)
+        result = Interpreter().visit(ast, context)
+        self.assertIs(result.elements[1], result.elements[0])
+
+    def test_shared_constants(self):
+        # a literal makes its value once, loop variables share the Numbers of small ints
+        ast = parse('for i = 0 to 3 then ["s", 7, 1000, i]')
+        context = Context("<Program>")
+        context.symbol_table = SymbolTable(global_symbol_table)
+        first, second, third = Interpreter().visit(ast, context).elements[0].elements
+        for idx in range(3):
+            self.assertIs(first.elements[idx], second.elements[idx])
+        self.assertIs(third.elements[3], Number.cached(2))
+        self.assertIsNot(Number.cached(1000), Number.cached(1000))
+        self.assertFalse(hasattr(Number(1), "__dict__"))
+
+    def test_calls_share_the_interpreter(self):
+        # return, break and errors unwind as exceptions, so a call needs no interpreter of its own
+        init = Interpreter.__init__
+        created = []
+        Interpreter.__init__ = lambda interpreter: created.append(interpreter) or init(interpreter)
+        try:
+            self.assertEqual(
+                run_interpreter("fun sf(n)\n for i = 0 to 10 then\n  if i == n then return i\n end\nend\n[sf(3), sf(4)]"),
+                "[<function sf>,[3,4]]"
+            )
+        finally:
+            Interpreter.__init__ = init
+        self.assertEqual(len(created), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+from nodes import BinOpNode, UnaryOpNode
+from test.share import parse, run_parser
+
+def chain_length(node, node_type, child):
+    length = 0
+    while isinstance(node, node_type):
+        node = getattr(node, child)
+        length += 1
+    return length
+
+class TestOperatorExpr(unittest.TestCase):
+    def test_precedence(self):
+        self.assertEqual(run_parser("1 + 2 * 3 ^ 2 ^ 3"), "(1,PLS,(2,MUL,(3,POW,(2,POW,3))))")
+        self.assertEqual(run_parser("-2 ^ 2 * 3"), "((MIS, (2,POW,2)),MUL,3)")
+        self.assertEqual(run_parser("not 1 == 2 and 3"), "((not, (1,EE,2)),and,3)")
+        self.assertEqual(run_parser("1 - - 2 < 3 or x"), "(((1,MIS,(MIS, 2)),LT,3),or,(VC:x))")
+
+    def test_not_after_comparison(self):
+        self.assertEqual(
+            run_parser("1 == not 2"),
+            "Invalid Syntax: Invalid token, File <basic>, line 1 column 5"
+        )
+
+    def test_long_chains(self):
+        self.assertEqual(chain_length(parse(" + ".join(["1"] * 5000)).element_nodes[0], BinOpNode, "left_node"), 4999)
+        self.assertEqual(chain_length(parse("- " * 5000 + "1").element_nodes[0], UnaryOpNode, "node"), 5000)
+        self.assertEqual(chain_length(parse(" ^ ".join(["2"] * 5000)).element_nodes[0], BinOpNode, "right_node"), 4999)
+
+if __name__ == '__main__':
+    unittest.main()
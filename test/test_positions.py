@@ -0,0 +1,38 @@
+import unittest
+from error import Position, Source
+from lexer import Lexer
+from test.share import run_interpreter, run_parser
+
+class TestPositions(unittest.TestCase):
+    def test_line_col(self):
+        source = Source("<basic>", "ab\ncd\n\nef")
+        self.assertEqual(source.line_col(0), (0, 0))
+        self.assertEqual(source.line_col(4), (1, 1))
+        self.assertEqual(source.line_col(6), (2, 0))
+        self.assertEqual(source.line_col(7), (3, 0))
+        self.assertEqual(source.line_col(10), (3, 3))
+
+    def test_token_positions(self):
+        tokens, error = Lexer("1 +\n  foo", "<basic>").make_tokens()
+        foo = tokens[3]
+        self.assertEqual((foo.start, foo.end), (6, 9))
+        self.assertEqual((foo.pos_start.ln, foo.pos_start.col), (1, 2))
+        self.assertEqual((foo.pos_end.ln, foo.pos_end.col), (1, 5))
+        self.assertIs(foo.source, tokens[0].source)
+
+    def test_position_without_source(self):
+        pos = Position(0)
+        self.assertEqual((pos.ln, pos.col, pos.filename), (0, 0, None))
+
+    def test_error_lines(self):
+        self.assertEqual(
+            run_parser("\n\n3 +"),
+            "Invalid Syntax: Invalid token, File <basic>, line 3 column 3"
+        )
+        self.assertEqual(
+            run_interpreter("var x = 1\n\nx / 0"),
+            "Traceback: \n File <basic>, line 3, in <Program>\nRuntime Error: Division by zero, File <basic>, line 3 column 4"
+        )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import itertools
+import os
+import tempfile
+import unittest
+import basic
+from profiler import Profiler
+from util import run_script
+
+
+def profile(text):
+    profiler = Profiler(clock=itertools.count().__next__)  # every reading of the clock is one tick
+    result, error = basic.run(text, "prof.basic", profiler=profiler)
+    return profiler, repr(error) if error else repr(result)
+
+class TestProfiler(unittest.TestCase):
+    def test_functions(self):
+        profiler, result = profile("fun pf(n) -> if n < 2 then n else pf(n - 1) + pf(n - 2)\nfun pg()\n return 1 * pf(5)\nend\npg()")
+        self.assertEqual(result, "[<function pf>,<function pg>,5]")
+        functions = profiler.functions
+        self.assertEqual((functions["pf"].calls, functions["pg"].calls, functions["<program>"].calls), (15, 1, 1))
+        # a recursive function counts its outermost call only, the time of its callees is not its own
+        self.assertLess(functions["pf"].inclusive, functions["pg"].inclusive)
+        self.assertLess(functions["pg"].exclusive, functions["pg"].inclusive)
+        self.assertEqual(sum(stat.exclusive for stat in functions.values()), functions["<program>"].inclusive)
+
+    def test_lines(self):
+        profiler, result = profile("var pt = 0\nfor i = 0 to 3 then\n var pt = pt + i\nend\npt")
+        lines = profiler.lines
+        self.assertEqual(lines[("prof.basic", 3)].calls, 3)
+        self.assertEqual(lines[("prof.basic", 2)].calls, 1)
+        self.assertGreater(lines[("prof.basic", 2)].inclusive, lines[("prof.basic", 3)].inclusive)
+        self.assertIn("prof.basic:3", profiler.report())
+
+    def test_tail_calls(self):
+        # a tail call takes the place of its caller in the stacks
+        profiler, result = profile("fun pe(n) -> if n == 0 then 1 else po(n - 1)\nfun po(n) -> if n == 0 then 0 else pe(n - 1)\npe(5)")
+        self.assertEqual((profiler.functions["pe"].calls, profiler.functions["po"].calls), (3, 3))
+        paths = [line.rsplit(" ", 1)[0] for line in profiler.collapsed().splitlines()]
+        self.assertEqual(paths, ["<program>", "<program>;pe", "<program>;po"])
+
+    def test_error(self):
+        profiler, result = profile("fun pz() -> 1 / 0\npz()")
+        self.assertIn("Division by zero", result)
+        self.assertEqual((profiler.function_stack, profiler.line_stack), ([], []))
+
+    def test_run_script(self):
+        profiler = Profiler()
+        value, error = run_script("fun pr() -> 1\npr()", "<prof>", profiler=profiler)
+        self.assertEqual(profiler.functions["pr"].calls, 1)
+        with self.assertRaises(ValueError):
+            run_script("1", "<prof>", "vm", profiler=profiler)
+
+    def test_run_builtin(self):
+        # a script loaded with run() is profiled line by line, inside the line that ran it
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "lib.basic")
+            with open(path, "w") as f:
+                f.write("fun pl(n) -> n * 2\nvar pv = pl(4)")
+            profiler, result = profile(f'run("{path}")\npv')
+        self.assertEqual(result, "[[<function pl>,8],8]")
+        self.assertEqual((profiler.lines[(path, 1)].calls, profiler.lines[(path, 2)].calls), (2, 1))
+        self.assertEqual((profiler.functions["<program>"].calls, profiler.functions["pl"].calls), (2, 1))
+        self.assertGreater(profiler.lines[("prof.basic", 1)].inclusive, profiler.lines[(path, 2)].inclusive)
+        self.assertEqual(Profiler.running, [])
+
+if __name__ == '__main__':
+    unittest.main()
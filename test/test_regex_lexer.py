@@ -0,0 +1,65 @@
+import unittest
+from lexer import Lexer, RegexLexer
+from test.share import run_tokenize
+
+# sources covering every token family, comments, strings over several lines and the error paths
+SOURCES = [
+    "1 + 3",
+    " (3 + 4)*5 ^ 2.5 / 7.",
+    "var a_1 = [1, 2, 3] -> b",
+    "3 >= 2 and 5 <= 6 or 1 == 1 and 2 != 3 or not 4 < 5 > 6",
+    'print("hello \\\\ \\"world")',
+    '"a\nb" + "unterminated\nstring',
+    "# hello\n## asdf##\n1+2",
+    "fun add(a, b)\n    return a + b\nend; add(1, 2)",
+    "1.2.3",
+    "a%%",
+    "3 ! 6",
+    "x = 1\n!\n",
+]
+
+def token_keys(lexer):
+    tokens, error = lexer.make_tokens()
+    if error:
+        return repr(error), error.pos_start.idx, error.pos_end.idx
+    return [
+        (tok.type, tok.value, tok.pos_start.idx, tok.pos_start.ln, tok.pos_start.col,
+         tok.pos_end.idx, tok.pos_end.ln, tok.pos_end.col)
+        for tok in tokens
+    ]
+
+class TestRegexLexer(unittest.TestCase):
+    def test_same_tokens(self):
+        for text in SOURCES:
+            with self.subTest(text=text):
+                self.assertEqual(
+                    token_keys(RegexLexer(text, "<basic>")),
+                    token_keys(Lexer(text, "<basic>"))
+                )
+
+    def test_tokenize(self):
+        self.assertEqual(
+            run_tokenize("(3 + 4)*5", engine="regex"),
+            "[LP, 3, PLS, 4, RP, MUL, 5, EOF]"
+        )
+
+    def test_illegal_char(self):
+        self.assertEqual(
+            run_tokenize("a%%", engine="regex"),
+            "Illegal Character: '%', File <basic>, line 1 column 1"
+        )
+
+    def test_expected_char(self):
+        self.assertEqual(
+            run_tokenize("1\n3 ! 6", engine="regex"),
+            "Expected Character: : '=' (after '!'), File <basic>, line 2 column 2"
+        )
+
+    def test_comment_at_end(self):
+        self.assertEqual(
+            run_tokenize("1 # no newline", engine="regex"),
+            "[1, EOF]"
+        )
+
+if __name__ == '__main__':
+    unittest.main()
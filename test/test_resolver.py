@@ -0,0 +1,150 @@
+import unittest
+from interpreter import Interpreter
+from resolver import Scope, mark_discarded, resolve
+from test.share import parse, run_interpreter
+from util import Context, Frame, SymbolTable
+
+
+class TestResolver(unittest.TestCase):
+    def test_slots(self):
+        node = parse("fun f(a, b)\n var c = a + d\n for i = 0 to c then var b = i\n fun g() -> c\nend").element_nodes[0]
+        scope = resolve(node)
+        self.assertIs(node.scope, scope)
+        self.assertEqual(scope.slots, {"a": 0, "b": 1, "c": 2, "i": 3, "g": 4})
+        assign = node.body_node.element_nodes[0]
+        self.assertEqual(assign.slot, 2)
+        self.assertEqual(assign.value_node.left_node.slot, 0)
+        self.assertIsNone(assign.value_node.right_node.slot)  # d is not bound by f
+        inner = node.body_node.element_nodes[2]
+        self.assertEqual(inner.slot, 4)
+        self.assertIsNone(inner.scope)  # resolved when it is defined
+        self.assertIsNone(inner.body_node.slot)
+
+    def test_frame(self):
+        parent = SymbolTable()
+        parent.set("x", 1)
+        parent.set("y", 2)
+        frame = Frame(Scope(["x"]), parent)
+        self.assertEqual(frame.get("x"), 1)  # not bound yet, the caller's x
+        frame.set("x", 10)
+        frame.set("z", 3)
+        self.assertEqual((frame.get("x"), frame.get("y"), frame.get("z")), (10, 2, 3))
+        self.assertEqual(frame.slots, [10])
+        frame.remove("x")
+        self.assertEqual(frame.get("x"), 1)
+
+    def test_locals(self):
+        self.assertEqual(
+            run_interpreter("fun sum_to(n)\n var s = 0\n for i = 0 to n then var s = s + i\n return s\nend\nsum_to(10)"),
+            "[<function sum_to>,45]"
+        )
+
+    def test_dynamic_scope(self):
+        # names the body does not bind are still looked up in the caller, read before bound as well
+        self.assertEqual(
+            run_interpreter("fun show() -> shown\nfun caller()\n var a = shown\n var shown = 7\n return [a, show()]\nend\nvar shown = 1\ncaller()"),
+            "[<function show>,<function caller>,1,[1,7]]"
+        )
+
+    def test_recursion(self):
+        # every call gets its own frame
+        self.assertEqual(
+            run_interpreter("fun fact(n)\n var m = n\n if n <= 1 then return 1\n var r = fact(n - 1)\n return m * r\nend\nfact(6)"),
+            "[<function fact>,720]"
+        )
+
+    def test_outer(self):
+        # a recursive call looks names it does not bind up past the frames of the same function
+        scope = Scope(["n"])
+        parent = SymbolTable()
+        first = Frame(scope, parent)
+        second = Frame(scope, first)
+        self.assertIs(second.outer, parent)
+        second.set("g", 1)
+        self.assertIs(Frame(scope, second).outer, second)  # it bound a name of its own
+        self.assertIs(Frame(Scope([]), second).outer, second)
+        self.assertEqual(
+            run_interpreter("fun ack(m, n)\n if m == 0 then return n + 1\n if n == 0 then return ack(m - 1, 1)\n"
+                            " return ack(m - 1, ack(m, n - 1))\nend\nack(2, 60)"),
+            "[<function ack>,123]"
+        )
+
+    def test_free_contexts(self):
+        # a finished call hands its context and frame to the next call, unless a value kept them
+        Interpreter.free_contexts.clear()
+        self.assertEqual(run_interpreter("fun fc(n) -> if n < 2 then n else fc(n - 1) + fc(n - 2)\nfc(10)"), "[<function fc>,55]")
+        self.assertTrue(Interpreter.free_contexts)
+        for context in Interpreter.free_contexts:
+            self.assertIsNone(context.parent)
+            self.assertIsNone(context.symbol_table.slots)
+
+        context = Context("<Program>")
+        context.symbol_table = SymbolTable()
+        program = parse("fun mk(n)\n fun kept() -> n\n return kept\nend\nvar k = mk(1)\nfun other(a) -> a\nother(5)\nk")
+        kept = Interpreter().visit(program, context).elements[-1]
+        self.assertNotIn(kept.context, Interpreter.free_contexts)
+        self.assertEqual((kept.context.display_name, kept.context.parent), ("mk", context))
+        self.assertEqual(kept.context.symbol_table.slots[0].value, 1)
+
+    def test_call_site_arity(self):
+        # a call site checks the number of arguments once, for every function it calls
+        self.assertEqual(
+            run_interpreter("fun one(a) -> a\nfun two(a, b) -> a\nfor i = 0 to 2 then (if i == 0 then one else two)(i)"),
+            "Traceback: \n File <basic>, line 3, in <Program>\n"
+            "Runtime Error: 1 too few args passed to two, File <basic>, line 3 column 24"
+        )
+
+    def test_tail_calls(self):
+        node = parse("fun f(n)\n if n then return g(n)\n return [g(n)]\nend").element_nodes[0]
+        resolve(node)
+        condition, second = node.body_node.element_nodes
+        first, second = condition.cases[0][1].node_to_return, second.node_to_return
+        self.assertTrue(first.tail)
+        self.assertFalse(second.element_nodes[0].tail)
+        node = parse("fun f(n) -> if n then f(n - 1) else 1 + f(n)").element_nodes[0]
+        resolve(node)
+        (_, tail, _), = node.body_node.cases
+        self.assertTrue(tail.tail)
+        self.assertFalse(node.body_node.else_case[0].right_node.tail)
+
+    def test_tail_recursion(self):
+        # far deeper than the Python stack, callees still see the variables of the calls they replaced
+        self.assertEqual(
+            run_interpreter("fun down(n, acc)\n if n == 0 then return acc\n return down(n - 1, acc + 1)\nend\ndown(20000, 0)"),
+            "[<function down>,20000]"
+        )
+        self.assertEqual(
+            run_interpreter("fun ev(n) -> if n == 0 then 1 else od(n - 1)\nfun od(n) -> if n == 0 then 0 else ev(n - 1)\nev(20001)"),
+            "[<function ev>,<function od>,0]"
+        )
+        self.assertEqual(
+            run_interpreter("fun seen() -> [tx, ty]\nfun tf(tx)\n var ty = tx * 2\n return seen()\nend\nvar ty = 0\ntf(4)"),
+            "[<function seen>,<function tf>,0,[4,8]]"
+        )
+        self.assertEqual(
+            run_interpreter("fun tg(n)\n if n == 0 then return tt\n var tt = n\n return tg(n - 1)\nend\ntg(3)"),
+            "[<function tg>,1]"
+        )
+
+    def test_discarded(self):
+        node = parse("fun f(n)\n for i = 0 to n then [i]\n var l = for i = 0 to n then i\n return while 0 then 1\nend").element_nodes[0]
+        resolve(node)
+        loop, assign, ret = node.body_node.element_nodes
+        self.assertTrue(node.body_node.discarded)
+        self.assertTrue(loop.discarded and loop.body_node.discarded)
+        self.assertFalse(assign.value_node.discarded)
+        self.assertFalse(ret.node_to_return.discarded)
+
+        program = parse("for j = 0 to 2 then\n for i = 0 to 3 then i\nend\nfor i = 0 to 3 then i")
+        mark_discarded(program)
+        self.assertTrue(program.element_nodes[0].body_node.element_nodes[0].discarded)
+        self.assertFalse(program.element_nodes[1].discarded)  # the program's value is its statements
+
+    def test_discarded_values(self):
+        self.assertEqual(
+            run_interpreter("var dl = []\nfun df(n)\n for i = 0 to n then append(dl, i)\n return dl\nend\ndf(3)"),
+            "[[0,1,2],<function df>,[0,1,2]]"
+        )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import sys
+import tempfile
+import unittest
+from nodes import archieve_nodes, restore_nodes
+from test.share import parse, run_save, run_restore
+
+
+def save_and_restore(text, save_limit=None):
+    ast = parse(text)
+    fd, filepath = tempfile.mkstemp(suffix=".txt")
+    os.close(fd)
+    limit = sys.getrecursionlimit()
+    try:
+        # saving still recurses, only restoring has to cope with the default limit
+        if save_limit: sys.setrecursionlimit(save_limit)
+        archieve_nodes(ast, filepath)
+        sys.setrecursionlimit(limit)
+        return ast, restore_nodes(filepath)
+    finally:
+        sys.setrecursionlimit(limit)
+        os.remove(filepath)
+
+class TestRestore(unittest.TestCase):
+    def test_round_trip(self):
+        text = 'fun add(a, b) -> a + b\nvar x = [1, 2.5, "s"]\nfor i = 0 to 3 step 1 then\n var x = add(x, i)\nend\nx'
+        ast, restored = save_and_restore(text)
+        self.assertEqual(repr(restored), repr(ast))
+
+    def test_logic_operators(self):
+        ast, restored = save_and_restore("1 and 0 or not 1")
+        self.assertEqual(repr(restored), repr(ast))
+
+    def test_empty_return(self):
+        ast, restored = save_and_restore("fun ()\n return\nend")
+        self.assertEqual(repr(restored), repr(ast))
+
+    def test_deep_tree(self):
+        # deeper than the recursion limit
+        text = "+".join(["1"] * 3000)
+        ast, restored = save_and_restore(text, 20000)
+        node, depth = restored.element_nodes[0], 0
+        while hasattr(node, "left_node"):
+            node, depth = node.left_node, depth + 1
+        self.assertEqual(depth, 2999)
+
+    def test_run_restored(self):
+        fd, filepath = tempfile.mkstemp(suffix=".txt")
+        os.close(fd)
+        try:
+            run_save("fun f(n) -> if n <= 1 then 1 else n * f(n - 1)\nf(5)", filepath)
+            self.assertEqual(run_restore(filepath), "[<function f>,120]")
+        finally:
+            os.remove(filepath)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,10 @@
+import os
+import tempfile
 import unittest
 from test.share import run_tokenize, run_interpreter, run_restore, run_save
 
 # save nodes to file and load from file to restore the ast tree
-filepath = "C:\\project\\canoBasic\\test\\archievetest.txt"
+filepath = os.path.join(tempfile.gettempdir(), "archievetest.txt")
 class Test_save(unittest.TestCase):
     def test_parse1(self):
         self.assertEqual(
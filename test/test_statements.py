@@ -0,0 +1,30 @@
+import unittest
+from test.share import run_parser, run_interpreter
+
+class TestStatements(unittest.TestCase):
+    def test_trailing_statement_error(self):
+        # used to be parsed speculatively and silently dropped
+        self.assertEqual(
+            run_parser("1\n2 +"),
+            "Invalid Syntax: Invalid token, File <basic>, line 2 column 3"
+        )
+        self.assertEqual(
+            run_parser("return -"),
+            "Invalid Syntax: Invalid token, File <basic>, line 1 column 8"
+        )
+
+    def test_return_without_value(self):
+        self.assertEqual(run_parser("if 1 then return else 2"), "((if 1 then <return>) else (2, False)")
+        self.assertEqual(
+            run_interpreter("fun f()\n if 1 then\n return\n end\n return 5\nend\nf()"),
+            "[<function f>,0]"
+        )
+
+    def test_block_end(self):
+        self.assertEqual(
+            run_parser("while 1 then\n 1\n\n 2\n\nelse"),
+            "Invalid Syntax: Expected 'end', File <basic>, line 6 column 0"
+        )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+from basicParser import Parser, StreamParser
+from lexer import Lexer, RegexLexer
+
+SOURCES = [
+    "1 + 2 * 3",
+    "var a = [1, 2, 3] \n\nis_list(3)\n\n",
+    "fun add(a, b)\n    return a + b\nend\nadd(1, 2)",
+    "for i=0 to 10 then\n if i==4 then continue elif i==8 then break\n var a=a+i\n end",
+    "1 3 +",
+    "(1 + 2",
+    "if 1 then\n 2\n",
+    "1 + $",
+    "1 +\n2 !",
+]
+
+def batch_parse(text, lexer_class):
+    tokens, error = lexer_class(text, "<basic>").make_tokens()
+    if error: return repr(error)
+    ast, error = Parser(tokens).parse()
+    return repr(error) if error else repr(ast)
+
+def stream_parse(text, lexer_class):
+    ast, error = StreamParser(lexer_class(text, "<basic>")).parse()
+    return repr(error) if error else repr(ast)
+
+class CountingLexer(Lexer):
+    pulled = 0
+
+    def iter_tokens(self):
+        for tok in super().iter_tokens():
+            self.pulled += 1
+            yield tok
+
+class TestStreamParser(unittest.TestCase):
+    def test_same_result(self):
+        for lexer_class in (Lexer, RegexLexer):
+            for text in SOURCES:
+                with self.subTest(text=text, lexer=lexer_class.__name__):
+                    self.assertEqual(stream_parse(text, lexer_class), batch_parse(text, lexer_class))
+
+    def test_lex_error_first(self):
+        self.assertEqual(
+            stream_parse("1 +\n2 !", Lexer),
+            "Expected Character: : '=' (after '!'), File <basic>, line 2 column 2"
+        )
+
+    def test_tokens_pulled_lazily(self):
+        text = "var x = 0\n" + "var x = x + 1 * (2 - 3)\n" * 2000
+        lexer = CountingLexer(text, "<basic>")
+        parser = StreamParser(lexer)
+        self.assertEqual(lexer.pulled, 1)
+        ast, error = parser.parse()
+        self.assertIsNone(error)
+        self.assertEqual(len(ast.element_nodes), 2001)
+
+if __name__ == '__main__':
+    unittest.main()
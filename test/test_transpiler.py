@@ -0,0 +1,109 @@
+import unittest
+import transpiler
+from interpreter import Context, SymbolTable
+from test.share import global_symbol_table, parse
+
+
+def execute(ast, interpreter_class=transpiler.PythonInterpreter, symbol_table=None):
+    interpreter = interpreter_class()
+    context = Context("<Program>")
+    context.symbol_table = symbol_table or SymbolTable(global_symbol_table)
+    value = interpreter.visit(ast, context)
+    return repr(interpreter.error) if interpreter.error else repr(value)
+
+class TestTranspiler(unittest.TestCase):
+    def test_source(self):
+        source = transpiler.transpile(parse("fun f(n) -> n * 2\nfor i = 0 to 10 then f(i)")).source
+        self.assertIn("def _fun0_f(context):", source)
+        self.assertIn("in counter(", source)
+        compile(source, "<test>", "exec")
+
+    def test_counter(self):
+        self.assertIsInstance(transpiler.counter(0, 10, 2), range)
+        self.assertEqual(list(transpiler.counter(5, 0, -2)), [5, 3, 1])
+        self.assertEqual(list(transpiler.counter(0, 1.5, 0.5)), [0, 0.5, 1.0])
+
+    def test_code_cache(self):
+        text = "var a = 40\na + 2"
+        program = transpiler.transpile(parse(text, "cached.basic"))
+        self.assertIs(transpiler.transpile(parse(text, "cached.basic")), program)
+        self.assertIsNot(transpiler.transpile(parse(text, "other.basic")), program)
+        self.assertEqual(execute(parse(text, "cached.basic")), "[40,42]")
+
+    def test_code_cache_size(self):
+        # every distinct line of a REPL session is a script of its own; only the recent ones are kept
+        first = transpiler.transpile(parse("0", "line.basic"))
+        kept = transpiler.transpile(parse("1", "kept.basic"))
+        for i in range(1, transpiler.CODE_CACHE_SIZE + 1):
+            transpiler.transpile(parse(str(i), "line.basic"))
+            transpiler.transpile(parse("1", "kept.basic"))
+        self.assertEqual(len(transpiler.code_cache), transpiler.CODE_CACHE_SIZE)
+        self.assertIs(transpiler.transpile(parse("1", "kept.basic")), kept)
+        self.assertIsNot(transpiler.transpile(parse("0", "line.basic")), first)
+
+    def test_source_map(self):
+        # Python errors raised by generated code are not runtime errors, but say where in BASIC they came from
+        for text, note in [
+            ("var x = 2.0\nx ^ 5000", "in the BASIC code at File lib.basic, line 2 column 0"),
+            ("fun f(a)\n return a ^ 5000\nend\nf(2.0)", "in the BASIC code at File lib.basic, line 2 column 8"),
+        ]:
+            with self.subTest(program=text):
+                with self.assertRaises(OverflowError) as raised:
+                    execute(parse(text, "lib.basic"))
+                self.assertEqual(raised.exception.__notes__, [note])
+
+    def test_loop_bounds(self):
+        self.assertEqual(
+            execute(parse('fun f(a)\n return for i = 0 to 3 step a then i\nend\nf("b")', "lib.basic")),
+            "Traceback: \n File lib.basic, line 4, in <Program>\n"
+            "Runtime Error: For loop bounds must be numbers, File lib.basic, line 2 column 28"
+        )
+
+    def test_runtime_error(self):
+        self.assertEqual(
+            execute(parse("fun f() -> 1 - \"a\"\nf()")),
+            "Traceback: \n File <basic>, line 2, in <Program>\nRuntime Error: Illegal operation, File <basic>, line 1 column 11"
+        )
+
+    def test_deep_nesting(self):
+        # deeper than Python's compiler accepts, the tree walker takes over
+        text = "if 1 then 1 " + "elif 0 then 0 " * 150 + "else 2"
+        self.assertEqual(execute(parse(text)), "[1]")
+
+class TestUnboxed(unittest.TestCase):
+    def test_source(self):
+        source = transpiler.transpile(parse("var s = 0\nfor i = 0 to 10 then var s = s + i * 2"),
+                                      transpiler.UnboxedTranspiler).source
+        self.assertIn("for v2 in counter(0, 10, 1):", source)
+        self.assertIn("_3 = v2 * 2", source)
+        self.assertNotIn("st.set(", source)
+
+    def test_discarded_loop(self):
+        for transpiler_class in (transpiler.Transpiler, transpiler.UnboxedTranspiler):
+            source = transpiler.transpile(parse("fun f(n)\n for i = 0 to n then [i, i * 2]\n return 0\nend"),
+                                          transpiler_class).source
+            function = source[:source.index("def _program")]
+            with self.subTest(transpiler=transpiler_class.__name__):
+                self.assertNotIn(".append(", function)
+                self.assertNotIn("List(", function)
+
+    def test_globals_stored(self):
+        # variables reach the symbol table at the end of the program, even a failing one
+        symbol_table = SymbolTable(global_symbol_table)
+        execute(parse("var a = 1\nvar b = [a]\nvar a = a + 1\n1 / 0"), transpiler.UnboxedInterpreter, symbol_table)
+        self.assertEqual(repr(symbol_table.get("a")), "2")
+        self.assertEqual(repr(symbol_table.get("b")), "[1]")
+
+    def test_caller_variables(self):
+        # the callee reads the caller's variables, so they are stored before every call
+        text = "fun show() -> n * 10\nfun f()\n var n = 1\n var n = n + 1\n return show()\nend\nvar n = 5\n[show(), f()]"
+        self.assertEqual(execute(parse(text), transpiler.UnboxedInterpreter), "[<function show>,<function f>,5,[50,20]]")
+
+    def test_operation_error(self):
+        self.assertEqual(
+            execute(parse('var x = 3\nvar s = "a"\nx - s', "lib.basic"), transpiler.UnboxedInterpreter),
+            "Traceback: \n File lib.basic, line 3, in <Program>\nRuntime Error: Illegal operation, File lib.basic, line 3 column 0"
+        )
+
+if __name__ == '__main__':
+    unittest.main()
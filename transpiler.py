@@ -0,0 +1,754 @@
+"""
+Lowers a tree to Python source, compiles it with compile() and runs it as ordinary Python functions.
+Every BASIC function becomes a module level def taking its context, a for loop becomes a Python for
+over a range (or a counting generator for float bounds), while loops become while loops and break,
+continue and return become the Python statements, and a call in tail position of a function hands
+a TailCall back to the call loop of the function (see EngineFunction). Values are still
+Number/String/List objects built exactly like Interpreter builds them, so the engines can call each
+other's functions; literals are made once per run and a variable read is the stored object itself.
+
+The "unboxed" engine compiles the same way but keeps numbers as plain ints and floats, see
+UnboxedTranspiler.
+
+Compiled programs are cached per hash of the script text. Every generated line is recorded in a
+source map against the span of the node it came from. Runtime errors are raised as Failures like in
+the other engines; any other exception out of generated code is a bug and propagates as it does
+from the visitor, with the BASIC line and column it came from added to its notes.
+"""
+
+import hashlib
+import math
+import traceback
+from collections import OrderedDict
+
+from bytecode import CodeSpan
+from error import Error, RTError, OperationError, Failure
+from nodes import NumberNode, StringNode, VarAccessNode
+from resolver import resolve, mark_discarded
+from util import DispatchTable, counter, global_classes, global_engines
+from values import Number, String, List, EngineFunction, TailCall, loop_bound_error
+
+# compiled programs by hash of the script, the least recently used are dropped past CODE_CACHE_SIZE;
+# see transpile()
+code_cache = OrderedDict()
+CODE_CACHE_SIZE = 128
+
+# a function body left with break or continue outside of any loop
+ESCAPED = object()
+
+
+def undefined(var_name, span, context):
+    return RTError(span.pos_start, span.pos_end, f"'{var_name}' is not defined", context)
+
+# what UnboxedTranspiler keeps raw, and the value of a variable local it has not read yet
+NUMBERS = frozenset((int, float))
+UNSET = object()
+
+def boxed(value):
+    value_type = type(value)
+    if value_type is int:
+        return Number.small_ints[value + 5] if -5 <= value <= 256 else Number(value)
+    return Number(value) if value_type is float else value
+
+def load(st, var_name, span, context):
+    value = st.get(var_name)
+    if value is None: raise Failure(undefined(var_name, span, context))
+    return value.value if type(value) is Number else value
+
+def store(st, var_names, values):
+    for var_name, value in zip(var_names, values):
+        if value is not UNSET:
+            st.set(var_name, boxed(value))
+
+def located(error, span, right_span, context):
+    """The error of an operator, pointed at its spans when it is an OperationError"""
+    return error.locate(span, right_span, context) if isinstance(error, OperationError) else error
+
+def operate(left, right, operation, span, right_span, context):
+    """An operator on values that are not both numbers, done by the Value methods"""
+    result, error = getattr(boxed(left), operation)(boxed(right))
+    if error: raise Failure(located(error, span, right_span, context))
+    return result.value if type(result) is Number else result
+
+def operate_unary(operand, operation, span, context):
+    result, error = getattr(boxed(operand), operation)()
+    if error: raise Failure(located(error, span, span, context))
+    return result.value if type(result) is Number else result
+
+def number_literal(value):
+    text = repr(value)
+    return text if text not in ("inf", "nan") else f"float({text!r})"
+
+
+class FunctionWriter:
+    """The lines of one generated def, with the span of the node each line came from"""
+    def __init__(self, def_name, in_function):
+        self.def_name = def_name
+        self.in_function = in_function
+        self.lines = [f"def {def_name}(context):", "    st = context.symbol_table"]
+        self.line_spans = [None, None]
+        self.indent = 1
+        self.temps = 0
+        # per enclosing loop: None when break and continue are the Python statements, or
+        # [flag, used] for a while condition, where they have to be relayed to the loop around it
+        self.loops = []
+
+    def temp(self):
+        self.temps += 1
+        return f"_{self.temps}"
+
+
+class Transpiler:
+    """Generates the Python source of a program; compile_X(node) emits lines and returns an expression"""
+    writer_class = FunctionWriter
+
+    def __init__(self):
+        self.spans = []
+        self.span_idx = {}
+        self.functions = []
+        # module level assignments run before the program, see compile_NumberNode
+        self.constants = {}
+        self.writer = None
+
+    @classmethod
+    def register_node(cls, node_class, compile_method=None):
+        """Hook for new node types: compile_method(transpiler, node) returns an expression for its value"""
+        return cls.compilers.register(node_class, compile_method)
+
+    # how the value of a statement that has none (a loop collecting nothing, an if without a match) is written
+    NULL = "Number.null"
+
+    def transpile(self, node):
+        """Returns (source, line_spans, spans) for a program"""
+        self.writer = self.writer_class("_program", False)
+        mark_discarded(node)
+        value = self.compile(node)
+        self.emit(f"return {self.box(value)}", node)
+        self.finish(self.writer)
+
+        lines = [f"{name} = {expr}" for expr, name in self.constants.items()]
+        line_spans = [None] * (len(lines) + 1)  # line numbers start at 1
+        for writer in self.functions:
+            lines += writer.lines
+            line_spans += writer.line_spans
+        return "\n".join(lines) + "\n", line_spans, self.spans
+
+    def compile(self, node):
+        return self.compilers[type(node)](self, node)
+
+    def span_index(self, node):
+        key = (node.start, node.end)
+        idx = self.span_idx.get(key)
+        if idx is None:
+            idx = self.span_idx[key] = len(self.spans)
+            self.spans.append(key)
+        return idx
+
+    def span(self, node):
+        """The global the generated code reads the span of node from"""
+        return f"S{self.span_index(node)}"
+
+    def emit(self, line, node):
+        writer = self.writer
+        writer.lines.append("    " * writer.indent + line)
+        writer.line_spans.append(self.span_index(node))
+
+    def finish(self, writer):
+        self.functions.append(writer)
+
+    def box(self, expr):
+        """The expression as a Value, where one is observable (stored, passed or returned)"""
+        return expr
+
+    def truth(self, expr):
+        return f"{expr}.is_true()"
+
+    def temp(self, expr, node):
+        """Evaluate expr now; returns the local that holds it"""
+        if expr[0] in "_K" and expr[1:].isdigit():
+            # a local already, or a literal made before the program started
+            return expr
+        name = self.writer.temp()
+        self.emit(f"{name} = {expr}", node)
+        return name
+
+    def compile_NumberNode(self, node):
+        # values are not pointed at their node, so a literal is made once per run
+        expr = f"Number.cached({number_literal(node.tok.value)})"
+        return self.constants.setdefault(expr, f"K{len(self.constants)}")
+
+    def compile_StringNode(self, node):
+        expr = f"String({node.tok.value!r})"
+        return self.constants.setdefault(expr, f"K{len(self.constants)}")
+
+    def compile_BinOpNode(self, node):
+        left = self.temp(self.compile(node.left_node), node.left_node)
+        right = self.compile(node.right_node)
+        result = self.writer.temp()
+        self.emit(f"{result}, error = {left}.{node.operation}({right})", node)
+        self.emit(f"if error: raise Failure(located(error, {self.span(node)}, {self.span(node.right_node)}, context))", node)
+        return result
+
+    def compile_UnaryOpNode(self, node):
+        operand = self.compile(node.node)
+        if node.operation is None:
+            return operand
+        operand_span = self.span(node.node)
+        result = self.writer.temp()
+        self.emit(f"{result}, error = {operand}.{node.operation}()", node)
+        self.emit(f"if error: raise Failure(located(error, {operand_span}, {operand_span}, context))", node)
+        return result
+
+    def compile_VarAccessNode(self, node):
+        var_name = node.var_name_tok.value
+        result = self.writer.temp()
+        self.emit(f"{result} = st.get({var_name!r})", node)
+        self.emit(f"if {result} is None: raise Failure(undefined({var_name!r}, {self.span(node)}, context))", node)
+        return result
+
+    def compile_VarAssignNode(self, node):
+        value = self.temp(self.compile(node.value_node), node)
+        self.emit(f"st.set({node.var_name_tok.value!r}, {value})", node)
+        return value
+
+    def compile_IfNode(self, node):
+        writer = self.writer
+        result = writer.temp()
+        indent = writer.indent
+        for condition, expr, should_return_null in node.cases:
+            self.emit(f"if {self.truth(self.compile(condition))}:", condition)
+            writer.indent += 1
+            self.compile_branch(result, expr, should_return_null)
+            writer.indent -= 1
+            self.emit("else:", node)
+            writer.indent += 1
+
+        if node.else_case is not None:
+            self.compile_branch(result, *node.else_case)
+        else:
+            self.emit(f"{result} = {self.NULL}", node)
+        writer.indent = indent
+        return result
+
+    def compile_branch(self, result, expr, should_return_null):
+        value = self.compile(expr)
+        self.emit(f"{result} = {self.NULL if should_return_null else value}", expr)
+
+    def compile_WhileNode(self, node):
+        writer = self.writer
+        elements = self.compile_loop_elements(node)
+        relay = [writer.temp(), False]
+        self.emit(f"{relay[0]} = 0", node)
+        self.emit("while True:", node)
+        writer.indent += 1
+        writer.loops.append(relay)
+        condition = self.compile(node.condition)
+        writer.loops.pop()
+        self.emit(f"if not {self.truth(condition)}: break", node.condition)
+        self.compile_loop_body(node, elements)
+        writer.indent -= 1
+
+        if relay[1]:
+            # break or continue in the condition belongs to the loop around this one
+            self.emit(f"if {relay[0]} == 1:", node)
+            writer.indent += 1
+            self.compile_jump_out(node, False)
+            writer.indent -= 1
+            self.emit(f"elif {relay[0]} == 2:", node)
+            writer.indent += 1
+            self.compile_jump_out(node, True)
+            writer.indent -= 1
+        return self.compile_loop_value(node, elements)
+
+    def compile_ForNode(self, node):
+        writer = self.writer
+        elements = self.compile_loop_elements(node)
+        start = self.temp(self.compile(node.start_node), node.start_node)
+        end = self.temp(self.compile(node.end_node), node.end_node)
+        step = self.temp(self.compile(node.step_node), node.step_node) if node.step_node is not None else None
+        self.check_bounds(node, [start, end, step], "isinstance({0}, Number)")
+        i = writer.temp()
+        self.emit(f"for {i} in counter({start}.value, {end}.value, {step + '.value' if step else '1'}):", node)
+        writer.indent += 1
+        self.emit(f"st.set({node.var_name_tok.value!r}, Number.cached({i}))", node)
+        self.compile_loop_body(node, elements)
+        writer.indent -= 1
+        return self.compile_loop_value(node, elements)
+
+    def check_bounds(self, node, bounds, test):
+        """Emit the checks that the values of a for loop's start, end and step are numbers, once all are evaluated"""
+        for bound, bound_node in zip(bounds, (node.start_node, node.end_node, node.step_node)):
+            if bound is not None and bound_node is not None and type(bound_node) is not NumberNode:
+                self.emit(f"if not {test.format(bound)}: raise Failure(loop_bound_error({self.span(bound_node)}, context))",
+                          node)
+
+    def compile_loop_elements(self, node):
+        # a loop whose value is not used keeps none of the values of its body
+        if node.discarded:
+            return None
+        elements = self.writer.temp()
+        self.emit(f"{elements} = []", node)
+        return elements
+
+    def compile_loop_body(self, node, elements):
+        writer = self.writer
+        writer.loops.append(None)
+        value = self.compile(node.body_node)
+        writer.loops.pop()
+        if elements is not None:
+            self.emit(f"{elements}.append({self.box(value)})", node.body_node)
+        else:
+            self.emit("pass", node.body_node)
+
+    def compile_loop_value(self, node, elements):
+        if elements is None:
+            return self.NULL
+        return self.temp(f"List({elements})", node)
+
+    def compile_FunDefNode(self, node):
+        func_name = node.var_name_tok.value if node.var_name_tok else None
+        arg_names = [arg.value for arg in node.arg_name_toks]
+        def_name = f"_fun{len(self.functions)}_{func_name or 'anonymous'}"
+        if node.scope is None:
+            resolve(node)  # marks the calls in tail position
+
+        writer = self.writer
+        self.writer = self.writer_class(def_name, True)
+        value = self.compile(node.body_node)
+        self.emit(f"return {self.box(value) if node.should_auto_return else 'Number.null'}", node.body_node)
+        self.finish(self.writer)
+        self.writer = writer
+
+        result = self.temp(f"PythonFunction({func_name!r}, {arg_names!r}, {node.should_auto_return}, {def_name})"
+                           f".set_context(context).set_pos({self.span(node)})", node)
+        if func_name is not None:
+            self.emit(f"st.set({func_name!r}, {result})", node)
+        return result
+
+    def compile_CallNode(self, node):
+        function = self.temp(self.compile(node.node_to_call), node)
+        args = [self.compile(arg_node) for arg_node in node.arg_nodes]
+        result = self.writer.temp()
+        self.compile_call(node, result, function, f"[{', '.join(args)}]")
+        return result
+
+    def compile_call(self, node, result, function, args):
+        span = self.span(node)
+        if node.tail:
+            self.emit(f"if type({function}) is PythonFunction: {result} = tail_call({function}, {args}, {span}, context)", node)
+            self.emit(f"else: {result} = {function}.execute({args}, context, {span})", node)
+        else:
+            # execute hands back the error instead of a value when the call fails
+            self.emit(f"{result} = {function}.execute({args}, context, {span})", node)
+        self.emit(f"if isinstance({result}, Error): raise Failure({result})", node)
+
+    def compile_ListNode(self, node):
+        if node.discarded:
+            for element in node.element_nodes:
+                self.compile(element)
+            return self.NULL
+        # literals are only built here, so elements are still evaluated in order
+        elements = [self.box(self.compile(element)) for element in node.element_nodes]
+        return self.temp(f"List([{', '.join(elements)}])", node)
+
+    def compile_ReturnNode(self, node):
+        value = self.compile(node.node_to_return) if node.node_to_return else self.NULL
+        # like the visitor, a return outside of a function ends the program
+        self.emit(f"return {self.box(value)}" if self.writer.in_function else "return None", node)
+        return "None"
+
+    def compile_ContinueNode(self, node):
+        self.compile_jump_out(node, True)
+        return "None"
+
+    def compile_BreakNode(self, node):
+        self.compile_jump_out(node, False)
+        return "None"
+
+    def compile_jump_out(self, node, is_continue):
+        loops = self.writer.loops
+        if not loops:
+            self.emit("return ESCAPED" if self.writer.in_function else "return None", node)
+        elif loops[-1] is None:
+            self.emit("continue" if is_continue else "break", node)
+        else:
+            relay = loops[-1]
+            relay[1] = True
+            self.emit(f"{relay[0]} = {2 if is_continue else 1}", node)
+            self.emit("break", node)
+
+Transpiler.compilers = DispatchTable(Transpiler, "compile_")
+
+
+class PythonProgram:
+    """A transpiled program: its source, the compiled code and the source map back to the script"""
+    def __init__(self, source, code, line_spans, span_offsets):
+        self.source = source
+        self.code = code
+        self.line_spans = line_spans
+        self.span_offsets = span_offsets
+
+    def run(self, context, source=None, runtime=None):
+        namespace = dict(runtime or RUNTIME, __source_map__=self)
+        for idx, (start, end) in enumerate(self.span_offsets):
+            namespace[f"S{idx}"] = CodeSpan(start, end, source)
+        exec(self.code, namespace)
+        return namespace["_program"](context)
+
+def transpile(node, transpiler=Transpiler):
+    """Returns the PythonProgram of a tree, reusing the one compiled before for the same script"""
+    source = node.source
+    key = None
+    if source is not None and source.text is not None:
+        key = hashlib.sha256(f"{transpiler.__name__}\0{source.filename}\0{node.start}\0{node.end}\0{source.text}"
+                             .encode("utf-8", "surrogatepass")).hexdigest()
+        program = code_cache.get(key)
+        if program is not None:
+            code_cache.move_to_end(key)
+            return program
+
+    python_source, line_spans, span_offsets = transpiler().transpile(node)
+    filename = f"<transpiled {source.filename if source is not None else None}>"
+    program = PythonProgram(python_source, compile(python_source, filename, "exec"), line_spans, span_offsets)
+    if key is not None:
+        code_cache[key] = program
+        if len(code_cache) > CODE_CACHE_SIZE:
+            code_cache.popitem(last=False)
+    return program
+
+def note_source(exc):
+    """
+    Add the BASIC line and column of the generated code that raised exc to its notes. Such an
+    exception is a bug like in any other engine, so it is not turned into a runtime error.
+    """
+    found = None
+    for frame, lineno in traceback.walk_tb(exc.__traceback__):
+        program = frame.f_globals.get("__source_map__")
+        if program is not None and program.line_spans[lineno] is not None:
+            found = frame, program.line_spans[lineno]
+    if found is None or not hasattr(exc, "add_note"):
+        return
+    frame, span_idx = found
+    pos = frame.f_globals[f"S{span_idx}"].pos_start
+    note = f"in the BASIC code at File {pos.filename}, line {pos.ln + 1} column {pos.col}"
+    # every function the exception leaves finds the same line
+    if note not in getattr(exc, "__notes__", ()):
+        exc.add_note(note)
+
+
+class PythonFunction(EngineFunction):
+    """A Function whose body is a generated Python def"""
+    __slots__ = ("body",)
+
+    def __init__(self, name, arg_names, should_auto_return, body):
+        super().__init__(name, arg_names, None, should_auto_return)
+        self.body = body
+
+    def run_body(self, exec_ctx, context, span):
+        try:
+            value = self.body(exec_ctx)
+        except Failure as failure:
+            return failure.error
+        except Exception as exc:
+            note_source(exc)
+            raise
+        return self.escaped(context, span) if value is ESCAPED else value
+
+    def copy(self):
+        copy = PythonFunction(self.name, self.arg_names, self.should_auto_return, self.body)
+        copy.set_context(self.context)
+        copy.set_pos(self.span)
+        return copy
+
+
+def tail_call(function, args, span, context):
+    """The TailCall a call in tail position of a function hands back to its call loop"""
+    succ, error = function.check_args(function.arg_names, args, context, span)
+    if succ is False: raise Failure(error)
+    return TailCall(function, args, span, context)
+
+
+# the globals of generated code, besides the spans S0, S1, ...
+RUNTIME = {
+    "Number": Number, "String": String, "List": List, "Error": Error, "Failure": Failure,
+    "PythonFunction": PythonFunction, "tail_call": tail_call, "ESCAPED": ESCAPED, "counter": counter, "undefined": undefined,
+    "NUMBERS": NUMBERS, "UNSET": UNSET, "boxed": boxed, "load": load, "store": store,
+    "operate": operate, "operate_unary": operate_unary, "located": located, "fpow": math.pow,
+    "loop_bound_error": loop_bound_error,
+}
+
+
+class PythonInterpreter:
+    """Transpiles a tree to Python and runs it; has the visit()/error interface of Interpreter"""
+    transpiler = Transpiler
+    runtime = None  # the globals of the generated code, RUNTIME unless set
+
+    def __init__(self):
+        self.error = None
+
+    def visit(self, node, context):
+        try:
+            program = transpile(node, self.transpiler)
+        except (SyntaxError, RecursionError):
+            # nested deeper than Python's compiler accepts, the tree walker runs it instead
+            interpreter = global_classes["Interpreter"]()
+            value = interpreter.visit(node, context)
+            self.error = interpreter.error
+            return value
+        try:
+            return program.run(context, node.source, self.runtime)
+        except Failure as failure:
+            self.error = failure.error
+        except Exception as exc:
+            note_source(exc)
+            raise
+        return None
+
+
+global_engines["python"] = PythonInterpreter
+
+
+class UnboxedWriter(FunctionWriter):
+    def __init__(self, def_name, in_function):
+        super().__init__(def_name, in_function)
+        # variable name -> the Python local holding its (raw) value, UNSET until read or assigned
+        self.mirrors = {}
+        # the names assigned in this def, written back to the symbol table before anything can see it
+        self.stored = {}
+        # expressions known to be an int or float
+        self.numeric = set()
+
+
+class UnboxedTranspiler(Transpiler):
+    """
+    Keeps numbers as Python ints and floats: arithmetic and comparisons on them are the Python
+    operators, with the Value methods as the fallback for other types (a TypeError) or a zero divisor.
+    Variables live in Python locals; the symbol table only gets boxed Numbers when something could
+    look at it, i.e. before a call and when the program ends. Numbers are also boxed when they go
+    into a list or are passed to or returned from a function.
+
+    As every value a program sees is still a Value, these functions mix with the other engines'.
+    """
+    writer_class = UnboxedWriter
+    NULL = "0"
+
+    ARITHMETIC = {"added_to": "+", "subbed_by": "-", "multed_by": "*", "dived_by": "/"}
+    COMPARISONS = {"get_comparison_lt": "<", "get_comparison_gt": ">",
+                   "get_comparison_lte": "<=", "get_comparison_gte": ">="}
+    # defined for every pair of Python objects, so the types are checked instead
+    CHECKED = {"get_comparison_eq": "1 if {0} == {1} else 0", "get_comparison_ne": "1 if {0} != {1} else 0",
+               "anded_by": "int({0} and {1})", "ored_by": "int({0} or {1})"}
+
+    def is_number(self, expr):
+        return expr in self.writer.numeric or expr == self.NULL
+
+    def box(self, expr):
+        return expr if expr == "None" else f"boxed({expr})"
+
+    def truth(self, expr):
+        if self.is_number(expr):
+            return expr
+        if not expr.isidentifier():
+            return f"{expr}.is_true()"
+        return f"({expr} if type({expr}) in NUMBERS else {expr}.is_true())"
+
+    def mirror(self, var_name):
+        mirrors = self.writer.mirrors
+        mirror = mirrors.get(var_name)
+        if mirror is None:
+            mirror = mirrors[var_name] = f"v{len(mirrors) + 1}"
+        return mirror
+
+    def hold(self, expr, node):
+        """A variable local read now, for when the rest of the expression could assign it"""
+        return self.temp(expr, node) if expr in self.writer.mirrors.values() else expr
+
+    def placeholder(self, kind, node):
+        # filled in by finish(), once every variable of the def is known
+        writer = self.writer
+        writer.lines.append((kind, writer.indent))
+        writer.line_spans.append(self.span_index(node))
+
+    def finish(self, writer):
+        mirrors = writer.mirrors
+        names = list(writer.stored)
+        statements = {"store": None, "invalidate": None}
+        if names:
+            statements["store"] = f"store(st, {tuple(names)!r}, ({', '.join(mirrors[name] for name in names)},))"
+        if mirrors and not writer.in_function:
+            # a call at the top level can run() a script that assigns the globals
+            statements["invalidate"] = f"{' = '.join(mirrors.values())} = UNSET"
+
+        lines, line_spans = [], []
+        for line, span in zip(writer.lines, writer.line_spans):
+            if type(line) is tuple:
+                kind, indent = line
+                if statements[kind] is None:
+                    continue
+                line = "    " * indent + statements[kind]
+            lines.append(line)
+            line_spans.append(span)
+
+        header, header_spans = lines[:2], line_spans[:2]
+        body, body_spans = lines[2:], line_spans[2:]
+        if mirrors:
+            header.append(f"    {' = '.join(mirrors.values())} = UNSET")
+            header_spans.append(None)
+        if names and not writer.in_function:
+            # the variables of the program stay in the global table, even when it fails
+            body = ["    try:"] + ["    " + line for line in body] + ["    finally:", "        " + statements["store"]]
+            body_spans = [None] + body_spans + [None, None]
+        writer.lines = header + body
+        writer.line_spans = header_spans + body_spans
+        super().finish(writer)
+
+    def compile_NumberNode(self, node):
+        literal = number_literal(node.tok.value)
+        self.writer.numeric.add(literal)
+        return literal
+
+    def compile_BinOpNode(self, node):
+        writer = self.writer
+        left = self.compile(node.left_node)
+        if type(node.right_node) not in (NumberNode, StringNode, VarAccessNode):
+            left = self.hold(left, node.left_node)
+        right = self.compile(node.right_node)
+        operation = node.operation
+        numeric = self.is_number(left) and self.is_number(right)
+        result = writer.temp()
+        fallback = f"{result} = operate({left}, {right}, {operation!r}, {self.span(node)}, {self.span(node.right_node)}, context)"
+
+        if operation in self.CHECKED:
+            expr = self.CHECKED[operation].format(left, right)
+            if numeric:
+                self.emit(f"{result} = {expr}", node)
+            else:
+                self.emit(f"if type({left}) in NUMBERS and type({right}) in NUMBERS: {result} = {expr}", node)
+                self.emit(f"else: {fallback}", node)
+            writer.numeric.add(result)
+            return result
+
+        if operation in self.ARITHMETIC:
+            expr = f"{left} {self.ARITHMETIC[operation]} {right}"
+        elif operation in self.COMPARISONS:
+            expr = f"1 if {left} {self.COMPARISONS[operation]} {right} else 0"
+        elif operation == "powed_by":
+            expr = f"fpow({left}, {right})"
+        else:
+            self.emit(fallback, node)
+            return result
+
+        if numeric and operation != "dived_by":
+            self.emit(f"{result} = {expr}", node)
+        else:
+            self.emit("try:", node)
+            self.emit(f"    {result} = {expr}", node)
+            # a zero divisor is reported by Number.dived_by
+            if operation == "dived_by":
+                self.emit("except ZeroDivisionError:" if numeric else "except (TypeError, ZeroDivisionError):", node)
+            else:
+                self.emit("except TypeError:", node)
+            self.emit(f"    {fallback}", node)
+        # only Numbers compare or raise to a power
+        if numeric or operation in self.COMPARISONS or operation == "powed_by":
+            writer.numeric.add(result)
+        return result
+
+    def compile_UnaryOpNode(self, node):
+        writer = self.writer
+        operand = self.compile(node.node)
+        if node.operation is None:
+            return operand
+        numeric = self.is_number(operand)
+        result = writer.temp()
+        fallback = f"{result} = operate_unary({operand}, {node.operation!r}, {self.span(node.node)}, context)"
+        if node.operation == "notted":
+            expr = f"1 if {operand} == 0 else 0"
+            if numeric:
+                self.emit(f"{result} = {expr}", node)
+            else:
+                self.emit(f"if type({operand}) in NUMBERS: {result} = {expr}", node)
+                self.emit(f"else: {fallback}", node)
+            writer.numeric.add(result)
+        elif node.operation == "negated" and numeric:
+            self.emit(f"{result} = -{operand}", node)
+            writer.numeric.add(result)
+        elif node.operation == "negated":
+            self.emit("try:", node)
+            self.emit(f"    {result} = -{operand}", node)
+            self.emit("except TypeError:", node)
+            self.emit(f"    {fallback}", node)
+        else:
+            self.emit(fallback, node)
+        return result
+
+    def compile_VarAccessNode(self, node):
+        var_name = node.var_name_tok.value
+        mirror = self.mirror(var_name)
+        self.emit(f"if {mirror} is UNSET: {mirror} = load(st, {var_name!r}, {self.span(node)}, context)", node)
+        return mirror
+
+    def compile_VarAssignNode(self, node):
+        var_name = node.var_name_tok.value
+        value = self.compile(node.value_node)
+        mirror = self.mirror(var_name)
+        self.writer.stored[var_name] = True
+        self.emit(f"{mirror} = {value}", node)
+        return value if self.is_number(value) or value.startswith("_") else mirror
+
+    def compile_ForNode(self, node):
+        writer = self.writer
+        elements = self.compile_loop_elements(node)
+        start = self.hold(self.compile(node.start_node), node.start_node)
+        end = self.compile(node.end_node)
+        step = self.compile(node.step_node) if node.step_node is not None else "1"
+        if node.step_node is not None:
+            end = self.hold(end, node.end_node)
+        self.check_bounds(node, [None if self.is_number(bound) else bound for bound in (start, end, step)],
+                          "type({0}) in NUMBERS")
+        mirror = self.mirror(node.var_name_tok.value)
+        writer.stored[node.var_name_tok.value] = True
+        self.emit(f"for {mirror} in counter({start}, {end}, {step}):", node)
+        writer.indent += 1
+        self.compile_loop_body(node, elements)
+        writer.indent -= 1
+        return self.compile_loop_value(node, elements)
+
+    def compile_FunDefNode(self, node):
+        result = super().compile_FunDefNode(node)
+        if node.var_name_tok is not None:
+            self.emit(f"{self.mirror(node.var_name_tok.value)} = {result}", node)
+        return result
+
+    def compile_CallNode(self, node):
+        writer = self.writer
+        function = self.compile(node.node_to_call)
+        args = []
+        if node.arg_nodes:
+            function = self.hold(function, node.node_to_call)
+            for arg_node in node.arg_nodes[:-1]:
+                args.append(self.box(self.hold(self.compile(arg_node), arg_node)))
+            args.append(self.box(self.compile(node.arg_nodes[-1])))
+        self.placeholder("store", node)
+        result = writer.temp()
+        self.compile_call(node, result, self.box(function), f"[{', '.join(args)}]")
+        self.placeholder("invalidate", node)
+        self.emit(f"if type({result}) is Number: {result} = {result}.value", node)
+        return result
+
+    def compile_ListNode(self, node):
+        if node.discarded:
+            return super().compile_ListNode(node)
+        elements = [self.box(self.hold(self.compile(element), element)) for element in node.element_nodes[:-1]]
+        if node.element_nodes:
+            elements.append(self.box(self.compile(node.element_nodes[-1])))
+        return self.temp(f"List([{', '.join(elements)}])", node)
+
+UnboxedTranspiler.compilers = DispatchTable(UnboxedTranspiler, "compile_")
+
+
+class UnboxedInterpreter(PythonInterpreter):
+    transpiler = UnboxedTranspiler
+
+
+global_engines["unboxed"] = UnboxedInterpreter
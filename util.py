@@ -1,11 +1,23 @@
 class Context:
-    def __init__(self, display_name, parent=None, parent_entry_pos=None):
+    __slots__ = ("display_name", "parent", "entry_pos", "entry_span", "symbol_table")
+
+    def __init__(self, display_name, parent=None, parent_entry_pos=None, parent_entry_span=None):
         self.display_name = display_name
         self.parent = parent
-        self.parent_entry_pos = parent_entry_pos
+        self.entry_pos = parent_entry_pos
+        self.entry_span = parent_entry_span
         self.symbol_table = None
 
+    @property
+    def parent_entry_pos(self):
+        # a call only keeps its node, the Position is made when a traceback shows it
+        if self.entry_pos is None and self.entry_span is not None:
+            return self.entry_span.pos_start
+        return self.entry_pos
+
 class SymbolTable:
+    __slots__ = ("symbols", "parent")
+
     def __init__(self, parent=None):
         self.symbols = {}
         self.parent = parent
@@ -21,23 +33,192 @@ class SymbolTable:
 
     def remove(self, name):
         del self.symbols[name]
+
+    def bound(self):
+        """The names bound in this table itself, with their values"""
+        return dict(self.symbols)
+
+class Frame(SymbolTable):
+    """
+    The symbol table of one function call. The names bound in the function body were numbered by
+    resolver.py and live in the slots list, which the interpreter indexes directly; everything else
+    goes through the dict and the parent tables like in SymbolTable.
+
+    The caller of a call is often a call of the same function. Names that function does not bind
+    are not in its slots either, so their lookup goes to outer, the first table that is not such a
+    frame, instead of walking the whole recursion.
+    """
+    __slots__ = ("scope", "slots", "outer")
+
+    def __init__(self, scope, parent=None, slots=None):
+        super().__init__(parent)
+        # a caller can hand over a list that already holds the arguments, which take the first slots
+        self.enter(scope, parent, slots if slots is not None else [None] * len(scope))
+
+    def enter(self, scope, parent, slots):
+        """Start the frame of a call; a frame of a finished call is entered again, see Interpreter.call_function"""
+        self.parent = parent
+        self.scope = scope
+        self.slots = slots
+        # only frames that never bound a name outside of their slots can be jumped over
+        if type(parent) is Frame and parent.scope is scope and not parent.symbols:
+            self.outer = parent.outer
+        else:
+            self.outer = parent
+
+    def get(self, name):
+        slot = self.scope.slots.get(name)
+        if slot is not None:
+            value = self.slots[slot]
+            if value is None and self.parent is not None:
+                return self.parent.get(name)
+            return value
+        value = self.symbols.get(name)
+        if value is None and self.outer is not None:
+            return self.outer.get(name)
+        return value
+
+    def set(self, name, value):
+        slot = self.scope.slots.get(name)
+        if slot is not None:
+            self.slots[slot] = value
+        else:
+            self.symbols[name] = value
+
+    def remove(self, name):
+        slot = self.scope.slots.get(name)
+        if slot is not None:
+            self.slots[slot] = None
+        else:
+            del self.symbols[name]
+
+    def bound(self):
+        slots = self.slots
+        bound = {name: slots[slot] for name, slot in self.scope.slots.items() if slots[slot] is not None}
+        bound.update(self.symbols)
+        return bound
+
+class TailTable(SymbolTable):
+    """
+    The variables of calls that ended with a tail call. The call that took their place still reads
+    them, as a caller's variables, but nothing changes them any more, so a chain of tail calls
+    leaves one merged table instead of a table per call.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def replacing(cls, table):
+        """The parent table for the callee of a tail call made by the call that owns table"""
+        merged = table.parent
+        # only the finished calls of the chain point at it, it is updated in place
+        if type(merged) is not TailTable:
+            merged = cls(merged)
+        merged.symbols.update(table.bound())
+        return merged
+
 global_symbol_table = SymbolTable()
 
+class DispatchTable(dict):
+    """
+    Maps a key (a node class, a builtin name) to the function that handles it. A key that was never
+    registered is resolved once to the prefixed method of the owner class, e.g. visit_NumberNode for
+    NumberNode, and remembered, so a dispatch is a single dict lookup.
+    """
+    def __init__(self, owner, prefix):
+        super().__init__()
+        self.owner = owner
+        self.prefix = prefix
+
+    def __missing__(self, key):
+        handler = self.find(key)
+        if handler is None:
+            raise Exception(f"No {self.prefix}{key if isinstance(key, str) else key.__name__} method defined")
+        return handler
+
+    def find(self, key):
+        """Like self[key], but None for a key there is no handler for"""
+        handler = self.get(key)
+        if handler is None:
+            handler = getattr(self.owner, self.prefix + (key if isinstance(key, str) else key.__name__), None)
+            if handler is not None:
+                self[key] = handler
+        return handler
+
+    def register(self, key, handler=None):
+        """Handle key with handler; without a handler it returns a decorator"""
+        if handler is None:
+            return lambda handler: self.register(key, handler)
+        self[key] = handler
+        return handler
+
+def counter(i, end, step):
+    """The values a for loop assigns, a range when they are ints"""
+    if type(i) is int and type(end) is int and type(step) is int and step:
+        return range(i, end, step)
+    return count(i, end, step)
+
+def count(i, end, step):
+    while i < end if step >= 0 else i > end:
+        yield i
+        i += step
+
 global_classes = {}
-def run_script(text, filename):
-    lexer = global_classes["Lexer"](text, filename)
-    tokens, error = lexer.make_tokens()
-    if error: return None, error
-
-    # generate AST
-    parser = global_classes["Parser"](tokens)
-    ast, error = parser.parse()
+
+# execution engines by name; each takes a tree and a context through visit() and leaves a runtime
+# error in .error. "visitor" is the tree-walking Interpreter, other modules register their own
+global_engines = {}
+
+class Counters:
+    """
+    What the engines did in this process, counted where they do it: the calls of BASIC functions
+    and of builtins, the Values made, the runtime errors made and the functions made, which keep
+    the context they were defined in. See metrics.py
+    """
+    __slots__ = ("function_calls", "builtin_calls", "values", "errors", "functions")
+
+    def __init__(self):
+        self.function_calls = 0
+        self.builtin_calls = 0
+        self.values = 0
+        self.errors = 0
+        self.functions = 0
+
+    def copy(self):
+        copy = Counters()
+        for name in Counters.__slots__:
+            setattr(copy, name, getattr(self, name))
+        return copy
+
+global_counters = Counters()
+
+def run_script(text, filename, engine="visitor", profiler=None, metrics=None):
+    # generate AST, tokens are handed to the parser as they are lexed; when cache.py is loaded
+    # the AST of a script that was run before is read back from the compile cache instead
+    compile_cache = global_classes.get("CompileCache")
+    if compile_cache is not None:
+        ast, error = compile_cache.default().compile(text, filename)
+    else:
+        lexer = global_classes["Lexer"](text, filename)
+        parser = global_classes["StreamParser"](lexer)
+        ast, error = parser.parse()
     if error: return ast, error
 
-    # interpreter
-    interpreter = global_classes["Interpreter"]()
+    # interpreter; a profiler (see profiler.py) runs the program on its own tree walker, metrics
+    # (see metrics.py) on a counting variant of the engine
+    if profiler is not None:
+        if metrics is not None:
+            raise ValueError("A run can be profiled or metered, not both")
+        interpreter = profiler.interpreter(engine)
+    elif metrics is not None:
+        interpreter = metrics.interpreter(engine)
+    else:
+        interpreter = global_engines[engine]()
     context = Context("<pragram>")
     context.symbol_table = global_symbol_table
-    value = interpreter.visit(ast, context)
+    try:
+        value = interpreter.visit(ast, context)
+    finally:
+        # a run the engine raised out of is still recorded, and ends
+        if metrics is not None: metrics.finish()
 
     return value, interpreter.error
\ No newline at end of file
@@ -1,32 +1,97 @@
 import math
 import os
-from error import RTError
-from util import Context, SymbolTable, run_script, global_classes
+from abc import ABC, abstractmethod
+from error import Error, RTError, OperationError
+from util import Context, SymbolTable, Frame, TailTable, DispatchTable, run_script, global_classes, global_counters
 
 
 class Value:
+    __slots__ = ("span", "context")
+
     def __init__(self):
-        self.set_pos()
-        self.set_context()
+        self.span = None
+        self.context = None
+        global_counters.values += 1
 
-    def set_pos(self, pos_start=None, pos_end=None):
-        self.pos_start = pos_start
-        self.pos_end = pos_end
+    def set_pos(self, span=None):
+        # keep the node (or token) the value came from; Positions are only built when an error needs them
+        self.span = span
         return self
 
+    @property
+    def pos_start(self):
+        return self.span.pos_start if self.span is not None else None
+
+    @property
+    def pos_end(self):
+        return self.span.pos_end if self.span is not None else None
+
     def set_context(self, context=None):
         self.context = context
         return self
 
     def illegal_operation(self, other=None):
         if not other: other = self
-        return RTError(
+        return OperationError(
             self.pos_start, other.pos_end,
             'Illegal operation',
             self.context
         )
 
+    # every operator can be applied to every value, types that support it override these
+
+    def added_to(self, other):
+        return None, self.illegal_operation(other)
+
+    def subbed_by(self, other):
+        return None, self.illegal_operation(other)
+
+    def multed_by(self, other):
+        return None, self.illegal_operation(other)
+
+    def dived_by(self, other):
+        return None, self.illegal_operation(other)
+
+    def powed_by(self, other):
+        return None, self.illegal_operation(other)
+
+    def get_comparison_eq(self, other):
+        return None, self.illegal_operation(other)
+
+    def get_comparison_ne(self, other):
+        return None, self.illegal_operation(other)
+
+    def get_comparison_lt(self, other):
+        return None, self.illegal_operation(other)
+
+    def get_comparison_gt(self, other):
+        return None, self.illegal_operation(other)
+
+    def get_comparison_lte(self, other):
+        return None, self.illegal_operation(other)
+
+    def get_comparison_gte(self, other):
+        return None, self.illegal_operation(other)
+
+    def anded_by(self, other):
+        return None, self.illegal_operation(other)
+
+    def ored_by(self, other):
+        return None, self.illegal_operation(other)
+
+    def notted(self):
+        return None, self.illegal_operation()
+
+    def negated(self):
+        return self.multed_by(Number(-1))
+
+    def execute(self, args, context=None, span=None):
+        error = self.illegal_operation()
+        return error if context is None else error.locate(span, span, context)
+
 class Number(Value):
+    __slots__ = ("value",)
+
     def __init__(self, value):
         super().__init__()
         self.value = value
@@ -34,6 +99,13 @@ class Number(Value):
     def __repr__(self):
         return f'{self.value}'
 
+    @staticmethod
+    def cached(value):
+        """The shared Number of a small int, a new one otherwise; shared values are never set_pos'ed"""
+        if type(value) is int and -5 <= value <= 256:
+            return Number.small_ints[value + 5]
+        return Number(value)
+
     def is_true(self):
         return self.value != 0
 
@@ -58,10 +130,10 @@ class Number(Value):
     def dived_by(self, other):
         if isinstance(other, Number):
             if other.value == 0:
-                return None, RTError(
+                return None, OperationError(
                     other.pos_start, other.pos_end,
                     "Division by zero",
-                    self.context
+                    self.context, blames_right=True
                 )
             else:
                 return Number(self.value / other.value).set_context(self.context), None
@@ -95,6 +167,8 @@ class Number(Value):
     def get_comparison_gt(self, other):
         if isinstance(other, Number):
             return Number(int(self.value > other.value)).set_context(self.context), None
+        else:
+            return None, Value.illegal_operation(self, other)
 
     def get_comparison_lte(self, other):
         if isinstance(other, Number):
@@ -125,11 +199,13 @@ class Number(Value):
 
     def copy(self):
         copy = Number(self.value)
-        copy.set_pos(self.pos_start, self.pos_end)
+        copy.set_pos(self.span)
         copy.set_context(self.context)
         return copy
 
 class String(Value):
+    __slots__ = ("value",)
+
     def __init__(self, value):
         super().__init__()
         self.value = value
@@ -154,11 +230,13 @@ class String(Value):
 
     def copy(self):
         copy = String(self.value)
-        copy.set_pos(self.pos_start, self.pos_end)
+        copy.set_pos(self.span)
         copy.set_context(self.context)
         return copy
 
 class List(Value):
+    __slots__ = ("elements",)
+
     def __init__(self, elements):
         super().__init__()
         self.elements = elements
@@ -179,10 +257,10 @@ class List(Value):
                 new_list.elements.pop(other.value)
                 return new_list, None
             except Exception as e:
-                return None, RTError(
+                return None, OperationError(
                     other.pos_start, other.pos_end,
                     "retrieve fails because index is not in the list",
-                    self.context
+                    self.context, blames_right=True
                 )
         else:
             return None, Value.illegal_operation(self, other)
@@ -200,111 +278,189 @@ class List(Value):
             try:
                 return self.elements[other.value], None
             except Exception as e:
-                return None, RTError(other.pos_start, other.pos_end, "remove fails because index is not in the list", self.context)
+                return None, OperationError(other.pos_start, other.pos_end, "remove fails because index is not in the list",
+                                            self.context, blames_right=True)
         else:
             return None, Value.illegal_operation(self, other)
 
     def copy(self):
         copy = List(self.elements)
-        copy.set_pos(self.pos_start, self.pos_end)
+        copy.set_pos(self.span)
         copy.set_context(self.context)
         return copy
 
 class BaseFunction(Value):
+    __slots__ = ("name",)
+
     def __init__(self, name):
         super().__init__()
         self.name = name or "<anonymous>"
 
-    def generate_new_context(self):
-        new_context = Context(self.name, self.context, self.pos_start)
-        new_context.symbol_table = SymbolTable(new_context.parent.symbol_table)
+    # execute(args, context, span) is told the caller's context and the call node; without them
+    # the function is a copy that was pointed at the call, like every value was before reads stopped copying
+
+    def call_site(self, context, span):
+        return (self.context, self.span) if context is None else (context, span)
+
+    def generate_new_context(self, context, span):
+        new_context = Context(self.name, context, None, span)
+        new_context.symbol_table = SymbolTable(context.symbol_table)
         return new_context
 
-    def check_args(self, arg_names, args):
+    def check_args(self, arg_names, args, context, span):
         if len(args) > len(arg_names):
             return False, RTError(
-                self.pos_start, self.pos_end,
+                span.pos_start, span.pos_end,
                 f"{len(args) - len(arg_names)} too many args passed to {self.name}",
-                self.context
+                context
             )
         elif len(args) < len(arg_names):
             return False, RTError(
-                self.pos_start, self.pos_end,
+                span.pos_start, span.pos_end,
                 f"{len(arg_names) - len(args)} too few args passed to {self.name}",
-                self.context
+                context
             )
         return True, None
 
     def populate_args(self, arg_names, args, exec_ctx):
         for i in range(len(args)):
-            arg_name = arg_names[i]
-            arg_value = args[i]
-            arg_value.set_context(exec_ctx)
-            exec_ctx.symbol_table.set(arg_name, arg_value)
+            exec_ctx.symbol_table.set(arg_names[i], args[i])
 
-    def check_and_populate_args(self, arg_names, args, exec_ctx):
-        succ, error = self.check_args(arg_names, args)
+    def check_and_populate_args(self, arg_names, args, exec_ctx, context, span):
+        succ, error = self.check_args(arg_names, args, context, span)
         if succ is False: return False, error
         self.populate_args(arg_names, args, exec_ctx)
         return True, None
 
+class TailCall:
+    """A call in tail position, handed back to the call loop of the function that made it"""
+    __slots__ = ("function", "args", "node", "context")
+
+    def __init__(self, function, args, node, context):
+        self.function = function
+        self.args = args
+        self.node = node
+        self.context = context
+
 class Function(BaseFunction):
-    def __init__(self, name, arg_names, body_node, should_auto_return):
+    __slots__ = ("arg_names", "body_node", "should_auto_return", "scope")
+
+    def __init__(self, name, arg_names, body_node, should_auto_return, scope=None):
         super().__init__(name)
+        global_counters.functions += 1
         self.arg_names = arg_names
         self.body_node = body_node
         self.should_auto_return = should_auto_return
+        self.scope = scope
+
+    def generate_new_context(self, context, span):
+        if self.scope is None:
+            return super().generate_new_context(context, span)
+        # the body was resolved, its locals live in the slots of a Frame
+        new_context = Context(self.name, context, None, span)
+        new_context.symbol_table = Frame(self.scope, context.symbol_table)
+        return new_context
 
-    def execute(self, args):
-        interpreter = global_classes["Interpreter"]()
-        exec_ctx = self.generate_new_context()
-        succ, error = self.check_and_populate_args(self.arg_names, args, exec_ctx)
-        if succ is False: return None, error
-
-        value = interpreter.visit(self.body_node, exec_ctx)
-        if interpreter.should_return() and interpreter.func_return_value is None: 
-            return RTError(
-                self.pos_start, self.pos_end,
-                f"No value returned from function {self.name}",
-                self.context
-            )
-        return_value = (value if self.should_auto_return else None) or interpreter.func_return_value or Number.null
-        return return_value
+    def execute(self, args, context=None, span=None):
+        context, span = self.call_site(context, span)
+        return global_classes["Interpreter"]().execute_function(self, args, context, span)
 
     def copy(self):
-        copy = Function(self.name, self.arg_names, self.body_node, self.should_auto_return)
+        copy = Function(self.name, self.arg_names, self.body_node, self.should_auto_return, self.scope)
         copy.set_context(self.context)
-        copy.set_pos(self.pos_start, self.pos_end)
+        copy.set_pos(self.span)
         return copy
 
     def __repr__(self):
         return f"<function {self.name}>"
 
+class EngineFunction(Function, ABC):
+    """
+    A Function whose body an engine compiled; the engine's subclass implements run_body. Calls
+    run in frames like the ones of Interpreter.call_function. A body that ends with a call of a
+    function of its own engine returns it as a TailCall, and that function runs in the loop of
+    call in place of the call that made it.
+    """
+    __slots__ = ()
+
+    def execute(self, args, context=None, span=None):
+        if context is None:
+            context, span = self.context, self.span
+        succ, error = self.check_args(self.arg_names, args, context, span)
+        if succ is False: return error
+        return self.call(list(args), context, span)
+
+    def call(self, args, context, span):
+        """
+        Run the function with arguments that were checked, which the call site of an engine does
+        once; the args list becomes the slots of the frame. Returns the value or the runtime error.
+        """
+        entry_context, entry_span = context, span
+        function, table = self, context.symbol_table
+        while True:
+            global_counters.function_calls += 1
+            scope = function.scope
+            # a tail call takes the place of its caller in tracebacks
+            exec_ctx = Context(function.name, entry_context, None, entry_span)
+            if scope is not None and scope.args_fill_slots:
+                missing = len(scope.slots) - len(args)
+                if missing > 0:
+                    args.extend([None] * missing)
+                exec_ctx.symbol_table = Frame(scope, table, args)
+            else:
+                exec_ctx.symbol_table = Frame(scope, table) if scope is not None else SymbolTable(table)
+                function.populate_args(function.arg_names, args, exec_ctx)
+
+            value = function.run_body(exec_ctx, context, span)
+            if type(value) is not TailCall:
+                return value
+            # the call site checked the arguments of the TailCall
+            function, args, span, context = value.function, value.args, value.node, value.context
+            table = TailTable.replacing(exec_ctx.symbol_table)
+
+    @abstractmethod
+    def run_body(self, exec_ctx, context, span):
+        """The value of the body run in exec_ctx, the TailCall it ended with or its runtime error"""
+
+    def escaped(self, context, span):
+        return RTError(
+            span.pos_start, span.pos_end,
+            f"No value returned from function {self.name}",
+            context
+        )
+
 class BuiltInFunction(BaseFunction):
+    __slots__ = ()
+
     def __init__(self, name):
         super().__init__(name)
 
-    def execute(self, args):
-        exec_ctx = self.generate_new_context()
+    def execute(self, args, context=None, span=None):
+        if context is not None:
+            # the builtins report errors at their own position, so they run on a copy pointed at the call
+            return self.copy().set_pos(span).set_context(context).execute(args)
+        exec_ctx = self.generate_new_context(self.context, self.span)
 
-        method_name = f"execute_{self.name}"
-        method = getattr(self, method_name, self.no_visit_method)
-        succ, error = self.check_and_populate_args(method.arg_names, args, exec_ctx)
+        global_counters.builtin_calls += 1
+        method = self.builtins[self.name]
+        succ, error = self.check_and_populate_args(method.arg_names, args, exec_ctx, self.context, self.span)
         if succ is False: return error
 
-        return_value, error = method(exec_ctx)
+        return_value, error = method(self, exec_ctx)
         if error is not None: 
             return error
         else:
             return return_value
 
-    def no_visit_method(self):
-        raise Exception(f"No execute_{self.name} method defined")
+    @classmethod
+    def register(cls, name, execute_method=None):
+        """Hook for new builtins: execute_method(builtin, exec_ctx) needs an arg_names attribute"""
+        return cls.builtins.register(name, execute_method)
 
     def copy(self):
         copy = BuiltInFunction(self.name)
         copy.set_context(self.context)
-        copy.set_pos(self.pos_start, self.pos_end)
+        copy.set_pos(self.span)
         return copy
 
     def __repr__(self):
@@ -454,7 +610,10 @@ class BuiltInFunction(BaseFunction):
                 exec_ctx
             )
 
-        return_value, error = run_script(script, filename)
+        # a script run by a profiled program is profiled with it, see profiler.py
+        profiler_class = global_classes.get("Profiler")
+        profiler = profiler_class.current() if profiler_class is not None else None
+        return_value, error = run_script(script, filename, profiler=profiler)
         if error:
             return None, RTError(
                 self.pos_start, self.pos_end,
@@ -464,6 +623,27 @@ class BuiltInFunction(BaseFunction):
         return return_value, None
     execute_run.arg_names = ['filename']
 
+def loop_bounds(node, context, start, end, step=None):
+    """
+    The Python numbers the for loop node counts with, from the values of its start, end and step
+    nodes (1 without one); the error is at the first of those nodes whose value is not a Number
+    """
+    bounds = []
+    for value, bound_node in ((start, node.start_node), (end, node.end_node), (step, node.step_node)):
+        if bound_node is None:
+            bounds.append(1)
+        elif isinstance(value, Number):
+            bounds.append(value.value)
+        else:
+            return None, loop_bound_error(bound_node, context)
+    return bounds, None
+
+def loop_bound_error(bound_node, context):
+    return RTError(bound_node.pos_start, bound_node.pos_end, "For loop bounds must be numbers", context)
+
+BuiltInFunction.builtins = DispatchTable(BuiltInFunction, "execute_")
+
+Number.small_ints = [Number(i) for i in range(-5, 257)]
 Number.null = Number(0)
 Number.true = Number(1)
 Number.false = Number(0)
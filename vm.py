@@ -0,0 +1,275 @@
+"""
+The stack VM that runs the code objects of bytecode.py, registered as the "vm" engine. Function
+locals live in slots, loops test at the bottom, and prepare() turns a load and the operator after
+it into one instruction, so it keeps up with the visitor on while loops and calls. It is not the
+fast engine, though: the visitor runs a for loop as a Python loop, which a dispatch per instruction
+does not beat, and the closure compiler is faster on every benchmark. What the VM is for is the
+serialized code objects, which replace the text archive as the compiled artifact.
+"""
+from bytecode import (
+    BytecodeCompiler, LOAD_NUMBER, LOAD_STRING, LOAD_NULL, LOAD_NAME, STORE_NAME, BINARY_OP, UNARY_OP, SET_POS,
+    POP, POP_N, JUMP, POP_JUMP_IF_FALSE, BUILD_LIST, NEW_ELEMENTS, LIST_APPEND, END_ELEMENTS, FOR_PREP, FOR_ITER,
+    MAKE_FUNCTION, CALL, RETURN_VALUE, ESCAPE, END, COUNT, TAIL_CALL, CHECK_BOUND, LOAD_LOCAL, STORE_LOCAL,
+    FOR_PREP_LOCAL, FOR_ITER_LOCAL, POP_JUMP_IF_TRUE, STORE_NAME_POP, STORE_LOCAL_POP
+)
+from error import Error, RTError, OperationError
+from util import counter, global_engines
+from values import Number, String, List, EngineFunction, TailCall, loop_bound_error
+
+# how run() left a code object
+FINISHED = 0   # ran off the end, the value is the last one computed
+RETURNED = 1
+ESCAPED = 2    # break or continue outside of any loop
+FAILED = 3     # the value is the runtime error
+TAILED = 4     # the value is the TailCall to run in place of the code object
+
+
+# superinstructions prepare() makes of a load and the BINARY_OP after it, with the load as the right
+# operand; they are never compiled or saved
+BINARY_OP_CONST = 100   # arg is (method, Value)
+BINARY_OP_LOCAL = 101   # arg is (method, slot, name, span of the load)
+BINARY_OP_NAME = 102    # arg is (method, name, span of the load)
+
+
+def prepare(code):
+    """
+    The instructions run() runs, made once and shared by every run. An argument is what it indexes,
+    the Value of a constant or a name, and a load followed by a BINARY_OP is one superinstruction
+    that skips the BINARY_OP. That stays in place for the jumps to it, so the list keeps its length
+    and its jump targets.
+    """
+    instructions = code.instructions
+    values = [String(const) if type(const) is str else Number.cached(const) if type(const) in (int, float)
+              else const for const in code.consts]
+    names = code.names
+    prepared = []
+    for pc, (op, arg, span) in enumerate(instructions):
+        if op in (LOAD_NUMBER, LOAD_STRING, MAKE_FUNCTION):
+            arg = values[arg]
+        elif op in (LOAD_NAME, STORE_NAME, STORE_NAME_POP, BINARY_OP, UNARY_OP, FOR_PREP, COUNT):
+            arg = names[arg]
+
+        following = instructions[pc + 1] if pc + 1 < len(instructions) else None
+        if following is not None and following[0] == BINARY_OP:
+            method, operator_span = names[following[1]], following[2]
+            if op in (LOAD_NUMBER, LOAD_STRING):
+                op, arg, span = BINARY_OP_CONST, (method, arg), operator_span
+            elif op == LOAD_LOCAL:
+                op, arg, span = BINARY_OP_LOCAL, (method, arg, code.local_names[arg], span), operator_span
+            elif op == LOAD_NAME:
+                op, arg, span = BINARY_OP_NAME, (method, arg, span), operator_span
+        prepared.append((op, arg, span))
+    code.prepared = prepared
+    return prepared
+
+
+def run(code, context):
+    """Run a code object in context; returns (how, value), see FINISHED and friends"""
+    instructions = code.prepared if code.prepared is not None else prepare(code)
+    symbol_table = context.symbol_table
+    # a function body runs in a Frame, see EngineFunction.call
+    slots = symbol_table.slots if code.scope is not None else None
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    pc = 0
+
+    # the most frequent instructions come first
+    while True:
+        op, arg, span = instructions[pc]
+        pc += 1
+
+        if op == LOAD_LOCAL:
+            value = slots[arg]
+            if value is None:
+                # until it is bound, the caller's variable is read
+                value = symbol_table.get(code.local_names[arg])
+                if value is None:
+                    return FAILED, RTError(span.pos_start, span.pos_end,
+                                           f"'{code.local_names[arg]}' is not defined", context)
+            push(value)
+        elif op == LOAD_NAME:
+            value = symbol_table.get(arg)
+            if value is None:
+                return FAILED, RTError(span.pos_start, span.pos_end, f"'{arg}' is not defined", context)
+            push(value)
+        elif op == BINARY_OP_CONST:
+            result, error = getattr(stack[-1], arg[0])(arg[1])
+            if error:
+                return FAILED, error.locate(span, span.operand, context) if isinstance(error, OperationError) else error
+            stack[-1] = result
+            pc += 1
+        elif op == BINARY_OP_LOCAL:
+            method, slot, name, load_span = arg
+            right = slots[slot]
+            if right is None:
+                right = symbol_table.get(name)
+                if right is None:
+                    return FAILED, RTError(load_span.pos_start, load_span.pos_end, f"'{name}' is not defined", context)
+            result, error = getattr(stack[-1], method)(right)
+            if error:
+                return FAILED, error.locate(span, span.operand, context) if isinstance(error, OperationError) else error
+            stack[-1] = result
+            pc += 1
+        elif op == BINARY_OP_NAME:
+            method, name, load_span = arg
+            right = symbol_table.get(name)
+            if right is None:
+                return FAILED, RTError(load_span.pos_start, load_span.pos_end, f"'{name}' is not defined", context)
+            result, error = getattr(stack[-1], method)(right)
+            if error:
+                return FAILED, error.locate(span, span.operand, context) if isinstance(error, OperationError) else error
+            stack[-1] = result
+            pc += 1
+        elif op == FOR_ITER_LOCAL:
+            i = next(stack[-1][0], None)
+            if i is not None:
+                slots[stack[-1][1]] = Number.cached(i)
+                pc = arg
+        elif op == FOR_ITER:
+            state = stack[-1]
+            i = next(state[0], None)
+            if i is not None:
+                symbol_table.set(state[1], Number.cached(i))
+                pc = arg
+        elif op == STORE_LOCAL_POP:
+            slots[arg] = pop()
+        elif op == STORE_NAME_POP:
+            symbol_table.set(arg, pop())
+        elif op == LOAD_NUMBER:
+            push(arg)
+        elif op == POP_JUMP_IF_FALSE:
+            if not pop().is_true():
+                pc = arg
+        elif op == POP_JUMP_IF_TRUE:
+            if pop().is_true():
+                pc = arg
+        elif op == JUMP:
+            pc = arg
+        elif op == BINARY_OP:
+            right = pop()
+            result, error = getattr(stack[-1], arg)(right)
+            if error:
+                return FAILED, error.locate(span, span.operand, context) if isinstance(error, OperationError) else error
+            stack[-1] = result
+        elif op == STORE_LOCAL:
+            slots[arg] = stack[-1]
+        elif op == STORE_NAME:
+            symbol_table.set(arg, stack[-1])
+        elif op == LIST_APPEND:
+            stack[-arg - 1].append(pop())
+        elif op == CALL:
+            args = stack[len(stack) - arg:]
+            del stack[len(stack) - arg:]
+            function = pop()
+            if type(function) is VMFunction:
+                if len(args) != len(function.arg_names):
+                    succ, error = function.check_args(function.arg_names, args, context, span)
+                    return FAILED, error
+                return_value = function.call(args, context, span)
+            else:
+                # execute hands back the error instead of a value when the call fails
+                return_value = function.execute(args, context, span)
+            if isinstance(return_value, Error): return FAILED, return_value
+            push(return_value)
+        elif op == POP:
+            pop()
+        elif op == TAIL_CALL:
+            args = stack[len(stack) - arg:]
+            del stack[len(stack) - arg:]
+            value_to_call = pop()
+            if type(value_to_call) is VMFunction:
+                succ, error = value_to_call.check_args(value_to_call.arg_names, args, context, span)
+                if succ is False: return FAILED, error
+                return TAILED, TailCall(value_to_call, args, span, context)
+            return_value = value_to_call.execute(args, context, span)
+            if isinstance(return_value, Error): return FAILED, return_value
+            push(return_value)
+        elif op == BUILD_LIST:
+            if arg:
+                elements = stack[-arg:]
+                del stack[-arg:]
+            else:
+                elements = []
+            push(List(elements))
+        elif op == LOAD_NULL:
+            push(Number.null)
+        elif op == LOAD_STRING:
+            push(arg)
+        elif op == UNARY_OP:
+            result, error = getattr(pop(), arg)()
+            if error:
+                return FAILED, error.locate(span.operand, span.operand, context) if isinstance(error, OperationError) else error
+            push(result)
+        elif op == SET_POS:
+            pass
+        elif op == POP_N:
+            del stack[len(stack) - arg:]
+        elif op == NEW_ELEMENTS:
+            push([])
+        elif op == END_ELEMENTS:
+            push(List(pop()))
+        elif op == FOR_PREP or op == FOR_PREP_LOCAL:
+            # the counter is a Python number (a range for ints), only the loop variable is a Number
+            step = pop().value
+            end = pop().value
+            push((iter(counter(pop().value, end, step)), arg))
+        elif op == CHECK_BOUND:
+            if not isinstance(stack[-arg], Number):
+                return FAILED, loop_bound_error(span, context)
+        elif op == MAKE_FUNCTION:
+            push(VMFunction(arg).set_context(context).set_pos(span))
+        elif op == RETURN_VALUE:
+            return RETURNED, pop()
+        elif op == END:
+            return FINISHED, pop()
+        elif op == ESCAPE:
+            return ESCAPED, None
+        elif op == COUNT:
+            code.counts[arg] += 1
+        else:
+            raise Exception(f"Unknown opcode {op}")
+
+
+class VMFunction(EngineFunction):
+    """A Function whose body is a code object run by the VM"""
+    __slots__ = ("code",)
+
+    def __init__(self, code):
+        super().__init__(code.name, code.arg_names, None, code.should_auto_return, code.scope)
+        self.code = code
+
+    def run_body(self, exec_ctx, context, span):
+        how, value = run(self.code, exec_ctx)
+        if how == FINISHED:
+            return value if self.should_auto_return else Number.null
+        elif how == ESCAPED:
+            return self.escaped(context, span)
+        return value
+
+    def copy(self):
+        copy = VMFunction(self.code)
+        copy.set_context(self.context)
+        copy.set_pos(self.span)
+        return copy
+
+
+class VMInterpreter:
+    """Compiles a tree to bytecode and runs it; has the visit()/error interface of Interpreter"""
+    def __init__(self):
+        self.error = None
+
+    def visit(self, node, context):
+        return self.run(BytecodeCompiler.compile_program(node), context)
+
+    def run(self, code, context):
+        how, value = run(code, context)
+        if how == FAILED:
+            self.error = value
+        elif how == FINISHED:
+            return value
+        # like the visitor, a return or break outside of a function or loop ends the program
+        return None
+
+
+global_engines["vm"] = VMInterpreter